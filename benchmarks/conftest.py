@@ -0,0 +1,59 @@
+import os
+from unittest.mock import patch
+
+import pytest
+import responses
+from mockredis import mock_strict_redis_client
+from websubsub.models import Subscription
+
+
+# Comma-separated numbers of seeded subscriptions for scheduler benchmarks,
+# e.g. WEBSUBSUB_BENCH_ROWS=10000,100000,1000000
+ROWS = [int(x) for x in os.environ.get('WEBSUBSUB_BENCH_ROWS', '10000').split(',')]
+
+
+class NullBackend(object):
+    """
+    Task backend which only counts scheduled tasks, so that benchmarks measure
+    scheduling code and not the tasks themselves.
+    """
+    scheduled = 0
+
+    def delay(self, task, *args, **kwargs):
+        NullBackend.scheduled += 1
+
+    def delay_many(self, task, kwargs_list):
+        NullBackend.scheduled += len(kwargs_list)
+
+    def shutdown(self, wait=True):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def mocks(settings):
+    """
+    Mock hub, redis and task backend.
+    """
+    settings.WEBSUBSUB_TASK_BACKEND = 'benchmarks.conftest.NullBackend'
+    redis = mock_strict_redis_client()
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as hub, \
+         patch('dumblock.redis', redis):
+        hub.add('POST', 'http://hub.io', status=202)
+        yield redis
+
+
+def seed(n, **kwargs):
+    """
+    Create n subscriptions with given field values.
+    """
+    batch = 10000
+    for start in range(0, n, batch):
+        Subscription.objects.bulk_create(
+            Subscription(
+                hub_url='http://hub.io',
+                topic=f'topic-{i}',
+                callback_urlname='wscallback',
+                **kwargs
+            )
+            for i in range(start, min(n, start + batch))
+        )
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+from model_mommy.mommy import make
+from websubsub.models import Subscription
+
+
+@pytest.mark.parametrize('size', [1024, 100 * 1024, 1024 * 1024])
+def test_post(benchmark, client, db, size):
+    """
+    WssView.post with json payload of given size.
+    """
+    ssn = make(Subscription, callback_urlname='wscallback')
+    url = ssn.reverse_url()
+    body = json.dumps({'data': 'x' * size})
+    benchmark.extra_info['payload_size'] = size
+
+    response = benchmark(client.post, url, body, content_type='application/json')
+    assert response.status_code == 200
+
+
+def test_verify(benchmark, client, db):
+    """
+    WssView.get with subscription verification request.
+    """
+    ssn = make(Subscription, callback_urlname='wscallback', subscribe_status='verifying')
+    url = ssn.reverse_url()
+    params = {
+        'hub.mode': 'subscribe',
+        'hub.topic': ssn.topic,
+        'hub.challenge': '123',
+        'hub.lease_seconds': '86400'
+    }
+
+    response = benchmark(client.get, url, params)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('rate', [0, 100, 1])
+def test_post_profiled(benchmark, client, db, settings, tmp_path, rate):
+    """
+    WssView.post with sampling profiler enabled for every rate-th request
+    (0 - disabled), to measure profiler overhead.
+    """
+    settings.WEBSUBSUB_PROFILE_RATE = rate
+    settings.WEBSUBSUB_PROFILE_OPTIONS = {'dump_dir': str(tmp_path)}
+    ssn = make(Subscription, callback_urlname='wscallback')
+    url = ssn.reverse_url()
+    body = json.dumps({'data': 'x' * 1024})
+    benchmark.extra_info['profile_rate'] = rate
+
+    response = benchmark(client.post, url, body, content_type='application/json')
+    assert response.status_code == 200
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+import pytest
+from django.utils.timezone import now
+from websubsub.tasks import refresh_subscriptions, retry_failed
+
+from .conftest import ROWS, seed
+
+
+@pytest.mark.parametrize('rows', ROWS)
+def test_refresh_subscriptions(benchmark, db, mocks, rows):
+    """
+    refresh_subscriptions with all seeded subscriptions expiring soon.
+    """
+    seed(rows, subscribe_status='verified', lease_expiration_time=now() + timedelta(hours=1))
+    benchmark.extra_info['rows'] = rows
+    benchmark.pedantic(refresh_subscriptions, setup=mocks.flushdb, rounds=3)
+
+
+@pytest.mark.parametrize('rows', ROWS)
+def test_retry_failed(benchmark, db, mocks, rows):
+    """
+    retry_failed with all seeded subscriptions failed to connect.
+    """
+    seed(rows, subscribe_status='connerror')
+    benchmark.extra_info['rows'] = rows
+    benchmark.pedantic(retry_failed, setup=mocks.flushdb, rounds=3)
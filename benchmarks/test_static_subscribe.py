@@ -0,0 +1,23 @@
+import pytest
+from django.core import management
+
+
+@pytest.mark.parametrize('count', [100, 1000])
+def test_static_subscribe(benchmark, db, settings, mocks, count):
+    """
+    websub_static_subscribe with given number of declared static subscriptions,
+    which already exist in the database after the first round.
+    """
+    settings.WEBSUBSUB_HUBS = {
+        'http://hub.io': {
+            'subscriptions': [
+                {'topic': f'topic-{i}', 'callback_urlname': 'wscallback'}
+                for i in range(count)
+            ]
+        }
+    }
+    benchmark.extra_info['subscriptions'] = count
+    benchmark.pedantic(
+        management.call_command, args=['websub_static_subscribe'], setup=mocks.flushdb,
+        rounds=3
+    )
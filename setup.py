@@ -39,7 +39,13 @@ setup(
     include_package_data=True,
     install_requires=INSTALL_REQUIRES,
     tests_require=TESTS_REQUIRE,
-    extras_require={'develop': TESTS_REQUIRE},
+    extras_require={
+        'develop': TESTS_REQUIRE,
+        'prometheus': ['prometheus_client'],
+        'tracing': ['opentelemetry-api', 'opentelemetry-sdk'],
+        'feeds': ['ijson'],
+        'envelope': ['msgpack', 'zstandard'],
+    },
     python_requires='>=3.6',
     test_suite='nose.collector',
     classifiers = [
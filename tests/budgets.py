@@ -0,0 +1,143 @@
+"""
+Resource budgets for hot code paths.
+
+`record(path)` counts database queries, redis commands and tasks published to
+the task backend while the code path runs. Published tasks are not executed,
+so every path is measured in isolation. `assert_budget()` fails with a report
+of every metric which exceeds BUDGETS[path].
+"""
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from unittest.mock import patch
+
+import dumblock
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+BUDGETS = {
+    # path: {metric: maximum}
+    'view.post':                         {'queries': 1, 'redis': 0, 'publishes': 1},
+    # Subscription is not cached yet: one SELECT of subscription with its consumers.
+    'view.post.cold':                    {'queries': 2, 'redis': 0, 'publishes': 1},
+    # New and duplicate notification: one redis command each, duplicate is not published.
+    'view.post.dedup':                   {'queries': 1, 'redis': 2, 'publishes': 1},
+    # Ordered delivery takes one redis INCR for sequence number.
+    'view.post.ordered':                 {'queries': 1, 'redis': 1, 'publishes': 1},
+    # With inbox enabled notification is appended instead of published.
+    'view.post.inbox':                   {'queries': 1, 'redis': 0, 'publishes': 0},
+    'view.get.subscribe':                {'queries': 1, 'redis': 0, 'publishes': 1},
+    'view.get.unsubscribe':              {'queries': 1, 'redis': 0, 'publishes': 1},
+    # Dumblock lock is counted as a single command. Status change also locks the subscription
+    # row and updates old and new SubscriptionCounter rows, inside a savepoint under TestCase.
+    'tasks.subscribe':                   {'queries': 7, 'redis': 2, 'publishes': 0},
+    'tasks.unsubscribe':                 {'queries': 10, 'redis': 2, 'publishes': 0},
+    'tasks.save':                        {'queries': 10, 'redis': 1, 'publishes': 0},
+    # Scheduling tasks takes one redis pipeline and one published group per chunk.
+    'tasks.refresh_subscriptions':       {'queries': 1, 'redis': 1, 'publishes': 1},
+    # Draining takes one SELECT, one UPDATE of notifications and one UPDATE of subscriptions
+    # per batch, and one publish per notification.
+    'tasks.drain_inbox':                 {'queries': 3, 'redis': 1, 'publishes': 2},
+    'tasks.retry_failed':                {'queries': 3, 'redis': 2, 'publishes': 2},
+    'command.websub_static_subscribe':   {'queries': 23, 'redis': 1, 'publishes': 1},
+}
+
+
+class CountingBackend(object):
+    """
+    Task backend which only counts published tasks.
+    """
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def delay(self, task, *args, **kwargs):
+        self.recorder.publishes.append(getattr(task, 'name', task))
+
+    def apply_async(self, task, args=(), kwargs=None, **options):
+        self.recorder.publishes.append(getattr(task, 'name', task))
+
+    def delay_many(self, task, kwargs_list):
+        # One group is published at once.
+        self.recorder.publishes.append(f'group of {len(kwargs_list)} {task.name}')
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class CountingRedis(object):
+    """
+    Redis client proxy which records names of called commands. Pipeline is
+    recorded as a single round trip.
+    """
+    def __init__(self, redis, recorder):
+        self.redis = redis
+        self.recorder = recorder
+
+    def __getattr__(self, name):
+        attr = getattr(self.redis, name)
+        if not callable(attr):
+            return attr
+
+        @wraps(attr)
+        def command(*args, **kwargs):
+            self.recorder.redis.append(name)
+            return attr(*args, **kwargs)
+
+        return command
+
+
+class Recorder(object):
+    def __init__(self, path):
+        self.path = path
+        self.queries = []
+        self.redis = []
+        self.publishes = []
+
+    @property
+    def usage(self):
+        return {
+            'queries': len(self.queries),
+            'redis': len(self.redis),
+            'publishes': len(self.publishes),
+        }
+
+    def report(self):
+        budget = BUDGETS[self.path]
+        lines = []
+        for metric, used in self.usage.items():
+            limit = budget.get(metric, 0)
+            if used > limit:
+                lines.append(f'  {metric}: {used} > budget {limit} (+{used - limit})')
+        if not lines:
+            return ''
+        details = [
+            '  queries:\n' + '\n'.join(f'    {q["sql"]}' for q in self.queries),
+            f'  redis: {dict(Counter(self.redis))}',
+            f'  publishes: {self.publishes}',
+        ]
+        return '\n'.join([f'Path {self.path} exceeded its budget:'] + lines + details)
+
+    def assert_budget(self):
+        report = self.report()
+        assert not report, report
+
+
+@contextmanager
+def record(path):
+    """
+    Record resources used by the code path, and check them against its budget:
+
+    >>> with record('view.post'):
+    >>>     client.post(url, data)
+
+    """
+    assert path in BUDGETS, f'Declare budget for {path} in tests/budgets.py'
+    recorder = Recorder(path)
+    backend = CountingBackend(recorder)
+    with CaptureQueriesContext(connection) as queries, \
+         patch('dumblock.redis', CountingRedis(dumblock.redis, recorder)), \
+         patch('websubsub.backends.get_backend', lambda: backend):
+        yield recorder
+    recorder.queries = queries.captured_queries
+    recorder.assert_budget()
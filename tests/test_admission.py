@@ -0,0 +1,89 @@
+from unittest.mock import patch
+
+from django.test import override_settings
+from model_mommy.mommy import make
+from websubsub.backends import CeleryBackend
+from websubsub.models import Subscription
+
+from .base import BaseTestCase
+
+
+ADMISSION = {
+    'soft_limit': 100,
+    'hard_limit': 200,
+    'retry_after': 30,
+    'priorities': {'news_wscallback': 1},
+}
+
+
+@override_settings(WEBSUBSUB_ADMISSION=ADMISSION)
+class AdmissionTest(BaseTestCase):
+    """
+    Callback view should shed notifications when handler queue is too deep.
+    """
+    def setUp(self):
+        self.low = make(Subscription, callback_urlname='wscallback')
+        self.high = make(Subscription, callback_urlname='news_wscallback')
+
+    def post_both(self, depth):
+        with patch.object(CeleryBackend, 'queue_depth', return_value=depth):
+            with override_settings(WEBSUBSUB_ADMISSION=dict(ADMISSION)):  # Reset sampled depth.
+                return [
+                    self.client.post(x.reverse_fullurl(), {'test': 'ok'})
+                    for x in (self.low, self.high)
+                ]
+
+    def test_below_soft_limit(self):
+        # WHEN queue depth is below soft limit
+        responses = self.post_both(depth=99)
+
+        # THEN all notifications should be accepted
+        assert [x.status_code for x in responses] == [200, 200]
+
+    def test_shed_low_priority(self):
+        # WHEN queue depth is above soft limit
+        responses = self.post_both(depth=120)
+
+        # THEN notification of low priority callback should be shed with 429
+        assert [x.status_code for x in responses] == [429, 200]
+        assert responses[0]['Retry-After'] == '30'
+
+        # WHEN queue depth is above the threshold of higher priority
+        responses = self.post_both(depth=150)
+
+        # THEN both notifications should be shed
+        assert [x.status_code for x in responses] == [429, 429]
+
+    def test_above_hard_limit(self):
+        # WHEN queue depth is above hard limit
+        responses = self.post_both(depth=200)
+
+        # THEN all notifications should be rejected with 503
+        assert [x.status_code for x in responses] == [503, 503]
+        assert responses[1]['Retry-After'] == '30'
+
+    def test_sampled(self):
+        # WHEN many notifications are posted within sampling interval
+        with patch.object(CeleryBackend, 'queue_depth', return_value=0) as queue_depth:
+            for i in range(5):
+                self.client.post(self.low.reverse_fullurl(), {'test': 'ok'})
+
+        # THEN queue depth should be sampled once
+        assert queue_depth.call_count == 1
+
+    @override_settings(WEBSUBSUB_ROUTES=[{'urlname': 'news_wscallback', 'queue': 'live'}])
+    def test_routed_queue(self):
+        # GIVEN routed queue which is above hard limit, and default queue which is empty
+        def queue_depth(task, queue=None):
+            return 200 if queue == 'live' else 0
+
+        # WHEN notifications are posted
+        with patch.object(CeleryBackend, 'queue_depth', side_effect=queue_depth), \
+             override_settings(WEBSUBSUB_ADMISSION=dict(ADMISSION)):  # Reset sampled depth.
+            responses = [
+                self.client.post(x.reverse_fullurl(), {'test': 'ok'})
+                for x in (self.low, self.high)
+            ]
+
+        # THEN only notification routed to the deep queue should be rejected
+        assert [x.status_code for x in responses] == [200, 503]
@@ -0,0 +1,82 @@
+import time
+from unittest.mock import Mock, patch
+
+from django.test import override_settings
+from django.urls import path
+from model_mommy.mommy import make
+from websubsub import backends
+from websubsub.backends import AsyncioBackend, BackendFull, get_backend
+from websubsub.models import Subscription
+from websubsub.views import WssView
+
+from .base import BaseTestCase
+
+
+urlpatterns = []
+
+
+@override_settings(ROOT_URLCONF='tests.test_backends')
+class LocalBackendTest(BaseTestCase):
+    """
+    With local task backend, handler should be called with request data without broker.
+    """
+    def post_event(self):
+        # GIVEN Subscription
+        ssn = make(Subscription, callback_urlname='WEE')
+
+        # AND WssView with plain function handler
+        handler = Mock()
+        urlpatterns[:] = [path('websubcallback/<uuid:id>', WssView.as_view(handler), name='WEE')]
+
+        # WHEN hub posts json data to the callback
+        response = self.client.post(ssn.reverse_fullurl(), {'test': 'ok'})
+
+        # THEN response status_code should be 200 (ok)
+        assert response.status_code == 200
+
+        # AND handler should be called with json data once queued tasks complete
+        assert get_backend().drain(timeout=5)
+        handler.assert_called_once_with({'test': 'ok'})
+
+    @override_settings(WEBSUBSUB_TASK_BACKEND='websubsub.backends.ThreadPoolBackend')
+    def test_threadpool(self):
+        self.post_event()
+
+    @override_settings(WEBSUBSUB_TASK_BACKEND='websubsub.backends.AsyncioBackend')
+    def test_asyncio(self):
+        self.post_event()
+
+    def test_backend_full(self):
+        # GIVEN Subscription
+        ssn = make(Subscription, callback_urlname='WEE')
+        urlpatterns[:] = [path('websubcallback/<uuid:id>', WssView.as_view(Mock()), name='WEE')]
+
+        # WHEN hub posts notification while task backend is full
+        with patch.object(backends, 'delay', side_effect=BackendFull('queue is full')):
+            response = self.client.post(ssn.reverse_fullurl(), {'test': 'ok'})
+
+        # THEN response status_code should be 503 (service unavailable) with Retry-After
+        assert response.status_code == 503
+        assert response['Retry-After'] == '60'
+
+    def test_delay_from_loop(self):
+        # GIVEN asyncio backend with a single slot
+        backend = AsyncioBackend(workers=1, queue_size=0, submit_timeout=5)
+        errors = []
+
+        # AND coroutine task which schedules another task
+        async def task():
+            try:
+                backend.delay(Mock())
+            except BackendFull as e:
+                errors.append(e)
+
+        # WHEN the task runs in the event loop
+        started = time.monotonic()
+        backend.delay(task)
+
+        # THEN it should fail to schedule at once, without blocking the loop
+        assert backend.drain(timeout=2)
+        assert len(errors) == 1
+        assert time.monotonic() - started < 2
+        backend.shutdown()
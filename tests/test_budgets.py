@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+import responses
+from django.core import management
+from django.test import override_settings
+from django.utils.timezone import now
+from model_mommy.mommy import make
+from websubsub import routing
+from websubsub.models import Subscription
+from websubsub.tasks import (
+    refresh_subscriptions, retry_failed, save, subscribe, unsubscribe, drain_inbox
+)
+
+from .base import BaseTestCase
+from .budgets import record
+
+
+class BudgetTest(BaseTestCase):
+    """
+    Hot code paths should not use more queries, redis commands and published tasks than
+    declared in tests/budgets.py
+    """
+    def setUp(self):
+        # GIVEN hub which returns HTTP_202_ACCEPTED
+        responses.add('POST', 'http://hub.io', status=202)
+
+        # AND Subscription
+        self.ssn = make(Subscription,
+            hub_url='http://hub.io',
+            topic='news',
+            callback_urlname='wscallback',
+            callback_url='http://wss.io/websubcallback/1',
+            subscribe_status='verifying',
+            lease_expiration_time=now() + timedelta(hours=1),
+        )
+
+    def test_view_post(self):
+        # Subscription is looked up once and then cached, budget is for the following requests.
+        self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+        with record('view.post'):
+            self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+
+    def test_view_post_cold(self):
+        routing.cache_clear()
+        with record('view.post.cold'):
+            self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+
+    @override_settings(WEBSUBSUB_DEDUP_NOTIFICATIONS='digest')
+    def test_view_post_dedup(self):
+        self.client.post(self.ssn.reverse_fullurl(), {'test': 'warmup'})
+        with record('view.post.dedup'):
+            self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+            self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+
+    @override_settings(WEBSUBSUB_ORDERING={'partitions': 4})
+    def test_view_post_ordered(self):
+        self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+        with record('view.post.ordered'):
+            self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+
+    @override_settings(WEBSUBSUB_INBOX=True)
+    def test_view_post_inbox(self):
+        self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+        with record('view.post.inbox'):
+            self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+
+    @override_settings(WEBSUBSUB_INBOX=True)
+    def test_drain_inbox(self):
+        self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+        self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+        with record('tasks.drain_inbox'):
+            drain_inbox()
+
+    def test_view_get_subscribe(self):
+        with record('view.get.subscribe'):
+            self.client.get(self.ssn.reverse_fullurl(), {
+                'hub.topic': 'news',
+                'hub.challenge': '123',
+                'hub.lease_seconds': 100,
+                'hub.mode': 'subscribe'})
+
+    def test_view_get_unsubscribe(self):
+        with record('view.get.unsubscribe'):
+            self.client.get(self.ssn.reverse_fullurl(), {
+                'hub.topic': 'news',
+                'hub.challenge': '123',
+                'hub.mode': 'unsubscribe'})
+
+    def test_subscribe(self):
+        self.ssn.update(subscribe_status='requesting')
+        with record('tasks.subscribe'):
+            subscribe(pk=self.ssn.pk)
+
+    def test_unsubscribe(self):
+        self.ssn.update(unsubscribe_status='requesting')
+        with record('tasks.unsubscribe'):
+            unsubscribe(pk=self.ssn.pk)
+
+    def test_save(self):
+        with record('tasks.save'):
+            save(pk=self.ssn.pk, subscribe_status='verified')
+
+    def test_refresh_subscriptions(self):
+        self.ssn.update(subscribe_status='verified')
+        with record('tasks.refresh_subscriptions'):
+            refresh_subscriptions()
+
+    def test_retry_failed(self):
+        self.ssn.update(subscribe_status='connerror')
+        with record('tasks.retry_failed'):
+            retry_failed()
+
+    @override_settings(WEBSUBSUB_HUBS={
+        'http://hub.io': {
+            'subscriptions': [{'topic': 'news', 'callback_urlname': 'wscallback'}]
+        }
+    })
+    def test_static_subscribe(self):
+        with record('command.websub_static_subscribe'):
+            management.call_command('websub_static_subscribe')
@@ -0,0 +1,72 @@
+import responses
+from model_mommy.mommy import make
+from websubsub.models import Subscription
+
+from .base import BaseTestCase, method_url_body
+
+
+class BulkCreateTest(BaseTestCase):
+    """
+    Subscription.bulk_create_and_subscribe() should create only missing subscriptions
+    and subscribe them.
+    """
+    def test_bulk_create(self):
+        # GIVEN hub which returns HTTP_202_ACCEPTED
+        responses.add('POST', 'http://hub.io', status=202)
+
+        # AND existing verified Subscription
+        existing = make(Subscription,
+            hub_url='http://hub.io',
+            topic='news1',
+            callback_urlname='wscallback',
+            subscribe_status='verified'
+        )
+
+        # WHEN bulk_create_and_subscribe() is called with existing and new topics
+        created = Subscription.bulk_create_and_subscribe(
+            ['news1', 'news2', 'news3'], urlname='wscallback', hub='http://hub.io')
+
+        # THEN two new Subscriptions should get created
+        assert len(created) == 2
+        assert Subscription.objects.count() == 3
+
+        # AND two POST requests to hub should be sent
+        assert sorted(method_url_body(x)[2]['hub.topic'][0] for x in responses.calls) \
+            == ['news2', 'news3']
+
+        # AND existing subscription should stay untouched
+        assert dict(Subscription.objects.values_list('topic', 'subscribe_status')) == {
+            'news1': 'verified',
+            'news2': 'verifying',
+            'news3': 'verifying',
+        }
+
+
+class BulkUnsubscribeTest(BaseTestCase):
+    """
+    QuerySet.unsubscribe() should unsubscribe all matching subscriptions.
+    """
+    def test_bulk_unsubscribe(self):
+        # GIVEN hub which returns HTTP_202_ACCEPTED
+        responses.add('POST', 'http://hub.io', status=202)
+
+        # AND two verified Subscriptions
+        for topic in ('news1', 'news2'):
+            make(Subscription,
+                hub_url='http://hub.io',
+                topic=topic,
+                callback_url='http://123',
+                subscribe_status='verified',
+                connerror_count=5,
+            )
+
+        # WHEN queryset unsubscribe() is called
+        count = Subscription.objects.filter(subscribe_status='verified').unsubscribe()
+
+        # THEN both subscriptions should be scheduled
+        assert count == 2
+        assert len(responses.calls) == 2
+
+        # AND their unsubscribe_status should be `verifying` with counters reset
+        assert list(Subscription.objects.values_list('unsubscribe_status', 'connerror_count')) \
+            == [('verifying', 0), ('verifying', 0)]
@@ -0,0 +1,177 @@
+import json
+from unittest.mock import Mock
+
+import dumblock
+from django.core import management
+from django.test import override_settings
+from django.urls import path
+from model_mommy.mommy import make
+from websubsub import inbox
+from websubsub.models import Subscription
+from websubsub.tasks import drain_inbox
+from websubsub.views import WssView
+
+from .base import BaseTestCase
+
+
+task = Mock()
+urlpatterns = [
+    path('websubcallback/<uuid:id>', WssView.as_view(task), name='CHANGES'),
+]
+
+
+def feed(*items):
+    return json.dumps({'title': 'News', 'items': [dict(id=id, text=text) for id, text in items]})
+
+
+@override_settings(
+    ROOT_URLCONF='tests.test_changes',
+    WEBSUBSUB_FEED_PARSING='feed',
+    WEBSUBSUB_ENTRY_CHANGES='changed',
+)
+class EntryChangesTest(BaseTestCase):
+    """
+    With entry change detection enabled, handler task should receive only new and
+    changed entries.
+    """
+    def setUp(self):
+        task.reset_mock(side_effect=True)
+        inbox.resolve_view.cache_clear()
+        self.ssn = make(Subscription, callback_urlname='CHANGES')
+
+    def tearDown(self):
+        inbox.resolve_view.cache_clear()
+
+    def post(self, body):
+        task.reset_mock()
+        self.client.post(self.ssn.reverse_fullurl(), body, content_type='application/feed+json')
+
+    def test_changed(self):
+        # WHEN hub posts feed with two entries
+        self.post(feed((1, 'a'), (2, 'b')))
+
+        # THEN handler task should receive both
+        assert [x['id'] for x in task.delay.call_args[0][0]['entries']] == [1, 2]
+
+        # WHEN hub posts the same feed with one entry changed and one added
+        self.post(feed((1, 'a'), (2, 'changed'), (3, 'c')))
+
+        # THEN handler task should receive changed and new entries only
+        assert task.delay.call_args[0][0] == {
+            'feed': {'title': 'News'},
+            'entries': [{'id': 2, 'text': 'changed'}, {'id': 3, 'text': 'c'}],
+        }
+
+        # WHEN hub posts the same feed again
+        self.post(feed((1, 'a'), (2, 'changed'), (3, 'c')))
+
+        # THEN handler task should not be scheduled
+        task.delay.assert_not_called()
+
+        # AND index should expire
+        assert 0 < dumblock.redis.ttl(f'websubsub_entries_{self.ssn.id}') <= 30 * 24 * 3600
+
+    @override_settings(WEBSUBSUB_ENTRY_CHANGES='removed', WEBSUBSUB_FEED_PARSING='entries')
+    def test_removed(self):
+        # GIVEN hub posted feed with two entries
+        self.post(feed((1, 'a'), (2, 'b')))
+
+        # WHEN hub posts feed without the first entry
+        self.post(feed((2, 'b'), (3, 'c')))
+
+        # THEN handler task should be scheduled for the new entry, and for removed ids
+        assert [x[0][0] for x in task.delay.call_args_list] == [
+            {'feed': {'title': 'News'}, 'entry': {'id': 3, 'text': 'c'}},
+            {'feed': {'title': 'News'}, 'removed': ['1']},
+        ]
+
+        # WHEN hub posts the same feed again
+        self.post(feed((2, 'b'), (3, 'c')))
+
+        # THEN removed entry should not be reported again
+        task.delay.assert_not_called()
+
+    @override_settings(WEBSUBSUB_ENTRY_CHANGES='removed', WEBSUBSUB_FEED_PARSING='entries')
+    def test_malformed_tail(self):
+        # GIVEN hub posted feed with two entries
+        self.post(feed((1, 'a'), (2, 'b')))
+
+        # WHEN hub posts feed with the first entry changed and malformed after it
+        self.post(feed((1, 'changed'), (2, 'b'))[:-20])
+
+        # THEN the changed entry should be delivered, and the unseen one not reported removed
+        assert [x[0][0] for x in task.delay.call_args_list] == [
+            {'feed': {'title': 'News'}, 'entry': {'id': 1, 'text': 'changed'}},
+        ]
+
+        # WHEN hub posts the whole feed
+        self.post(feed((1, 'changed'), (2, 'b')))
+
+        # THEN nothing should be delivered again
+        task.delay.assert_not_called()
+
+    def test_failed_publish(self):
+        # GIVEN broker which is down
+        task.delay.side_effect = Exception('Broker is down')
+
+        # WHEN hub posts feed with two entries
+        with self.assertRaises(Exception):
+            self.post(feed((1, 'a'), (2, 'b')))
+
+        # THEN index should not be updated
+        assert not dumblock.redis.exists(f'websubsub_entries_{self.ssn.id}')
+
+        # WHEN hub retries the notification after broker is back
+        task.delay.side_effect = None
+        self.post(feed((1, 'a'), (2, 'b')))
+
+        # THEN both entries should be delivered
+        assert [x['id'] for x in task.delay.call_args[0][0]['entries']] == [1, 2]
+
+    @override_settings(WEBSUBSUB_INBOX=True)
+    def test_inbox_failed_publish(self):
+        # GIVEN feed posted to the inbox, and broker which is down
+        self.post(feed((1, 'a')))
+        task.delay.side_effect = Exception('Broker is down')
+
+        # WHEN inbox is drained
+        drain_inbox()
+
+        # THEN index should not be updated
+        assert not dumblock.redis.exists(f'websubsub_entries_{self.ssn.id}')
+
+        # WHEN inbox is drained after broker is back
+        task.delay.side_effect = None
+        drain_inbox()
+
+        # THEN entry should be delivered
+        assert task.delay.call_args[0][0]['entries'] == [{'id': 1, 'text': 'a'}]
+
+    @override_settings(WEBSUBSUB_ENTRY_INDEX_SIZE=2)
+    def test_trim(self):
+        # GIVEN index of two entries
+        self.post(feed((1, 'a'), (2, 'b')))
+
+        # WHEN a new entry arrives
+        self.post(feed((3, 'c')))
+
+        # THEN index should be trimmed to two entries, keeping the new one
+        assert dumblock.redis.hlen(f'websubsub_entries_{self.ssn.id}') == 2
+        assert dumblock.redis.hexists(f'websubsub_entries_{self.ssn.id}', '3')
+
+    @override_settings(WEBSUBSUB_INBOX=True)
+    def test_inbox_replay(self):
+        # GIVEN the same feed posted twice and drained
+        self.post(feed((1, 'a')))
+        self.post(feed((1, 'a')))
+        drain_inbox()
+
+        # THEN handler task should be scheduled once
+        assert task.delay.call_count == 1
+
+        # WHEN notifications are replayed
+        task.reset_mock()
+        management.call_command('websub_replay', subscription=[str(self.ssn.id)], workers=1)
+
+        # THEN all entries should be delivered again
+        assert task.delay.call_count == 2
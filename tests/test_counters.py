@@ -0,0 +1,99 @@
+from django.core import management
+from model_mommy.mommy import make
+from websubsub.models import Subscription, SubscriptionCounter
+
+from .base import BaseTestCase
+
+
+def counts():
+    return {
+        (x.hub_url, x.static, x.subscribe_status, x.unsubscribe_status): x.count
+        for x in SubscriptionCounter.objects.filter(count__gt=0)
+    }
+
+
+def actual_counts():
+    result = {}
+    for ssn in Subscription.objects.all():
+        key = (ssn.hub_url, ssn.static, ssn.subscribe_status, ssn.unsubscribe_status or '')
+        result[key] = result.get(key, 0) + 1
+    return result
+
+
+class CountersTest(BaseTestCase):
+    """
+    SubscriptionCounter should follow every create, status change and delete.
+    """
+    def test_counters_follow_changes(self):
+        # GIVEN one Subscription created with save()
+        ssn = make(Subscription, hub_url='http://hub.io', subscribe_status='verifying')
+
+        # THEN counters should match actual counts
+        assert counts() == actual_counts() == {('http://hub.io', False, 'verifying', ''): 1}
+
+        # WHEN two are created in bulk, one of them conflicting with existing
+        Subscription.objects.bulk_create([
+            Subscription(hub_url='http://hub.io', topic='news1', subscribe_status='verifying'),
+            Subscription(hub_url='http://hub2.io', topic='news2', subscribe_status='verified'),
+            Subscription(id=ssn.id, hub_url='http://hub2.io', topic='news3'),
+        ], ignore_conflicts=True)
+
+        # THEN counters should match actual counts
+        assert counts() == actual_counts() == {
+            ('http://hub.io', False, 'verifying', ''): 2,
+            ('http://hub2.io', False, 'verified', ''): 1,
+        }
+
+        # WHEN status of one is changed with save()
+        ssn.update(subscribe_status='verified')
+
+        # THEN counters should match actual counts
+        assert counts() == actual_counts() == {
+            ('http://hub.io', False, 'verified', ''): 1,
+            ('http://hub.io', False, 'verifying', ''): 1,
+            ('http://hub2.io', False, 'verified', ''): 1,
+        }
+
+        # WHEN statuses are changed with queryset update
+        Subscription.objects.filter(topic='news1').update(unsubscribe_status='requesting')
+        Subscription.objects.filter(hub_url='http://hub2.io').update(hub_url='http://hub.io')
+
+        # THEN counters should match actual counts
+        assert counts() == actual_counts() == {
+            ('http://hub.io', False, 'verified', ''): 2,
+            ('http://hub.io', False, 'verifying', 'requesting'): 1,
+        }
+
+        # WHEN field not counted is changed
+        ssn.update(topic='news0')
+
+        # THEN counters should stay the same
+        assert counts() == actual_counts()
+
+        # WHEN one is deleted with delete()
+        ssn.delete()
+
+        # THEN counters should match actual counts
+        assert counts() == actual_counts() == {
+            ('http://hub.io', False, 'verified', ''): 1,
+            ('http://hub.io', False, 'verifying', 'requesting'): 1,
+        }
+
+        # WHEN one is deleted with queryset delete
+        Subscription.objects.filter(topic='news1').delete()
+
+        # THEN counters should match actual counts
+        assert counts() == actual_counts() == {('http://hub.io', False, 'verified', ''): 1}
+
+    def test_rebuild(self):
+        # GIVEN two Subscriptions
+        make(Subscription, hub_url='http://hub.io', subscribe_status='verified', _quantity=2)
+
+        # AND counters gone out of sync
+        SubscriptionCounter.objects.update(count=100)
+
+        # WHEN websub_rebuild_counters is called
+        management.call_command('websub_rebuild_counters')
+
+        # THEN counters should match actual counts
+        assert counts() == actual_counts() == {('http://hub.io', False, 'verified', ''): 2}
@@ -0,0 +1,39 @@
+import responses
+from model_mommy.mommy import make
+from websubsub.models import Subscription
+from websubsub.tasks import subscribe
+from websubsub.tasks.dedup import acquire_token
+
+from .base import BaseTestCase
+
+
+class DedupTest(BaseTestCase):
+    """
+    Subscribe task should not be scheduled again while the same task for the same
+    subscription is waiting in the queue.
+    """
+    def test_dedup(self):
+        # GIVEN hub which returns HTTP_202_ACCEPTED
+        responses.add('POST', 'http://hub.io', status=202)
+
+        # AND Subscription
+        ssn = make(Subscription, hub_url='http://hub.io', callback_urlname='wscallback')
+
+        # AND subscribe task already scheduled for this subscription
+        assert acquire_token(subscribe, ssn.pk)
+
+        # WHEN Subscription.subscribe() is called
+        result = ssn.subscribe()
+
+        # THEN new task should not be scheduled
+        assert result is None
+        assert len(responses.calls) == 0
+
+        # WHEN scheduled task completes
+        subscribe(pk=ssn.pk)
+
+        # THEN one POST request to hub should be sent
+        assert len(responses.calls) == 1
+
+        # AND subscription can be scheduled again
+        assert acquire_token(subscribe, ssn.pk)
@@ -0,0 +1,132 @@
+import responses
+from django.test import override_settings
+from websubsub import discovery
+from websubsub.models import Subscription
+
+from .base import BaseTestCase
+
+
+ATOM = '''<?xml version="1.0"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <link rel="hub" href="https://hub.io/"/>
+  <link rel="self" href="/feed.atom"/>
+  <entry><link rel="hub" href="https://ignored.io/"/></entry>
+</feed>'''
+
+HTML = '''<!DOCTYPE html><html><head>
+  <link rel="stylesheet" href="/style.css">
+  <link rel="hub" href="https://hub.io/">
+</head><body><link rel="hub" href="https://ignored.io/"></body></html>'''
+
+
+class DiscoveryTest(BaseTestCase):
+    """
+    Hubs should be discovered from Link headers or document links, and cached.
+    """
+    def test_link_headers(self):
+        # GIVEN topic with hubs and self url in Link headers
+        responses.add('GET', 'http://example.com/news', body='ignored', headers={
+            'Link': '<https://hub1.io/>; rel="hub", <https://hub2.io/>; rel="hub", </feed>; rel="self"'
+        })
+
+        # WHEN hubs are discovered
+        # THEN hubs and absolute self url should be returned
+        assert discovery.discover('http://example.com/news') == discovery.Discovery(
+            ['https://hub1.io/', 'https://hub2.io/'], 'http://example.com/feed'
+        )
+
+    def test_documents(self):
+        # GIVEN Atom and HTML topics with hub links
+        responses.add('GET', 'http://example.com/feed', body=ATOM, content_type='application/atom+xml')
+        responses.add('GET', 'http://example.com/page', body=HTML, content_type='text/html')
+
+        # WHEN hubs are discovered
+        # THEN only links of feed and document head should be found
+        assert discovery.discover('http://example.com/feed') == discovery.Discovery(
+            ['https://hub.io/'], 'http://example.com/feed.atom'
+        )
+        assert discovery.discover('http://example.com/page') == discovery.Discovery(
+            ['https://hub.io/'], 'http://example.com/page'
+        )
+
+    def test_cache(self):
+        # GIVEN topic which must be revalidated, and topic which must not be cached
+        link = {'Link': '<https://hub.io/>; rel="hub"'}
+        responses.add('GET', 'http://example.com/revalidated', headers=dict(
+            link, **{'ETag': '"v1"', 'Cache-Control': 'no-cache'}
+        ))
+        responses.add('GET', 'http://example.com/revalidated', status=304)
+        responses.add('GET', 'http://example.com/nostore', headers=dict(
+            link, **{'Cache-Control': 'no-store'}
+        ))
+        responses.add('GET', 'http://example.com/cached', headers=dict(
+            link, **{'Cache-Control': 'public, max-age=600'}
+        ))
+
+        # WHEN each topic is discovered twice
+        for topic in ('revalidated', 'nostore', 'cached'):
+            for x in range(2):
+                assert discovery.discover(f'http://example.com/{topic}').hubs == ['https://hub.io/']
+
+        # THEN revalidated topic should be fetched again with ETag, and unstored one
+        # should be fetched again, and cached one only once
+        urls = [x.request.url.rsplit('/', 1)[1] for x in responses.calls]
+        assert urls == ['revalidated', 'revalidated', 'nostore', 'nostore', 'cached']
+        assert responses.calls[1].request.headers['If-None-Match'] == '"v1"'
+
+    @override_settings(WEBSUBSUB_DISCOVER_HUBS=True)
+    def test_subscribe(self):
+        # GIVEN topics with hubs, and a topic which can not be fetched
+        for n in range(3):
+            responses.add('GET', f'http://example.com/{n}', headers={
+                'Link': f'<http://hub{n % 2}.io>; rel=hub, </self/{n}>; rel=self'
+            })
+        responses.add('GET', 'http://example.com/broken', status=500)
+        responses.add('POST', 'http://hub0.io', status=202)
+        responses.add('POST', 'http://hub1.io', status=202)
+
+        # WHEN hubs are discovered in bulk
+        found = discovery.discover_many([f'http://example.com/{n}' for n in range(3)] + ['http://example.com/broken'], 2)
+
+        # THEN failed topic should be reported as None
+        assert {k: v and v.hubs for k, v in found.items()} == {
+            'http://example.com/0': ['http://hub0.io'],
+            'http://example.com/1': ['http://hub1.io'],
+            'http://example.com/2': ['http://hub0.io'],
+            'http://example.com/broken': None,
+        }
+
+        # WHEN subscriptions are created without hub
+        Subscription.create('http://example.com/1', 'wscallback')
+        Subscription.bulk_create_and_subscribe(
+            ['http://example.com/0', 'http://example.com/2'], 'wscallback'
+        )
+
+        # THEN their self urls should be subscribed at discovered hubs, with cached discovery
+        assert dict(Subscription.objects.values_list('topic', 'hub_url')) == {
+            'http://example.com/self/0': 'http://hub0.io',
+            'http://example.com/self/1': 'http://hub1.io',
+            'http://example.com/self/2': 'http://hub0.io',
+        }
+        assert sum(x.request.method == 'GET' for x in responses.calls) == 4
+
+    @override_settings(WEBSUBSUB_DISCOVER_HUBS=True, WEBSUBSUB_SHARED_URLNAME='wscallback')
+    def test_shared(self):
+        # GIVEN topic with hub and self url
+        responses.add('GET', 'http://example.com/feed', headers={
+            'Link': '<http://hub.io>; rel=hub, <http://example.com/self>; rel=self'
+        })
+        responses.add('POST', 'http://hub.io', status=202)
+
+        # WHEN shared subscription is created without hub
+        ssn = Subscription.create_shared('http://example.com/feed', 'wscallback')
+
+        # THEN self url should be subscribed at discovered hub
+        assert (ssn.hub_url, ssn.topic) == ('http://hub.io', 'http://example.com/self')
+
+        # WHEN its consumer is released
+        responses.calls.reset()
+        assert Subscription.release_shared(ssn.topic, 'wscallback') == 0
+
+        # THEN topic should not be fetched
+        assert not any(x.request.method == 'GET' for x in responses.calls)
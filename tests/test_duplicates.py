@@ -0,0 +1,131 @@
+import json
+import time
+from io import BytesIO
+from unittest.mock import Mock
+from uuid import uuid4
+
+from django.test import override_settings
+from django.urls import path
+from model_mommy.mommy import make
+from websubsub.duplicates import BloomStore, entry_ids
+from websubsub.models import Subscription
+from websubsub.views import WssView
+
+from .base import BaseTestCase
+
+
+task = Mock()
+urlpatterns = [
+    path('websubcallback/<uuid:id>', WssView.as_view(task), name='DEDUP'),
+]
+
+ATOM = '''<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>{title}</title>
+  <entry><id>urn:uuid:1</id><title>First</title></entry>
+  <entry><id>urn:uuid:2</id><title>Second</title></entry>
+</feed>'''
+
+
+@override_settings(ROOT_URLCONF='tests.test_duplicates', WEBSUBSUB_DEDUP_NOTIFICATIONS='digest')
+class DuplicatesTest(BaseTestCase):
+    """
+    Repeated notifications should be answered with 200 and dropped.
+    """
+    def setUp(self):
+        task.reset_mock(side_effect=True)
+        self.ssn = make(Subscription, callback_urlname='DEDUP')
+
+    def post(self, data):
+        return self.client.post(self.ssn.reverse_fullurl(), json.dumps(data), content_type='application/json')
+
+    def test_digest(self):
+        # WHEN hub posts the same data twice, and then different data
+        responses = [
+            self.post({'test': 'ok'}),
+            self.post({'test': 'ok'}),
+            self.post({'test': 'other'}),
+        ]
+
+        # THEN all responses should be 200 (ok)
+        assert [x.status_code for x in responses] == [200, 200, 200]
+
+        # AND task should be called only for unique data
+        assert [x.args for x in task.delay.call_args_list] == [({'test': 'ok'},), ({'test': 'other'},)]
+
+    @override_settings(WEBSUBSUB_DEDUP_NOTIFICATIONS='id')
+    def test_entry_ids(self):
+        # WHEN hub posts the same JSON Feed items twice with different content
+        self.post({'items': [{'id': '1', 'content_text': 'a'}]})
+        self.post({'items': [{'id': '1', 'content_text': 'b'}]})
+
+        # THEN task should be called once
+        assert task.delay.call_count == 1
+
+    def test_atom_entry_ids(self):
+        # Atom entry ids should be found regardless of feed content.
+        for title in ('One', 'Two'):
+            stream = BytesIO(ATOM.format(title=title).encode())
+            assert entry_ids('application/atom+xml', stream) == ['urn:uuid:1', 'urn:uuid:2']
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=10, FILE_UPLOAD_MAX_MEMORY_SIZE=10)
+    def test_body_over_upload_limit(self):
+        # WHEN hub posts the same body longer than DATA_UPLOAD_MAX_MEMORY_SIZE twice
+        data = {'test': 'x' * 100}
+        responses = [self.post(data), self.post(data)]
+
+        # THEN all responses should be 200 (ok)
+        assert [x.status_code for x in responses] == [200, 200]
+
+        # AND task should be called once with the whole parsed body
+        assert [x.args for x in task.delay.call_args_list] == [(data,)]
+
+    @override_settings(WEBSUBSUB_DEDUP_NOTIFICATIONS_STORE='bloom')
+    def test_bloom(self):
+        # WHEN hub posts the same data twice
+        self.post({'test': 'ok'})
+        self.post({'test': 'ok'})
+
+        # THEN task should be called once
+        assert task.delay.call_count == 1
+
+    def test_unwanted(self):
+        # WHEN hub posts the same data twice to unknown subscription
+        url = self.ssn.reverse_fullurl().replace(str(self.ssn.id), str(uuid4()))
+        responses = [
+            self.client.post(url, {'test': 'ok'}),
+            self.client.post(url, {'test': 'ok'}),
+        ]
+
+        # THEN both responses should be 410
+        assert [x.status_code for x in responses] == [410, 410]
+
+    def test_failed_publish(self):
+        # GIVEN broker which fails to publish the first notification
+        task.delay.side_effect = [Exception('Broker is down'), None]
+
+        # WHEN hub posts the same data again after failure
+        with self.assertRaises(Exception):
+            self.post({'test': 'ok'})
+        response = self.post({'test': 'ok'})
+
+        # THEN retried notification should not be dropped as a duplicate
+        assert response.status_code == 200
+        assert task.delay.call_count == 2
+
+    def test_bloom_window(self):
+        # GIVEN Bloom store with 0.1 second window
+        store = BloomStore(window=0.1, capacity=1000)
+
+        # WHEN key is added
+        assert store.add('key')
+
+        # THEN it should be a duplicate within the window
+        assert not store.add('key')
+
+        # AND it should be forgotten after two windows
+        time.sleep(0.15)
+        store.add('other')
+        time.sleep(0.15)
+        store.add('other')
+        assert store.add('key')
@@ -0,0 +1,135 @@
+from datetime import datetime
+from unittest.mock import Mock, patch
+
+from django.test import override_settings
+from django.urls import path
+from kombu import serialization
+from model_mommy.mommy import make
+from websubsub import envelope, inbox
+from websubsub.models import Subscription
+from websubsub.views import WssView
+
+from .base import BaseTestCase
+
+
+task = Mock()
+urlpatterns = [
+    path('websubcallback/<uuid:id>', WssView.as_view(task), name='ENVELOPE'),
+]
+
+
+def roundtrip(body):
+    content_type, encoding, data = serialization.dumps(body, serializer='websubsub')
+    assert content_type == envelope.CONTENT_TYPE
+    return data, serialization.loads(data, content_type, encoding, accept=[envelope.CONTENT_TYPE])
+
+
+@override_settings(ROOT_URLCONF='tests.test_envelope')
+class EnvelopeTest(BaseTestCase):
+    """
+    Handler task payloads should be packed and compressed, and decoded transparently.
+    """
+    def setUp(self):
+        task.reset_mock()
+        inbox.resolve_view.cache_clear()
+
+    def tearDown(self):
+        inbox.resolve_view.cache_clear()
+
+    @override_settings(WEBSUBSUB_ENVELOPE={'threshold': 100})
+    def test_compression(self):
+        # GIVEN small and large payloads with bytes and datetime
+        small = [[{'a': b'\x00\xff'}], {}, {}]
+        large = [['x' * 10000], {'time': datetime(2020, 1, 1)}, {}]
+
+        # WHEN they are serialized and deserialized
+        small_data, small_result = roundtrip(small)
+        large_data, large_result = roundtrip(large)
+
+        # THEN small payload should not be compressed, and large one should be
+        assert small_data[1:2] == envelope.NONE
+        assert large_data[1:2] == envelope.ZLIB
+        assert len(large_data) < 200
+
+        # AND payloads should be decoded
+        assert small_result == small
+        assert large_result == [['x' * 10000], {'time': '2020-01-01T00:00:00'}, {}]
+
+    @override_settings(WEBSUBSUB_ENVELOPE={'threshold': 100, 'compression': 'zstd'})
+    def test_zstd_json(self):
+        # GIVEN msgpack is not installed
+        with patch.object(envelope, 'msgpack', None):
+            # WHEN large payload is serialized and deserialized
+            data, result = roundtrip([['x' * 10000], {}, {}])
+
+        # THEN it should be json compressed with zstd
+        assert data[:2] == envelope.JSON + envelope.ZSTD
+        assert result == [['x' * 10000], {}, {}]
+
+    @override_settings(WEBSUBSUB_ENVELOPE={'threshold': 100})
+    def test_view(self):
+        # GIVEN Subscription
+        ssn = make(Subscription, callback_urlname='ENVELOPE')
+
+        # WHEN hub posts json data to the callback
+        link = '<http://hub.io>; rel="hub"'
+        response = self.client.post(ssn.reverse_fullurl(), {'test': 'ok'}, HTTP_LINK=link)
+        assert response.status_code == 200
+
+        # THEN handler task should be published with envelope serializer and raw body
+        (args, kwargs), options = task.apply_async.call_args
+        assert options == {'serializer': 'websubsub'}
+        assert args[0][envelope.RAW] and args[0]['body'] == b'{"test":"ok"}'
+        assert args[0]['headers'] == {'Content-Type': 'application/json', 'Link': link}
+
+        # AND worker should decode the envelope, and parse it before the task runs
+        data, body = roundtrip([list(args), {}, {}])
+        assert body[0][0]['body'] == b'{"test":"ok"}'
+        envelope._unwrap_args(args=body[0])
+        assert body[0] == [{'test': 'ok'}]
+
+    def test_malformed_body(self):
+        # GIVEN enveloped body which can not be parsed
+        args = [{
+            envelope.RAW: True, 'urlname': 'ENVELOPE', 'content_type': 'application/json',
+            'body': b'{broken',
+        }]
+
+        # WHEN task is about to run
+        envelope._unwrap_args(args=args)
+
+        # THEN task should receive the body as text
+        assert args == ['{broken']
+
+    @override_settings(
+        WEBSUBSUB_ENVELOPE={'threshold': 100}, DATA_UPLOAD_MAX_MEMORY_SIZE=10,
+        FILE_UPLOAD_MAX_MEMORY_SIZE=10
+    )
+    def test_body_over_upload_limit(self):
+        # GIVEN Subscription
+        ssn = make(Subscription, callback_urlname='ENVELOPE')
+
+        # WHEN hub posts json body longer than DATA_UPLOAD_MAX_MEMORY_SIZE
+        response = self.client.post(ssn.reverse_fullurl(), {'test': 'x' * 100})
+
+        # THEN response status_code should be 200 (ok)
+        assert response.status_code == 200
+
+        # AND the whole body should be enveloped
+        (args, kwargs), options = task.apply_async.call_args
+        assert args[0]['body'] == b'{"test":"%s"}' % (b'x' * 100)
+
+    def test_tuple_args(self):
+        # GIVEN enveloped body in tuple args, which can not be changed in place
+        args = ({
+            envelope.RAW: True, 'urlname': 'ENVELOPE', 'content_type': 'application/json',
+            'body': b'{}',
+        },)
+
+        # WHEN task is about to run
+        # THEN error should be raised
+        with self.assertRaises(TypeError):
+            envelope._unwrap_args(args=args)
+
+        # AND tuple args without envelope should pass
+        envelope._unwrap_args(args=({'test': 'ok'},))
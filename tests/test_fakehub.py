@@ -0,0 +1,77 @@
+import hashlib
+import hmac
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import responses
+
+from django.test import SimpleTestCase
+from websubsub.fakehub import FakeHub
+
+
+class FakeHubTest(SimpleTestCase):
+    """
+    FakeHub should respond to subscription requests according to configured rates and
+    verify accepted ones.
+    """
+    def request(self, hub):
+        self.addCleanup(hub.server.server_close)
+        return hub.on_request({
+            'hub.mode': 'subscribe',
+            'hub.topic': 'news',
+            'hub.callback': 'http://wss.io/websubcallback/1'
+        })
+
+    def test_rates(self):
+        # GIVEN fake hub which fails every request
+        hub = FakeHub(error_rate=1)
+        # THEN subscription request should get status 500
+        assert self.request(hub) == 500
+
+        # GIVEN fake hub which throttles every request
+        hub = FakeHub(throttle_rate=1)
+        # THEN subscription request should get status 429
+        assert self.request(hub) == 429
+
+    @patch('websubsub.fakehub.FakeHub.verify')
+    def test_accepted(self, verify):
+        # GIVEN fake hub without errors
+        hub = FakeHub()
+
+        # WHEN subscription request is sent
+        # THEN it should get status 202
+        assert self.request(hub) == 202
+
+        # AND verification request should be scheduled
+        hub.executor.shutdown(wait=True)
+        verify.assert_called_once_with('subscribe', 'news', 'http://wss.io/websubcallback/1', None)
+
+    @responses.activate
+    def test_signed_push(self):
+        # GIVEN fake hub
+        hub = FakeHub()
+        self.addCleanup(hub.server.server_close)
+        callback = 'http://wss.io/websubcallback/1'
+
+        # AND callback which confirms verification and accepts notifications
+        def challenge(request):
+            return 200, {}, parse_qs(urlparse(request.url).query)['hub.challenge'][0]
+        responses.add_callback(responses.GET, callback, callback=challenge)
+        responses.add(responses.POST, callback)
+
+        # WHEN subscription with secret is verified
+        hub.verify('subscribe', 'news', callback, 'secret')
+        assert hub.callbacks == [('news', callback, 'secret')]
+
+        # AND notification is pushed to it
+        assert hub.push(rate=1000, duration=0.001) == 1
+
+        # THEN notification should be signed with the secret
+        request = responses.calls[1].request
+        signature = hmac.new(b'secret', request.body, hashlib.sha256).hexdigest()
+        assert request.headers['X-Hub-Signature'] == f'sha256={signature}'
+
+        # AND pushes from other threads should use their own sessions
+        session = hub.session
+        assert hub.executor.submit(lambda: hub.session).result() is not session
+        hub.executor.shutdown(wait=True)
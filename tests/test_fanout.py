@@ -0,0 +1,130 @@
+from unittest.mock import Mock, patch
+
+import responses
+from django.test import override_settings
+from django.urls import path
+from websubsub import inbox, routing
+from websubsub.models import Consumer, Subscription
+from websubsub.tasks import drain_inbox
+from websubsub.views import WssView
+
+from .base import BaseTestCase
+
+
+news_task = Mock()
+alerts_task = Mock()
+urlpatterns = [
+    path('websubcallback/shared/<uuid:id>', WssView.as_view(None), name='SHARED'),
+    path('websubcallback/news/<uuid:id>', WssView.as_view(news_task), name='NEWS'),
+    path('websubcallback/alerts/<uuid:id>', WssView.as_view(alerts_task), name='ALERTS'),
+]
+
+
+@override_settings(ROOT_URLCONF='tests.test_fanout', WEBSUBSUB_SHARED_URLNAME='SHARED')
+class FanoutTest(BaseTestCase):
+    """
+    One shared hub subscription should deliver notifications to all consumers, and
+    unsubscribe when the last consumer is released.
+    """
+    def setUp(self):
+        news_task.reset_mock()
+        alerts_task.reset_mock()
+        inbox.resolve_view.cache_clear()
+        routing.cache_clear()
+
+        # GIVEN hub which returns HTTP_202_ACCEPTED
+        responses.add('POST', 'http://hub.io', status=202)
+
+        # AND two callbacks registered as consumers of the same topic
+        self.ssn = Subscription.create_shared('news', 'NEWS', hub='http://hub.io')
+        Subscription.create_shared('news', 'ALERTS', hub='http://hub.io')
+
+    def tearDown(self):
+        inbox.resolve_view.cache_clear()
+
+    def test_fanout(self):
+        # THEN only one subscription should be created and subscribed
+        assert Subscription.objects.get().callback_urlname == 'SHARED'
+        assert len(responses.calls) == 1
+
+        # WHEN hub posts notification to the shared callback
+        response = self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+
+        # THEN response status_code should be 200 (ok)
+        assert response.status_code == 200
+
+        # AND both handler tasks should receive it
+        news_task.delay.assert_called_once_with({'test': 'ok'})
+        alerts_task.delay.assert_called_once_with({'test': 'ok'})
+
+    @override_settings(WEBSUBSUB_INBOX=True)
+    def test_inbox(self):
+        # WHEN hub posts notification, and inbox is drained
+        self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+        drain_inbox()
+
+        # THEN both handler tasks should receive it
+        news_task.delay.assert_called_once_with({'test': 'ok'})
+        alerts_task.delay.assert_called_once_with({'test': 'ok'})
+
+    def test_release(self):
+        # GIVEN consumers cached by notification
+        self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+        news_task.reset_mock()
+        alerts_task.reset_mock()
+
+        # WHEN one consumer is released
+        assert Subscription.release_shared('news', 'NEWS', hub='http://hub.io') == 1
+
+        # THEN subscription should stay subscribed
+        assert len(responses.calls) == 1
+
+        # AND released consumer should not receive notifications, although consumers were cached
+        self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+        news_task.delay.assert_not_called()
+        alerts_task.delay.assert_called_once_with({'test': 'ok'})
+
+        # WHEN the last consumer is released
+        assert Subscription.release_shared('news', 'ALERTS', hub='http://hub.io') == 0
+
+        # THEN subscription should be unsubscribed
+        assert len(responses.calls) == 2
+        assert responses.calls[1].request.body.startswith('hub.mode=unsubscribe')
+
+        # WHEN consumer registers again
+        Subscription.create_shared('news', 'NEWS', hub='http://hub.io')
+
+        # THEN the same subscription should be subscribed again
+        assert Subscription.objects.get().unsubscribe_status is None
+        assert len(responses.calls) == 3
+
+    def test_other_process(self):
+        # GIVEN consumers cached by notification
+        self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+        news_task.reset_mock()
+        alerts_task.reset_mock()
+
+        # WHEN another process releases one consumer, without clearing cache of this one
+        with patch.object(routing, 'forget'):
+            Subscription.release_shared('news', 'NEWS', hub='http://hub.io')
+        assert routing.cached(self.ssn.pk)
+
+        # THEN released consumer should not receive notifications
+        self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+        news_task.delay.assert_not_called()
+        alerts_task.delay.assert_called_once_with({'test': 'ok'})
+
+    def test_release_ambiguous(self):
+        # GIVEN the same topic shared at another hub
+        responses.add('POST', 'http://hub2.io', status=202)
+        Subscription.create_shared('news', 'NEWS', hub='http://hub2.io')
+
+        # WHEN consumer is released without hub
+        # THEN exception should be raised, and consumers should stay
+        with self.assertRaises(Exception):
+            Subscription.release_shared('news', 'NEWS')
+        assert Consumer.objects.filter(callback_urlname='NEWS').count() == 2
+
+        # AND with hub only consumer of that hub should be released
+        assert Subscription.release_shared('news', 'NEWS', hub='http://hub2.io') == 0
+        assert Consumer.objects.get(callback_urlname='NEWS').subscription == self.ssn
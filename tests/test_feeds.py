@@ -0,0 +1,221 @@
+import json
+from io import BytesIO
+from unittest.mock import Mock, patch
+
+from django.test import override_settings
+from django.urls import path
+from model_mommy.mommy import make
+from websubsub import feeds, inbox
+from websubsub.models import Subscription
+from websubsub.tasks import drain_inbox
+from websubsub.views import WssView
+
+from .base import BaseTestCase
+
+
+task = Mock()
+urlpatterns = [
+    path('websubcallback/<uuid:id>', WssView.as_view(task), name='FEEDS'),
+]
+
+ATOM = b'''<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <title>News</title>
+  <id>urn:feed</id>
+  <link rel="self" href="https://example.com/feed"/>
+  <entry>
+    <id>urn:1</id>
+    <title>First</title>
+    <link rel="edit" href="https://example.com/edit/1"/>
+    <link href="https://example.com/1"/>
+    <content type="xhtml"><div xmlns="http://www.w3.org/1999/xhtml">Hello <b>world</b></div></content>
+  </entry>
+  <entry>
+    <id>urn:2</id>
+    <title>Second</title>
+  </entry>
+  <updated>2020-01-01T00:00:00Z</updated>
+</feed>'''
+
+RSS = b'''<rss version="2.0"><channel>
+  <title>News</title>
+  <item><guid>1</guid><title>First</title><pubDate>Wed, 01 Jan 2020 00:00:00 GMT</pubDate></item>
+</channel></rss>'''
+
+JSON_FEED = {
+    'version': 'https://jsonfeed.org/version/1.1',
+    'title': 'News',
+    'items': [{'id': '1', 'tags': ['a'], 'score': 1.5}, {'id': '2'}],
+    'author': {'name': 'Bob'},
+}
+
+
+class FeedParserTest(BaseTestCase):
+    """
+    Feed parser should yield entries one at a time along with feed-level members.
+    """
+    def test_atom(self):
+        # WHEN Atom feed is parsed in small chunks
+        with patch.object(feeds, 'CHUNK_SIZE', 16):
+            result = list(feeds.entries(BytesIO(ATOM), 'application/atom+xml; charset=utf-8'))
+
+        # THEN entries should be yielded with feed members seen before them
+        assert [entry for _, entry in result] == [
+            {'id': 'urn:1', 'title': 'First', 'link': 'https://example.com/1', 'content': 'Hello world'},
+            {'id': 'urn:2', 'title': 'Second'},
+        ]
+        assert result[0][0] == {'title': 'News', 'id': 'urn:feed', 'link': 'https://example.com/feed'}
+
+    def test_atom_drops_parsed_entries(self):
+        # GIVEN feed with many entries
+        body = b'<feed xmlns="http://www.w3.org/2005/Atom">' \
+            + b'<entry><id>x</id></entry>' * 1000 + b'</feed>'
+
+        # WHEN it is parsed
+        roots = []
+        class Parser(feeds.XMLPullParser):
+            def read_events(self):
+                for event, element in super().read_events():
+                    if not roots:
+                        roots.append(element)
+                    yield event, element
+        with patch.object(feeds, 'XMLPullParser', Parser):
+            count = sum(1 for _ in feeds.entries(BytesIO(body), 'application/atom+xml'))
+
+        # THEN all entries should be yielded, and parsed entries removed from the tree
+        assert count == 1000
+        assert len(roots[0]) == 0
+
+    def test_rss(self):
+        # WHEN RSS feed is parsed
+        feed = {}
+        result = list(feeds.entries(BytesIO(RSS), 'application/rss+xml', feed))
+
+        # THEN RSS element names should be mapped to Atom ones
+        assert [entry for _, entry in result] == [
+            {'id': '1', 'title': 'First', 'updated': 'Wed, 01 Jan 2020 00:00:00 GMT'}
+        ]
+        assert feed == {'title': 'News'}
+
+    def test_json_feed(self):
+        # WHEN JSON Feed is parsed
+        feed = {}
+        body = json.dumps(JSON_FEED).encode()
+        result = list(feeds.entries(BytesIO(body), 'application/feed+json', feed))
+
+        # THEN items should be yielded as is, and all feed members collected
+        assert [entry for _, entry in result] == JSON_FEED['items']
+        assert result[0][0] == {'version': JSON_FEED['version'], 'title': 'News'}
+        assert feed == {'version': JSON_FEED['version'], 'title': 'News', 'author': {'name': 'Bob'}}
+
+    def test_json_feed_without_ijson(self):
+        # GIVEN ijson is not installed
+        with patch.object(feeds, 'ijson', None):
+            # WHEN JSON Feed is parsed
+            feed = {}
+            body = json.dumps(JSON_FEED).encode()
+            result = [entry for _, entry in feeds.entries(BytesIO(body), 'application/feed+json', feed)]
+
+        # THEN result should be the same
+        assert result == JSON_FEED['items']
+        assert feed == {'version': JSON_FEED['version'], 'title': 'News', 'author': {'name': 'Bob'}}
+
+    def test_json_feed_not_objects(self):
+        for parser in (feeds.ijson, None):
+            with patch.object(feeds, 'ijson', parser):
+                # WHEN JSON Feed with items which are not objects is parsed
+                body = b'{"items": [1, {"id": 2}, [3, {"id": 4}], null, "5"], "title": "News"}'
+                result = list(feeds.entries(BytesIO(body), 'application/feed+json'))
+
+                # THEN only object items should be yielded
+                assert [entry for _, entry in result] == [{'id': 2}]
+
+                for body in (b'[{"id": 1}]', b'"feed"', b'{"items": {"id": 1}}', b'{"items": "1"}'):
+                    # WHEN top-level array, string or non-array items are parsed
+                    # THEN ParseError should be raised
+                    with self.assertRaises(feeds.ParseError):
+                        list(feeds.entries(BytesIO(body), 'application/feed+json'))
+
+    def test_malformed(self):
+        for content_type, body in [('application/atom+xml', ATOM[:-10]), ('application/feed+json', b'{"items": [')]:
+            # WHEN malformed feed is parsed
+            # THEN ParseError should be raised
+            with self.assertRaises(feeds.ParseError):
+                list(feeds.entries(BytesIO(body), content_type))
+
+
+@override_settings(ROOT_URLCONF='tests.test_feeds')
+class FeedParsingViewTest(BaseTestCase):
+    """
+    With feed parsing enabled, handler task should receive parsed feed or its entries.
+    """
+    def setUp(self):
+        task.reset_mock()
+        inbox.resolve_view.cache_clear()
+        self.ssn = make(Subscription, callback_urlname='FEEDS')
+
+    def tearDown(self):
+        inbox.resolve_view.cache_clear()
+
+    def post(self, body, content_type='application/atom+xml'):
+        return self.client.post(self.ssn.reverse_fullurl(), body, content_type=content_type)
+
+    @override_settings(WEBSUBSUB_FEED_PARSING='feed')
+    def test_feed(self):
+        # WHEN hub posts Atom feed
+        response = self.post(ATOM)
+
+        # THEN response status_code should be 200 (ok)
+        assert response.status_code == 200
+
+        # AND handler task should receive all entries and feed members at once
+        data, = task.delay.call_args[0]
+        assert [x['id'] for x in data['entries']] == ['urn:1', 'urn:2']
+        assert data['feed']['updated'] == '2020-01-01T00:00:00Z'
+
+    @override_settings(WEBSUBSUB_FEED_PARSING='entries')
+    def test_entries(self):
+        # WHEN hub posts JSON Feed
+        response = self.post(json.dumps(JSON_FEED), 'application/feed+json')
+
+        # THEN response status_code should be 200 (ok)
+        assert response.status_code == 200
+
+        # AND handler task should be scheduled for every entry
+        assert [x[0][0]['entry']['id'] for x in task.delay.call_args_list] == ['1', '2']
+        assert task.delay.call_args[0][0]['feed']['title'] == 'News'
+
+    @override_settings(WEBSUBSUB_FEED_PARSING='entries')
+    def test_malformed(self):
+        # WHEN hub posts feed which is malformed before the first entry
+        # THEN ParseError should be raised (answered with 400)
+        with self.assertRaises(feeds.ParseError):
+            self.post(ATOM[:150])
+        task.delay.assert_not_called()
+
+        # WHEN hub posts feed which is malformed after the first entry
+        response = self.post(ATOM.replace(b'</entry>\n  <entry>', b'</entry>\n  </entry>'))
+
+        # THEN response status_code should be 200 (ok), as the first entry was published
+        assert response.status_code == 200
+        assert [x[0][0]['entry']['id'] for x in task.delay.call_args_list] == ['urn:1']
+
+    @override_settings(WEBSUBSUB_FEED_PARSING='entries')
+    def test_not_a_feed(self):
+        # WHEN hub posts plain json data
+        self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+
+        # THEN handler task should receive it unchanged
+        task.delay.assert_called_once_with({'test': 'ok'})
+
+    @override_settings(WEBSUBSUB_FEED_PARSING='entries', WEBSUBSUB_INBOX=True)
+    def test_inbox(self):
+        # WHEN hub posts RSS feed, and inbox is drained
+        self.post(RSS, 'application/rss+xml')
+        drain_inbox()
+
+        # THEN handler task should be scheduled for its entry
+        task.delay.assert_called_once_with({
+            'feed': {'title': 'News'},
+            'entry': {'id': '1', 'title': 'First', 'updated': 'Wed, 01 Jan 2020 00:00:00 GMT'},
+        })
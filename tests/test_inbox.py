@@ -0,0 +1,120 @@
+from datetime import timedelta
+from unittest.mock import Mock
+
+from django.core import management
+from django.test import override_settings
+from django.urls import path
+from django.utils.timezone import now
+from model_mommy.mommy import make
+from websubsub import inbox
+from websubsub.models import Notification, Subscription
+from websubsub.tasks import compact_inbox, drain_inbox
+from websubsub.views import WssView
+
+from .base import BaseTestCase
+
+
+task = Mock()
+urlpatterns = [
+    path('websubcallback/<uuid:id>', WssView.as_view(task), name='INBOX'),
+]
+
+
+@override_settings(ROOT_URLCONF='tests.test_inbox', WEBSUBSUB_INBOX=True)
+class InboxTest(BaseTestCase):
+    """
+    With inbox enabled, notifications should be stored, and delivered to handler task
+    by drain_inbox and websub_replay.
+    """
+    def setUp(self):
+        task.reset_mock()
+        inbox.resolve_view.cache_clear()
+        self.ssn = make(Subscription, callback_urlname='INBOX')
+
+    def tearDown(self):
+        inbox.resolve_view.cache_clear()
+
+    def test_drain_and_replay(self):
+        # WHEN hub posts json data to the callback
+        response = self.client.post(self.ssn.reverse_fullurl(), {'test': 'ok'})
+
+        # THEN response status_code should be 200 (ok)
+        assert response.status_code == 200
+
+        # AND notification should be stored, but not delivered yet
+        notification = Notification.objects.get()
+        assert notification.subscription_id == self.ssn.id
+        assert notification.delivered is None
+        task.delay.assert_not_called()
+
+        # WHEN drain_inbox task runs
+        drain_inbox()
+
+        # THEN task.delay() should be called with parsed json data
+        task.delay.assert_called_once_with({'test': 'ok'})
+
+        # AND notification should be marked delivered
+        notification.refresh_from_db()
+        assert notification.delivered is not None
+
+        # AND subscription should be marked as receiving it
+        self.ssn.refresh_from_db()
+        assert self.ssn.time_last_event_received == notification.received
+
+        # WHEN notifications of the subscription are replayed
+        management.call_command('websub_replay', subscription=[str(self.ssn.id)], workers=1)
+
+        # THEN task.delay() should be called again
+        assert task.delay.call_count == 2
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=10, FILE_UPLOAD_MAX_MEMORY_SIZE=10)
+    def test_body_over_upload_limit(self):
+        # WHEN hub posts json body longer than DATA_UPLOAD_MAX_MEMORY_SIZE
+        body = '{"test": "%s"}' % ('x' * 100)
+        response = self.client.post(self.ssn.reverse_fullurl(), body, content_type='application/json')
+
+        # THEN response status_code should be 200 (ok)
+        assert response.status_code == 200
+
+        # AND the whole body should be stored
+        assert bytes(Notification.objects.get().body) == body.encode()
+
+    def test_failed(self):
+        # GIVEN notification which can not be parsed
+        self.client.post(self.ssn.reverse_fullurl(), '{broken', content_type='application/json')
+
+        # WHEN drain_inbox task runs
+        drain_inbox()
+
+        # THEN notification should be marked failed, not delivered
+        notification = Notification.objects.get()
+        assert notification.failed is not None
+        assert notification.delivered is None
+        task.delay.assert_not_called()
+
+        # AND it should be kept by compaction
+        Notification.objects.update(received=now() - timedelta(days=8))
+        compact_inbox()
+        assert Notification.objects.exists()
+
+        # WHEN body is fixed and failed notifications are replayed
+        Notification.objects.update(body=b'{"test": "ok"}')
+        management.call_command('websub_replay', failed=True, workers=1)
+
+        # THEN notification should be delivered
+        task.delay.assert_called_once_with({'test': 'ok'})
+        notification.refresh_from_db()
+        assert (notification.failed, notification.delivered is not None) == (None, True)
+
+    def test_compact(self):
+        # GIVEN old delivered notification, old undelivered and recent delivered ones
+        old = now() - timedelta(days=8)
+        make(Notification, received=old, delivered=old, body=b'')
+        undelivered = make(Notification, received=old, body=b'')
+        recent = make(Notification, delivered=now(), body=b'')
+
+        # WHEN compact_inbox task runs
+        compact_inbox()
+
+        # THEN only old delivered notification should be deleted
+        assert set(Notification.objects.values_list('id', flat=True)) == {undelivered.id, recent.id}
@@ -0,0 +1,89 @@
+from io import BytesIO
+from unittest.mock import Mock
+
+from django.test import RequestFactory, override_settings
+from django.urls import path
+from model_mommy.mommy import make
+from websubsub import limits, routing
+from websubsub.models import Subscription
+from websubsub.views import WssView
+
+from .base import BaseTestCase
+
+
+task = Mock()
+urlpatterns = [
+    path('websubcallback/<uuid:id>', WssView.as_view(task), name='LIMITS'),
+]
+
+
+@override_settings(
+    ROOT_URLCONF='tests.test_limits',
+    WEBSUBSUB_MAX_BODY_SIZE=100,
+    WEBSUBSUB_HUBS={'http://hub.io': {'max_body_size': 20}},
+)
+class BodyLimitTest(BaseTestCase):
+    """
+    Notifications with body over the size limit should be rejected before reading it.
+    """
+    def setUp(self):
+        task.reset_mock()
+        routing.cache_clear()
+
+    def post(self, ssn, body):
+        return self.client.post(ssn.reverse_fullurl(), body, content_type='application/json')
+
+    def test_limits(self):
+        # GIVEN subscriptions with own limit, with hub limit and with global limit
+        own = make(Subscription, callback_urlname='LIMITS', hub_url='http://hub.io', max_body_size=50)
+        hub = make(Subscription, callback_urlname='LIMITS', hub_url='http://hub.io')
+        default = make(Subscription, callback_urlname='LIMITS', hub_url='http://other.io')
+
+        for ssn, limit in [(own, 50), (hub, 20), (default, 100)]:
+            # WHEN hub posts body of the limit size
+            response = self.post(ssn, '"' + 'x' * (limit - 2) + '"')
+
+            # THEN response status_code should be 200 (ok)
+            assert response.status_code == 200
+
+            # WHEN hub posts body over the limit
+            response = self.post(ssn, '"' + 'x' * (limit - 1) + '"')
+
+            # THEN response status_code should be 413 (payload too large)
+            assert response.status_code == 413
+
+        # AND only accepted notifications should reach handler task
+        assert task.delay.call_count == 3
+
+    def test_unknown_length(self):
+        # GIVEN request of unknown length
+        request = RequestFactory().post('/', b'x' * 30, content_type='text/plain')
+        del request.META['CONTENT_LENGTH']
+        request._stream = BytesIO(b'x' * 30)
+        ssn = {'hub_url': 'http://other.io', 'max_body_size': None}
+
+        # WHEN it is checked against the limit
+        # THEN it should be read from temporary file
+        assert limits.check(request, ssn) is None
+        assert request.body == b'x' * 30
+
+        # WHEN body of unknown length exceeds the limit
+        request = RequestFactory().post('/', b'x' * 101, content_type='text/plain')
+        del request.META['CONTENT_LENGTH']
+        request._stream = BytesIO(b'x' * 101)
+
+        # THEN the limit should be returned
+        assert limits.check(request, ssn) == 100
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=10)
+    def test_large_body_spooled(self):
+        # GIVEN request with Content-Length over FILE_UPLOAD_MAX_MEMORY_SIZE
+        request = RequestFactory().post('/', b'x' * 30, content_type='text/plain')
+        ssn = {'hub_url': 'http://other.io', 'max_body_size': None}
+
+        # WHEN it is checked against the limit
+        assert limits.check(request, ssn) is None
+
+        # THEN body should be spooled to disk
+        assert request._spooled._rolled
+        assert request.body == b'x' * 30
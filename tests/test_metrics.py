@@ -0,0 +1,37 @@
+from unittest import skipIf
+
+from django.test import override_settings
+from django.urls import path
+from model_mommy.mommy import make
+from websubsub import metrics
+from websubsub.models import Subscription
+from websubsub.views import metrics_view
+
+from .base import BaseTestCase
+
+
+urlpatterns = [
+    path('metrics', metrics_view),
+]
+
+
+@skipIf(metrics.prometheus_client is None, 'prometheus_client is not installed')
+@override_settings(ROOT_URLCONF='tests.test_metrics')
+class MetricsTest(BaseTestCase):
+    """
+    Metrics view should expose subscriptions by status in prometheus text format.
+    """
+    def test_metrics(self):
+        # GIVEN two verified Subscriptions
+        make(Subscription, hub_url='http://hub.io', topic='news1', subscribe_status='verified')
+        make(Subscription, hub_url='http://hub.io', topic='news2', subscribe_status='verified')
+
+        # WHEN metrics are requested
+        response = self.client.get('/metrics')
+
+        # THEN response should contain subscriptions count by status
+        assert response.status_code == 200
+        assert (
+            'websubsub_subscriptions{hub="http://hub.io",static="False",'
+            'subscribe_status="verified",unsubscribe_status=""} 2.0'
+        ) in response.content.decode()
@@ -0,0 +1,83 @@
+import json
+from unittest.mock import Mock
+
+from django.test import override_settings
+from django.urls import path
+from model_mommy.mommy import make
+from websubsub import ordering
+from websubsub.models import Notification, Subscription
+from websubsub.tasks import drain_inbox
+from websubsub.views import WssView
+
+from .base import BaseTestCase
+
+
+task = Mock()
+urlpatterns = [
+    path('websubcallback/<uuid:id>', WssView.as_view(task), name='ORDERED'),
+]
+
+
+@override_settings(
+    ROOT_URLCONF='tests.test_ordering',
+    WEBSUBSUB_ORDERING={'partitions': 4, 'queue_prefix': 'ordered_'},
+    WEBSUBSUB_ROUTES=[{'queue': 'ignored', 'priority': 9}],
+)
+class OrderingTest(BaseTestCase):
+    """
+    Notifications of one subscription should get increasing sequence numbers and
+    be published to the same partition queue.
+    """
+    def setUp(self):
+        task.reset_mock()
+
+    def test_sequence_and_partition(self):
+        # GIVEN two Subscriptions
+        first = make(Subscription, callback_urlname='ORDERED')
+        second = make(Subscription, callback_urlname='ORDERED')
+
+        # WHEN hub posts two notifications to the first one and one to the second
+        for ssn in (first, first, second):
+            self.client.post(ssn.reverse_fullurl(), {'test': 'ok'})
+
+        # THEN each notification should be published to partition queue of its
+        # subscription, with per-subscription sequence number
+        options = [x.kwargs for x in task.apply_async.call_args_list]
+        assert [(x['queue'], x['headers']['websubsub_sequence']) for x in options] == [
+            (ordering.queue(first.id), 1),
+            (ordering.queue(first.id), 2),
+            (ordering.queue(second.id), 1),
+        ]
+        assert ordering.queue(first.id) == f'ordered_{ordering.partition(first.id)}'
+
+        # AND routing priority should not apply
+        assert all('priority' not in x for x in options)
+
+    @override_settings(WEBSUBSUB_FEED_PARSING='entries')
+    def test_feed_entries(self):
+        # GIVEN Subscription
+        ssn = make(Subscription, callback_urlname='ORDERED')
+        feed = json.dumps({'title': 'News', 'items': [{'id': '1'}, {'id': '2'}]})
+
+        # WHEN hub posts feed with two entries twice
+        for x in range(2):
+            self.client.post(ssn.reverse_fullurl(), feed, content_type='application/feed+json')
+
+        # THEN entries of one notification should share its sequence number
+        headers = [x.kwargs['headers'] for x in task.apply_async.call_args_list]
+        assert [x['websubsub_sequence'] for x in headers] == [1, 1, 2, 2]
+
+    @override_settings(WEBSUBSUB_INBOX=True)
+    def test_inbox(self):
+        # GIVEN Subscription
+        ssn = make(Subscription, callback_urlname='ORDERED')
+
+        # WHEN hub posts two notifications, and inbox is drained
+        self.client.post(ssn.reverse_fullurl(), {'test': 'ok'})
+        self.client.post(ssn.reverse_fullurl(), {'test': 'ok'})
+        drain_inbox()
+
+        # THEN sequence numbers should be stored and passed to handler tasks
+        assert list(Notification.objects.order_by('id').values_list('sequence', flat=True)) == [1, 2]
+        headers = [x.kwargs['headers'] for x in task.apply_async.call_args_list]
+        assert [x['websubsub_sequence'] for x in headers] == [1, 2]
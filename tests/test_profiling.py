@@ -0,0 +1,89 @@
+import tempfile
+import threading
+import time
+
+from django.test import override_settings
+from model_mommy.mommy import make
+from websubsub import profiling
+from websubsub.models import Subscription
+from websubsub.profiling import Profiler
+
+from .base import BaseTestCase
+
+
+def spin(seconds):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+class ProfilingTest(BaseTestCase):
+    """
+    Profiler should sample stacks of every N-th call and dump them in collapsed format.
+    """
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_collapsed_stacks(self):
+        # GIVEN profiler sampling every call
+        profiler = Profiler(rate=1, interval=0.001, dump_dir=self.dir.name)
+
+        # WHEN profiled code runs
+        with profiler.profile('label'):
+            spin(0.1)
+        profiler.shutdown()
+
+        # THEN collapsed stacks of profiled code should be dumped
+        with open(profiler.path) as f:
+            lines = f.read().splitlines()
+        assert lines
+        assert all(x.startswith('label;') for x in lines)
+        assert any('spin (test_profiling.py' in x for x in lines)
+        assert sum(int(x.rsplit(' ', 1)[1]) for x in lines) == profiler.samples
+
+    def test_nested(self):
+        # GIVEN profiler sampling every call
+        profiler = Profiler(rate=1, interval=0.001, dump_dir=self.dir.name)
+
+        # WHEN profiled call runs another one, and continues after it
+        with profiler.profile('outer'):
+            with profiler.profile('inner'):
+                spin(0.05)
+            assert profiler.active == {threading.get_ident(): ['outer']}
+            spin(0.05)
+        profiler.shutdown()
+
+        # THEN all samples should be labeled by the outer call
+        with open(profiler.path) as f:
+            lines = f.read().splitlines()
+        assert lines
+        assert all(x.startswith('outer;') for x in lines)
+        assert profiler.active == {}
+
+    def test_rate(self):
+        # GIVEN profiler sampling every third call
+        profiler = Profiler(rate=3, dump_dir=self.dir.name)
+
+        # WHEN 9 calls are made
+        for i in range(9):
+            with profiler.profile('label'):
+                pass
+        profiler.shutdown()
+
+        # THEN 3 of them should be profiled
+        assert profiler.sampled == 3
+
+    def test_callback(self):
+        # GIVEN profiling enabled for every call
+        options = {'interval': 0.001, 'dump_dir': self.dir.name}
+        with override_settings(WEBSUBSUB_PROFILE_RATE=1, WEBSUBSUB_PROFILE_OPTIONS=options):
+            # WHEN hub posts data to the callback
+            ssn = make(Subscription, callback_urlname='wscallback')
+            self.client.post(ssn.reverse_fullurl(), {'test': 'ok'})
+
+            # THEN callback request and handler task should be profiled
+            assert profiling.get_profiler().sampled == 2
+
@@ -0,0 +1,33 @@
+import responses
+from django.core import management
+from model_mommy.mommy import make
+from websubsub.models import Consumer, Subscription, SubscriptionCounter
+
+from .base import BaseTestCase
+
+
+class PurgeUnresolvableTest(BaseTestCase):
+    """
+    websub_purge_unresolvable should delete only subscriptions with unresolvable urlname.
+    """
+    def test_purge_unresolvable(self):
+        # GIVEN Subscription with resolvable urlname
+        good = make(Subscription, topic='news', callback_urlname='wscallback')
+
+        # AND two Subscriptions with unresolvable urlnames, one with consumer
+        old = make(Subscription, topic='news1', callback_urlname='old_wscallback')
+        make(Subscription, topic='news2', callback_urlname='older_wscallback')
+        make(Consumer, subscription=old, callback_urlname='wscallback')
+
+        # WHEN websub_purge_unresolvable is called
+        management.call_command('websub_purge_unresolvable', yes=True)
+
+        # THEN only Subscription with resolvable urlname should remain
+        assert list(Subscription.objects.values_list('id', flat=True)) == [good.id]
+
+        # AND consumers of deleted ones should be deleted
+        assert not Consumer.objects.exists()
+
+        # AND counters should count only the remaining one
+        counters = SubscriptionCounter.objects.filter(count__gt=0)
+        assert list(counters.values_list('count', flat=True)) == [1]
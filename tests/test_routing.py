@@ -0,0 +1,64 @@
+from unittest.mock import Mock
+
+from django.test import override_settings
+from django.urls import path
+from model_mommy.mommy import make
+from websubsub import routing
+from websubsub.models import Subscription
+from websubsub.views import WssView
+
+from .base import BaseTestCase
+
+
+task = Mock()
+urlpatterns = [
+    path('websubcallback/<uuid:id>', WssView.as_view(task), name='ROUTED'),
+]
+
+ROUTES = [
+    {'topic': 'live/*', 'queue': 'live', 'priority': 9},
+    {'hub': 'http://noisy.io', 'queue': 'bulk'},
+]
+
+
+@override_settings(ROOT_URLCONF='tests.test_routing', WEBSUBSUB_ROUTES=ROUTES)
+class RoutingTest(BaseTestCase):
+    """
+    Handler task should be published to queue and priority of the first matching route.
+    """
+    def setUp(self):
+        task.reset_mock()
+        routing.cache_clear()
+
+    def post(self, **kwargs):
+        ssn = make(Subscription, callback_urlname='ROUTED', **kwargs)
+        response = self.client.post(ssn.reverse_fullurl(), {'test': 'ok'})
+        assert response.status_code == 200
+
+    def test_topic_pattern(self):
+        # WHEN notification of subscription with matching topic is received
+        self.post(topic='live/football', hub_url='http://noisy.io')
+
+        # THEN handler task should be published to the queue of the first route
+        task.apply_async.assert_called_once_with(({'test': 'ok'},), None, queue='live', priority=9)
+
+    def test_hub(self):
+        # WHEN notification of subscription with matching hub is received
+        self.post(topic='news', hub_url='http://noisy.io')
+
+        # THEN handler task should be published to the queue of the hub route
+        task.apply_async.assert_called_once_with(({'test': 'ok'},), None, queue='bulk')
+
+    def test_subscription_priority(self):
+        # WHEN notification of subscription with priority is received
+        self.post(topic='news', hub_url='http://noisy.io', priority=5)
+
+        # THEN subscription priority should override the route
+        task.apply_async.assert_called_once_with(({'test': 'ok'},), None, queue='bulk', priority=5)
+
+    def test_no_route(self):
+        # WHEN notification of subscription without matching route is received
+        self.post(topic='news', hub_url='http://hub.io')
+
+        # THEN handler task should be scheduled as usual
+        task.delay.assert_called_once_with({'test': 'ok'})
@@ -0,0 +1,124 @@
+import hashlib
+import hmac
+from unittest.mock import Mock
+
+import responses
+from django.test import RequestFactory, override_settings
+from django.urls import path
+from model_mommy.mommy import make
+from websubsub import routing, signatures
+from websubsub.models import Subscription
+from websubsub.tasks import subscribe
+from websubsub.views import WssView
+
+from .base import BaseTestCase, method_url_body
+
+
+task = Mock()
+urlpatterns = [
+    path('websubcallback/<uuid:id>', WssView.as_view(task), name='SIGNED'),
+]
+
+
+def sign(secret, body, method='sha256'):
+    return f'{method}=' + hmac.new(secret.encode(), body, getattr(hashlib, method)).hexdigest()
+
+
+class SecretTest(BaseTestCase):
+    """
+    Subscribe task should generate secret once and send it to hub.
+    """
+    @override_settings(WEBSUBSUB_HUB_SECRETS=True)
+    def test_subscribe(self):
+        # GIVEN hub which returns HTTP_202_ACCEPTED
+        responses.add('POST', 'http://hub.io', status=202)
+
+        # WHEN Subscription.create() called, and then resubscribed
+        ssn = Subscription.create('news', urlname='wscallback', hub='http://hub.io')
+        ssn.refresh_from_db()
+        ssn.subscribe()
+
+        # THEN secret should be generated
+        ssn.refresh_from_db()
+        assert len(ssn.secret) == 64
+
+        # AND the same secret should be sent to hub with both requests
+        assert [method_url_body(x)[2]['hub.secret'] for x in responses.calls] == [[ssn.secret]] * 2
+
+
+@override_settings(ROOT_URLCONF='tests.test_signatures')
+class SignatureTest(BaseTestCase):
+    """
+    Notifications with missing or invalid signature should be dropped.
+    """
+    def setUp(self):
+        task.reset_mock()
+        routing.cache_clear()
+        self.ssn = make(Subscription, callback_urlname='SIGNED', secret='s3cret')
+
+    def post(self, signature=None, body=b'{"test": "ok"}'):
+        headers = {'HTTP_X_HUB_SIGNATURE': signature} if signature else {}
+        return self.client.post(
+            self.ssn.reverse_fullurl(), body, content_type='application/json', **headers
+        )
+
+    def test_valid(self):
+        for method in signatures.METHODS:
+            # WHEN hub posts notification signed with the secret
+            response = self.post(sign('s3cret', b'{"test": "ok"}', method))
+
+            # THEN response status_code should be 200 (ok)
+            assert response.status_code == 200
+
+        # AND handler task should receive all notifications
+        assert task.delay.call_count == 4
+        task.delay.assert_called_with({'test': 'ok'})
+
+    def test_invalid(self):
+        for signature in [None, sign('wrong', b'{"test": "ok"}'), 'md5=abc', 'sha256']:
+            # WHEN hub posts notification with missing or invalid signature
+            response = self.post(signature)
+
+            # THEN it should be acknowledged
+            assert response.status_code == 200
+
+        # AND handler task should not be scheduled
+        task.delay.assert_not_called()
+
+    @override_settings(WEBSUBSUB_HUB_SECRETS=True)
+    def test_secret_generated(self):
+        # GIVEN cached subscription without secret
+        ssn = make(Subscription, callback_urlname='SIGNED', hub_url='http://hub.io')
+        routing.subscription(ssn.id)
+
+        # WHEN it is resubscribed with generated secret
+        responses.add('POST', 'http://hub.io', status=202)
+        ssn.subscribe()
+
+        # AND hub posts notification without signature
+        response = self.client.post(ssn.reverse_fullurl(), {'test': 'ok'})
+
+        # THEN it should be acknowledged, but dropped
+        assert response.status_code == 200
+        task.delay.assert_not_called()
+
+        # WHEN secret was generated by another process
+        Subscription.objects.filter(id=ssn.id).update(secret=None)
+        routing.cache_clear()
+        routing.subscription(ssn.id)
+        Subscription.objects.filter(id=ssn.id).update(secret='other')
+
+        # THEN notification without signature should be dropped too
+        self.client.post(ssn.reverse_fullurl(), {'test': 'ok'})
+        task.delay.assert_not_called()
+
+    def test_streaming(self):
+        # GIVEN request with body not read yet
+        body = b'x' * 200000
+        request = RequestFactory().post('/', body, content_type='text/plain',
+                                        HTTP_X_HUB_SIGNATURE=sign('s3cret', body, 'sha512'))
+
+        # WHEN signature is verified
+        # THEN it should be valid, and body should still be readable
+        assert signatures.verify(request, 's3cret')
+        assert request.body == body
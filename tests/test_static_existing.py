@@ -56,6 +56,9 @@ class StaticSubscriptionExistingTest(BaseTestCase):
                 'hub_url': 'http://hub.io/',
                 'huberror_count': 0,
                 'lease_expiration_time': None,
+                'max_body_size': None,
+                'priority': None,
+                'secret': None,
                 'subscribe_attempt_time': ANY,
                 'subscribe_status': 'verifying',
                 'time_created': ANY,
@@ -0,0 +1,95 @@
+from unittest import skipIf
+from unittest.mock import patch
+
+import responses
+from django.test import override_settings
+from mockredis import mock_strict_redis_client
+from model_mommy.mommy import make
+from websubsub import backends, tracing
+from websubsub.models import Subscription
+
+from .base import BaseTestCase
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+except ImportError:
+    trace = None
+
+
+exporter = None
+
+
+def spans():
+    return {x.name: x for x in exporter.get_finished_spans()}
+
+
+@skipIf(trace is None, 'opentelemetry-sdk is not installed')
+@override_settings(WEBSUBSUB_TRACING=True)
+class TracingTest(BaseTestCase):
+    """
+    Spans of the whole subscription and notification paths should belong to one trace.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        global exporter
+        if exporter is None:
+            exporter = InMemorySpanExporter()
+            provider = TracerProvider()
+            provider.add_span_processor(SimpleSpanProcessor(exporter))
+            trace.set_tracer_provider(provider)
+
+    def setUp(self):
+        exporter.clear()
+        patch('dumblock.redis', tracing.TracedRedis(mock_strict_redis_client())).start()
+
+    def test_subscribe(self):
+        # GIVEN hub which returns HTTP_202_ACCEPTED
+        responses.add('POST', 'http://hub.io', status=202)
+
+        # WHEN Subscription.create() called
+        Subscription.create('news', urlname='wscallback')
+        ssn = Subscription.objects.get()
+
+        # THEN task span should be a child of publish span
+        recorded = spans()
+        publish = recorded['websubsub.publish websubsub.tasks.subscribe']
+        task = recorded['websubsub.task websubsub.tasks.subscribe']
+        assert task.parent.span_id == publish.context.span_id
+        assert task.attributes['websubsub.pk'] == str(ssn.pk)
+
+        # AND lock wait, hub request and db queries should be recorded inside task span
+        for name in ('websubsub.lock_wait', 'websubsub.hub_request', 'websubsub.db'):
+            assert recorded[name].context.trace_id == task.context.trace_id
+        assert recorded['websubsub.hub_request'].attributes['websubsub.hub'] == 'http://hub.io'
+        assert recorded['websubsub.lock_wait'].attributes['websubsub.lock_acquired'] is True
+
+    @override_settings(WEBSUBSUB_TASK_BACKEND='websubsub.backends.ThreadPoolBackend')
+    def test_notification_in_thread_pool(self):
+        # GIVEN Subscription
+        ssn = make(Subscription, callback_urlname='wscallback')
+
+        # WHEN hub posts data to the callback, and handler runs in another thread
+        response = self.client.post(ssn.reverse_fullurl(), {'test': 'ok'})
+        backends.get_backend().drain(5)
+
+        # THEN handler task span should belong to the trace of callback request
+        assert response.status_code == 200
+        recorded = spans()
+        callback = recorded['websubsub.callback POST']
+        handler = recorded['websubsub.task tests.djangoproject.tasks.websub_handler']
+        assert callback.attributes['websubsub.pk'] == str(ssn.pk)
+        assert handler.context.trace_id == callback.context.trace_id
+
+    def test_disabled(self):
+        # GIVEN tracing disabled
+        with override_settings(WEBSUBSUB_TRACING=False):
+            # WHEN hub posts data to the callback
+            ssn = make(Subscription, callback_urlname='wscallback')
+            self.client.post(ssn.reverse_fullurl(), {'test': 'ok'})
+
+        # THEN no spans should be recorded
+        assert spans() == {}
@@ -0,0 +1,148 @@
+from unittest.mock import Mock, patch
+from uuid import uuid4
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from model_mommy.mommy import make
+from websubsub import routing, unwanted
+from websubsub.models import Subscription
+from websubsub.views import WssView
+
+from .base import BaseTestCase
+
+
+task = Mock()
+urlpatterns = [
+    path('websubcallback/<uuid:id>', WssView.as_view(task), name='UNWANTED'),
+]
+
+
+@override_settings(ROOT_URLCONF='tests.test_unwanted', WEBSUBSUB_NEGATIVE_CACHE_TTL=60)
+class UnwantedTest(BaseTestCase):
+    """
+    Repeated requests to unknown subscriptions should be answered without database queries.
+    """
+    def setUp(self):
+        task.reset_mock()
+        routing.cache_clear()
+
+    def test_negative_cache(self):
+        # GIVEN unknown subscription id
+        url = reverse('UNWANTED', args=[uuid4()])
+
+        # WHEN hub posts to it
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.post(url, {'test': 'ok'})
+
+        # THEN response status_code should be 410 (gone)
+        assert response.status_code == 410
+        assert len(first) == 1
+
+        # WHEN hub posts to it and sends verification request again
+        with CaptureQueriesContext(connection) as repeated:
+            post = self.client.post(url, {'test': 'ok'})
+            get = self.client.get(url, {'hub.topic': 'news', 'hub.mode': 'subscribe'})
+
+        # THEN responses should be the same, without database queries
+        assert (post.status_code, get.status_code) == (410, 400)
+        assert len(repeated) == 0
+
+    def test_expiry(self):
+        # GIVEN unknown id in the cache
+        cache = unwanted.NegativeCache(ttl=10, size=2)
+        cache.add('a')
+        assert 'a' in cache
+
+        # WHEN ttl passes
+        with patch('time.monotonic', return_value=unwanted.time.monotonic() + 11):
+            # THEN id should be forgotten
+            assert 'a' not in cache
+
+        # WHEN more ids than cache size are added
+        cache.add('b')
+        cache.add('c')
+        cache.add('d')
+
+        # THEN the oldest ones should be evicted
+        assert list(cache.expires) == ['c', 'd']
+
+    @override_settings(
+        WEBSUBSUB_NEGATIVE_CACHE_TTL=0,
+        WEBSUBSUB_UNWANTED_RATE_LIMIT={'rate': 0.5, 'burst': 2, 'header': 'HTTP_X_FORWARDED_FOR'},
+    )
+    def test_rate_limit(self):
+        # WHEN scanner posts to random ids
+        statuses = [
+            self.client.post(
+                reverse('UNWANTED', args=[uuid4()]), {'test': 'ok'},
+                HTTP_X_FORWARDED_FOR='10.0.0.1, 127.0.0.1'
+            )
+            for x in range(3)
+        ]
+
+        # THEN requests over the burst should be answered with 429 and Retry-After
+        assert [x.status_code for x in statuses] == [410, 410, 429]
+        assert statuses[2]['Retry-After'] == '2'
+
+        # AND other sources should not be limited
+        response = self.client.post(reverse('UNWANTED', args=[uuid4()]), {'test': 'ok'})
+        assert response.status_code == 410
+
+    def test_created(self):
+        # GIVEN unknown subscription id in the cache
+        id = uuid4()
+        url = reverse('UNWANTED', args=[id])
+        assert self.client.post(url, {'test': 'ok'}).status_code == 410
+
+        # WHEN subscription with this id is created
+        make(Subscription, id=id, callback_urlname='UNWANTED')
+
+        # THEN its notifications should be accepted
+        assert self.client.post(url, {'test': 'ok'}).status_code == 200
+        task.delay.assert_called_once_with({'test': 'ok'})
+
+    @override_settings(WEBSUBSUB_UNWANTED_RATE_LIMIT={'rate': 0.5, 'burst': 1})
+    def test_rate_limit_cached(self):
+        # GIVEN cached subscription
+        ssn = make(Subscription, callback_urlname='UNWANTED')
+        assert self.client.post(ssn.reverse_fullurl(), {'test': 'ok'}).status_code == 200
+
+        # AND source which exhausted its bucket
+        self.client.post(reverse('UNWANTED', args=[uuid4()]), {'test': 'ok'})
+        response = self.client.post(reverse('UNWANTED', args=[uuid4()]), {'test': 'ok'})
+        assert response.status_code == 429
+
+        # WHEN the source posts to the cached subscription
+        response = self.client.post(ssn.reverse_fullurl(), {'test': 'ok'})
+
+        # THEN notification should be accepted
+        assert response.status_code == 200
+
+    @override_settings(WEBSUBSUB_UNWANTED_RATE_LIMIT={'rate': 0.5, 'burst': 1})
+    def test_rate_limit_existing(self):
+        # GIVEN source which exhausted its bucket on unknown ids
+        self.client.post(reverse('UNWANTED', args=[uuid4()]), {'test': 'ok'})
+        response = self.client.post(reverse('UNWANTED', args=[uuid4()]), {'test': 'ok'})
+        assert response.status_code == 429
+
+        # WHEN hub from the same source verifies a new subscription
+        ssn = make(
+            Subscription, callback_urlname='UNWANTED', topic='news', subscribe_status='verifying'
+        )
+        response = self.client.get(ssn.reverse_fullurl(), {
+            'hub.topic': 'news', 'hub.challenge': '123', 'hub.lease_seconds': 100,
+            'hub.mode': 'subscribe'
+        })
+
+        # THEN verification should succeed
+        assert (response.status_code, response.content) == (200, b'123')
+
+        # WHEN it posts to the subscription, which is not cached yet
+        routing.cache_clear()
+        response = self.client.post(ssn.reverse_fullurl(), {'test': 'ok'})
+
+        # THEN notification should be accepted
+        assert response.status_code == 200
+        task.delay.assert_called_once_with({'test': 'ok'})
@@ -1,9 +1,99 @@
+from django.conf import settings
 from django.contrib import admin
-from .models import Subscription
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .models import Consumer, Subscription, SubscriptionCounter
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator which avoids exact `SELECT COUNT(*)` over the whole table. On
+    PostgreSQL unfiltered count is taken from planner statistics.
+    """
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        connection = connections[self.object_list.db]
+        if connection.vendor == 'postgresql' and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [query.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            # reltuples is -1 or 0 if table was never analyzed.
+            if row and row[0] > 0:
+                return int(row[0])
+        return super().count
+
+
+class HubListFilter(admin.SimpleListFilter):
+    """
+    Filter by hub, with choices from SubscriptionCounter and settings instead of
+    `SELECT DISTINCT hub_url` over the whole subscriptions table.
+    """
+    title = 'hub url'
+    parameter_name = 'hub_url'
+
+    def lookups(self, request, model_admin):
+        hubs = set(settings.WEBSUBSUB_HUBS)
+        if settings.WEBSUBSUB_DEFAULT_HUB_URL:
+            hubs.add(settings.WEBSUBSUB_DEFAULT_HUB_URL)
+        counters = SubscriptionCounter.objects.filter(count__gt=0)
+        hubs.update(counters.values_list('hub_url', flat=True).distinct())
+        return [(hub, hub) for hub in sorted(hubs)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(hub_url=self.value())
+        return queryset
+
+
+class ConsumerInline(admin.TabularInline):
+    model = Consumer
+    extra = 0
 
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'topic', 'subscribe_status', 'callback_urlname')
-    list_filter = ('topic',)
+    list_display = (
+        'pk', 'topic', 'hub_url', 'subscribe_status', 'unsubscribe_status', 'callback_urlname',
+        'priority'
+    )
+    # Choices of status and static filters are static, of hub filter are read from
+    # SubscriptionCounter, so no filter scans subscriptions. Every filter is served by
+    # an index, see Subscription.Meta.
+    list_filter = ('subscribe_status', 'unsubscribe_status', HubListFilter, 'static')
+    # Searched by topic prefix, see get_search_results()
+    search_fields = ('topic',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['resubscribe', 'unsubscribe', 'reset_counters']
+    inlines = [ConsumerInline]
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Case-sensitive topic prefix search, served by websubsub_topic_prefix
+        index. Admin '^topic' search would use UPPER(topic) LIKE, which no index serves.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(topic__startswith=search_term), False
+
+    def resubscribe(self, request, queryset):
+        count = queryset.resubscribe()
+        self.message_user(request, f'{count} subscriptions scheduled to resubscribe.')
+    resubscribe.short_description = 'Reset counters and resubscribe'
+
+    def unsubscribe(self, request, queryset):
+        count = queryset.unsubscribe()
+        self.message_user(request, f'{count} subscriptions scheduled to unsubscribe.')
+    unsubscribe.short_description = 'Reset counters and unsubscribe'
 
+    def reset_counters(self, request, queryset):
+        count = queryset.reset_counters()
+        self.message_user(request, f'{count} subscriptions retry counters reset.')
+    reset_counters.short_description = 'Reset retry counters'
@@ -0,0 +1,118 @@
+"""
+Admission control of notifications.
+
+When task workers fall behind, callback view would keep publishing handler
+tasks until the broker runs out of memory. With settings.WEBSUBSUB_ADMISSION
+set, `WssView.post` checks the depth of the queue the handler task would be
+published to, after routing (see websubsub.routing and websubsub.ordering),
+sampled at most once per `interval` seconds by every process:
+
+ * Below `soft_limit` all notifications are accepted.
+ * Between `soft_limit` and `hard_limit` notifications of lower priority
+   callbacks are shed with 429 status first. Priority of callback urlname is
+   looked up in `priorities` dict, default priority is 0. Callbacks with
+   priority p are shed when depth exceeds
+   `soft_limit + (hard_limit - soft_limit) * p / (max priority + 1)`.
+ * Above `hard_limit` all notifications are rejected with 503 status.
+
+Both responses have Retry-After header, so hubs retry delivery later.
+
+>>> WEBSUBSUB_ADMISSION = {
+>>>     'soft_limit': 10000,
+>>>     'hard_limit': 50000,
+>>>     'priorities': {'webnews': 1, 'webpayments': 2},
+>>> }
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+from . import backends, metrics
+
+logger = logging.getLogger('websubsub.admission')
+
+
+def queue_name(task):
+    queue = getattr(task, 'queue', None)
+    if queue:
+        return queue
+    app = getattr(task, 'app', None)
+    # Plain functions run by local backends share one queue.
+    return app.conf.task_default_queue if app else 'default'
+
+
+class AdmissionController(object):
+    def __init__(self, soft_limit, hard_limit, interval=1, retry_after=60, priorities=None):
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+        self.interval = interval
+        self.retry_after = retry_after
+        self.priorities = priorities or {}
+        self.levels = max(self.priorities.values(), default=0) + 1
+        # Sampled depths: {queue name: (monotonic time, depth)}
+        self.samples = {}
+        self.sampling = threading.Lock()
+
+    def depth(self, task, queue=None):
+        """
+        Return depth of the queue, by default of the task queue, sampled at
+        most once per interval.
+        """
+        queue = queue or queue_name(task)
+        sampled, depth = self.samples.get(queue, (None, 0))
+        # Only one thread samples, others use previous value meanwhile.
+        if (sampled is None or time.monotonic() - sampled > self.interval) \
+           and self.sampling.acquire(blocking=False):
+            try:
+                depth = backends.get_backend().queue_depth(task, queue)
+            except Exception as e:
+                logger.warning(f'Failed to get queue {queue} depth: {e!r}')
+                depth = 0
+            finally:
+                self.sampling.release()
+            self.samples[queue] = (time.monotonic(), depth)
+            metrics.QUEUE_DEPTH.labels(queue).set(depth)
+        return depth
+
+    def check(self, urlname, task, queue=None):
+        """
+        Return None if notification is accepted, otherwise response status code.
+        Pass queue the task is routed to, if it is not the task default queue.
+        """
+        depth = self.depth(task, queue)
+        if depth < self.soft_limit:
+            return None
+        if depth >= self.hard_limit:
+            metrics.ADMISSION.labels(urlname, 'rejected').inc()
+            return 503
+        priority = self.priorities.get(urlname, 0)
+        threshold = self.soft_limit + (self.hard_limit - self.soft_limit) * priority / self.levels
+        if depth >= threshold:
+            metrics.ADMISSION.labels(urlname, 'shed').inc()
+            return 429
+        return None
+
+
+_controller = None
+
+
+def get_controller():
+    """
+    Return AdmissionController configured in settings, or None if disabled.
+    """
+    global _controller
+    if _controller is None and settings.WEBSUBSUB_ADMISSION:
+        _controller = AdmissionController(**settings.WEBSUBSUB_ADMISSION)
+    return _controller
+
+
+def _reset_controller(*, setting, **kwargs):
+    global _controller
+    if setting in ('WEBSUBSUB_ADMISSION', 'WEBSUBSUB_TASK_BACKEND'):
+        _controller = None
+
+
+setting_changed.connect(_reset_controller)
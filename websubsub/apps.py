@@ -29,13 +29,48 @@ class WebsubsubConfig(AppConfig):
     WEBSUBSUB_HUBS = {}
     WEBSUBSUB_DEFAULT_HUB_URL = None
     WEBSUBSUB_AUTOFIX_URLS = True
+    WEBSUBSUB_DISPATCH_BATCH_SIZE = 500
+    WEBSUBSUB_DEDUP_TTL = 3600  # seconds
+    WEBSUBSUB_TASK_BACKEND = 'websubsub.backends.CeleryBackend'
+    WEBSUBSUB_TASK_BACKEND_OPTIONS = {}
+    WEBSUBSUB_TRACING = False
+    WEBSUBSUB_TRACING_EXPORTER = None
+    WEBSUBSUB_PROFILE_RATE = 0
+    WEBSUBSUB_PROFILE_OPTIONS = {}
+    WEBSUBSUB_INBOX = False
+    WEBSUBSUB_INBOX_RETENTION = 7 * 24 * 3600  # seconds
+    WEBSUBSUB_DEDUP_NOTIFICATIONS = None  # 'digest' or 'id'
+    WEBSUBSUB_DEDUP_NOTIFICATIONS_WINDOW = 3600  # seconds
+    WEBSUBSUB_DEDUP_NOTIFICATIONS_STORE = 'redis'  # or 'bloom'
+    WEBSUBSUB_DEDUP_BLOOM_CAPACITY = 100000
+    WEBSUBSUB_ADMISSION = None
+    WEBSUBSUB_ROUTES = None
+    WEBSUBSUB_ORDERING = None
+    WEBSUBSUB_FEED_PARSING = None  # 'feed' or 'entries'
+    WEBSUBSUB_ENTRY_CHANGES = None  # 'changed' or 'removed'
+    WEBSUBSUB_ENTRY_INDEX_TTL = 30 * 24 * 3600  # seconds
+    WEBSUBSUB_ENTRY_INDEX_SIZE = 10000
+    WEBSUBSUB_ENVELOPE = None
+    WEBSUBSUB_MAX_BODY_SIZE = None  # bytes
+    WEBSUBSUB_NEGATIVE_CACHE_TTL = None  # seconds
+    WEBSUBSUB_UNWANTED_RATE_LIMIT = None
+    WEBSUBSUB_HUB_SECRETS = False
+    WEBSUBSUB_SHARED_URLNAME = None
+    WEBSUBSUB_DISCOVER_HUBS = False
+    WEBSUBSUB_DISCOVERY_TTL = 3600  # seconds
+    WEBSUBSUB_DISCOVERY_CONCURRENCY = 8
 
     def ready(self):
         # Initialize settings with default values.
         for name in dir(self):
             if name.isupper() and not hasattr(settings, name):
                 setattr(settings, name, getattr(self, name))
-                
+
+        from . import tracing
+        tracing.setup()
+        # Register kombu serializer of handler task payloads.
+        from . import envelope
+
         argv = ' '.join(sys.argv)
         if 'test' in argv or 'pytest' in argv or 'py.test' in argv:
             return
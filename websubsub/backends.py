@@ -0,0 +1,307 @@
+"""
+Task execution backends.
+
+All tasks are scheduled through the backend configured in
+settings.WEBSUBSUB_TASK_BACKEND:
+
+ * `websubsub.backends.CeleryBackend` (default) - publish tasks to celery broker.
+ * `websubsub.backends.ThreadPoolBackend` - run tasks in a bounded in-process thread pool.
+ * `websubsub.backends.AsyncioBackend` - run tasks in an asyncio event loop in a
+   background thread. Handler may be a coroutine function.
+
+Local backends accept celery tasks as well as plain functions, so handler
+tasks passed to `WssView.as_view()` do not have to be celery tasks.
+Backend options are passed from settings.WEBSUBSUB_TASK_BACKEND_OPTIONS.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from celery.signals import before_task_publish, task_prerun, task_postrun
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+from . import metrics, profiling, tracing
+
+logger = logging.getLogger('websubsub.backends')
+
+
+class BackendFull(Exception):
+    """
+    Local backend queue is full and task could not be queued in time.
+    """
+
+
+# Set while CeleryBackend publishes task, to mark messages sent by websubsub.
+_publishing = threading.local()
+
+
+@before_task_publish.connect
+def _add_headers(headers=None, **kwargs):
+    if getattr(_publishing, 'active', False) and headers is not None:
+        headers['websubsub_enqueued'] = time.time()
+        headers.update(tracing.inject())
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, task=None, kwargs=None, **kw):
+    enqueued = task.request.get('websubsub_enqueued')
+    metrics.observe_queue_delay(task, enqueued)
+    # Trace tasks published by websubsub, including eager ones, and websubsub
+    # tasks started by celery beat.
+    if enqueued or getattr(_publishing, 'active', False) or task.name.startswith('websubsub.'):
+        tracing.start_task_span(task_id, task, kwargs)
+        _profiled[task_id] = profiling.start(task.name)
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, **kwargs):
+    profiling.stop(_profiled.pop(task_id, None))
+    tracing.end_task_span(task_id)
+
+
+# Profiler tokens of running celery tasks, by task id.
+_profiled = {}
+
+# Set in threads running tasks of a local backend.
+_worker = threading.local()
+
+
+class CeleryBackend(object):
+    def delay(self, task, *args, **kwargs):
+        attributes = {'websubsub.task': task.name, 'websubsub.pk': kwargs.get('pk')}
+        with tracing.span(f'websubsub.publish {task.name}', attributes):
+            _publishing.active = True
+            try:
+                return task.delay(*args, **kwargs)
+            finally:
+                _publishing.active = False
+
+    def apply_async(self, task, args=(), kwargs=None, **options):
+        """
+        Publish task with celery options, e.g. queue and priority.
+        """
+        attributes = {'websubsub.task': task.name, 'websubsub.queue': options.get('queue')}
+        with tracing.span(f'websubsub.publish {task.name}', attributes):
+            _publishing.active = True
+            try:
+                return task.apply_async(args, kwargs, **options)
+            finally:
+                _publishing.active = False
+
+    def queue_depth(self, task, queue=None):
+        """
+        Number of messages waiting in the broker queue, by default in the queue of the task.
+        """
+        app = task.app
+        queue = queue or getattr(task, 'queue', None) or app.conf.task_default_queue
+        with app.connection_or_acquire() as connection:
+            try:
+                return connection.default_channel.queue_declare(queue=queue, passive=True).message_count
+            except connection.channel_errors:
+                # Queue is not declared yet.
+                return 0
+
+    def delay_many(self, task, kwargs_list):
+        from celery import group
+        attributes = {'websubsub.task': task.name, 'websubsub.count': len(kwargs_list)}
+        with tracing.span(f'websubsub.publish {task.name}', attributes):
+            _publishing.active = True
+            try:
+                return group(task.s(**kwargs) for kwargs in kwargs_list).apply_async()
+            finally:
+                _publishing.active = False
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class LocalBackend(object):
+    """
+    Base class for in-process backends. At most `workers + queue_size` tasks
+    can be queued or running, further `delay()` calls block for up to
+    `submit_timeout` seconds and then raise BackendFull. Tasks scheduling
+    other tasks do not wait for a free slot, as slots are freed by the
+    workers they occupy.
+    """
+    def __init__(self, workers=4, queue_size=1000, submit_timeout=5, drain_timeout=30):
+        self.workers = workers
+        self.submit_timeout = submit_timeout
+        self.drain_timeout = drain_timeout
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.pending = 0
+        self.pending_lock = threading.Condition()
+        self.closed = False
+        atexit.register(self.shutdown)
+
+    def delay(self, task, *args, **kwargs):
+        """
+        Queue task and return concurrent.futures.Future of its result.
+        """
+        if self.closed:
+            raise BackendFull(f'{type(self).__name__} is shut down')
+        if self.in_worker():
+            acquired = self.slots.acquire(blocking=False)
+        else:
+            acquired = self.slots.acquire(timeout=self.submit_timeout)
+        if not acquired:
+            raise BackendFull(f'{type(self).__name__} queue is full')
+        with self.pending_lock:
+            self.pending += 1
+        try:
+            return self.submit(task, args, kwargs, time.time(), tracing.inject())
+        except Exception:
+            self.done()
+            raise
+
+    def delay_many(self, task, kwargs_list):
+        for kwargs in kwargs_list:
+            self.delay(task, **kwargs)
+
+    def apply_async(self, task, args=(), kwargs=None, **options):
+        # Queue and priority options are ignored.
+        return self.delay(task, *args, **(kwargs or {}))
+
+    def queue_depth(self, task, queue=None):
+        return self.pending
+
+    def in_worker(self):
+        """
+        Return True if called by a task run by this backend.
+        """
+        return getattr(_worker, 'backend', None) is self
+
+    def run(self, task, args, kwargs, enqueued, carrier=None):
+        """
+        Run task synchronously in the current thread, like celery worker would.
+        `carrier` is trace context of the code which queued the task.
+        """
+        metrics.observe_queue_delay(task, enqueued)
+        close_old_connections()
+        _worker.backend = self
+        try:
+            with tracing.task_span(task, kwargs, carrier), \
+                 profiling.profile(metrics.task_name(task)):
+                return task(*args, **kwargs)
+        except Exception:
+            logger.exception(f'Task {metrics.task_name(task)} failed')
+        finally:
+            _worker.backend = None
+            close_old_connections()
+
+    def done(self):
+        self.slots.release()
+        with self.pending_lock:
+            self.pending -= 1
+            self.pending_lock.notify_all()
+
+    def drain(self, timeout=None):
+        """
+        Wait until all queued tasks complete. Returns False on timeout.
+        """
+        with self.pending_lock:
+            return self.pending_lock.wait_for(lambda: self.pending == 0, timeout)
+
+    def submit(self, task, args, kwargs, enqueued, carrier):
+        raise NotImplementedError
+
+    def shutdown(self, wait=True):
+        self.closed = True
+        atexit.unregister(self.shutdown)
+        # Task can not wait for itself to complete.
+        if wait and not self.in_worker() and not self.drain(self.drain_timeout):
+            logger.warning(f'{type(self).__name__}: {self.pending} tasks did not complete in time.')
+
+
+class ThreadPoolBackend(LocalBackend):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='websubsub')
+
+    def submit(self, task, args, kwargs, enqueued, carrier):
+        future = self.executor.submit(self.run, task, args, kwargs, enqueued, carrier)
+        future.add_done_callback(lambda f: self.done())
+        return future
+
+    def shutdown(self, wait=True):
+        super().shutdown(wait)
+        self.executor.shutdown(wait=False)
+
+
+class AsyncioBackend(LocalBackend):
+    """
+    Coroutine function tasks are awaited in the event loop, other tasks are run
+    in the loop default thread pool executor with `workers` threads.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(
+            ThreadPoolExecutor(self.workers, thread_name_prefix='websubsub')
+        )
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name='websubsub-asyncio', daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, task, args, kwargs, enqueued, carrier):
+        future = asyncio.run_coroutine_threadsafe(
+            self.arun(task, args, kwargs, enqueued, carrier), self.loop
+        )
+        future.add_done_callback(lambda f: self.done())
+        return future
+
+    async def arun(self, task, args, kwargs, enqueued, carrier):
+        if asyncio.iscoroutinefunction(task):
+            metrics.observe_queue_delay(task, enqueued)
+            try:
+                with tracing.task_span(task, kwargs, carrier):
+                    return await task(*args, **kwargs)
+            except Exception:
+                logger.exception(f'Task {metrics.task_name(task)} failed')
+        else:
+            return await self.loop.run_in_executor(
+                None, partial(self.run, task, args, kwargs, enqueued, carrier)
+            )
+
+    def shutdown(self, wait=True):
+        super().shutdown(wait)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def in_worker(self):
+        # Coroutine tasks run in the loop thread, which also frees slots.
+        return super().in_worker() or threading.current_thread() is self.thread
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        cls = import_string(settings.WEBSUBSUB_TASK_BACKEND)
+        _backend = cls(**settings.WEBSUBSUB_TASK_BACKEND_OPTIONS)
+    return _backend
+
+
+def _reset_backend(*, setting, **kwargs):
+    global _backend
+    if setting in ('WEBSUBSUB_TASK_BACKEND', 'WEBSUBSUB_TASK_BACKEND_OPTIONS') and _backend:
+        _backend.shutdown()
+        _backend = None
+
+
+setting_changed.connect(_reset_backend)
+
+
+def delay(task, *args, **kwargs):
+    """
+    Schedule task using configured backend.
+    """
+    return get_backend().delay(task, *args, **kwargs)
@@ -0,0 +1,118 @@
+"""
+Entry-level change detection.
+
+Many hubs push the whole feed on every update, so handlers reprocess all
+unchanged entries. With settings.WEBSUBSUB_ENTRY_CHANGES set (requires
+settings.WEBSUBSUB_FEED_PARSING), websubsub keeps an index of entry id to
+content digest of every subscription in dumblock redis hash, and passes only
+new and changed entries to handler tasks:
+
+ * 'changed' - unchanged entries are dropped.
+ * 'removed' - also, ids of indexed entries absent from the notification are
+   passed in `removed` list, and dropped from the index. Use only with hubs
+   which push full feeds, otherwise all entries missing from the partial
+   notification are reported removed.
+
+Entries are identified by `id`, or `link` if there is no id. Entries without
+both are always passed. Index of a subscription expires after
+settings.WEBSUBSUB_ENTRY_INDEX_TTL seconds without notifications, and is
+trimmed to settings.WEBSUBSUB_ENTRY_INDEX_SIZE most recently changed entries.
+The index is updated after all handler tasks of the notification are
+scheduled, so entries of failed deliveries are passed again. If the feed turns
+out malformed after some of its entries were passed, only those are indexed.
+"""
+import hashlib
+import json
+import logging
+import time
+
+import dumblock
+from django.conf import settings
+
+logger = logging.getLogger('websubsub.changes')
+
+
+def enabled():
+    return bool(settings.WEBSUBSUB_ENTRY_CHANGES)
+
+
+def entry_index(id):
+    """
+    Return EntryIndex of subscription id, or None if change detection is disabled.
+    """
+    return EntryIndex(id) if enabled() else None
+
+
+def entry_key(entry):
+    key = entry.get('id') or entry.get('link')
+    return None if key is None else str(key)
+
+
+def entry_digest(entry):
+    data = json.dumps(entry, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+class EntryIndex(object):
+    """
+    Index of entry digests of one subscription. Values are
+    `<digest>:<unix time of change>`, time is used to trim the index.
+    """
+    def __init__(self, id):
+        self.key = f'websubsub_entries_{id}'
+        self.known = {
+            k.decode(): v.decode() for k, v in dumblock.redis.hgetall(self.key).items()
+        }
+        self.seen = set()
+        self.changed = {}
+
+    def filter(self, pairs):
+        """
+        Yield (feed, entry) pairs with new or changed entries only.
+        """
+        now = int(time.time())
+        for feed, entry in pairs:
+            key = entry_key(entry)
+            if key is None:
+                yield feed, entry
+                continue
+            self.seen.add(key)
+            digest = entry_digest(entry)
+            if self.known.get(key, '').split(':')[0] == digest:
+                continue
+            self.changed[key] = f'{digest}:{now}'
+            yield feed, entry
+
+    def removed(self):
+        """
+        Return list of ids of indexed entries absent from the notification if
+        settings.WEBSUBSUB_ENTRY_CHANGES is 'removed', else empty list.
+        """
+        if settings.WEBSUBSUB_ENTRY_CHANGES != 'removed':
+            return []
+        return sorted(set(self.known) - self.seen)
+
+    def commit(self, complete=True):
+        """
+        Store changed entries and drop removed ones. Call it after handler
+        tasks of all payloads of the notification are scheduled. Pass
+        complete=False if the feed was not parsed to the end, so that entries
+        which were not seen are not dropped.
+        """
+        removed = self.removed() if complete else []
+        entries = {k: v for k, v in self.known.items() if k not in removed}
+        entries.update(self.changed)
+        excess = len(entries) - settings.WEBSUBSUB_ENTRY_INDEX_SIZE
+        if excess > 0:
+            oldest = set(sorted(entries, key=lambda k: int(entries[k].split(':')[1]))[:excess])
+            logger.debug(f'Trimming {excess} oldest entries of {self.key}')
+        else:
+            oldest = set()
+        pipe = dumblock.redis.pipeline()
+        if removed or oldest:
+            pipe.hdel(self.key, *removed, *oldest)
+        changed = {k: v for k, v in self.changed.items() if k not in oldest}
+        if changed:
+            pipe.hmset(self.key, changed)
+        pipe.expire(self.key, settings.WEBSUBSUB_ENTRY_INDEX_TTL)
+        pipe.execute()
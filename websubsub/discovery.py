@@ -0,0 +1,205 @@
+"""
+Hub discovery.
+
+Fetches the topic url and finds its hubs and self url in HTTP `Link` headers,
+or if they are not there, in `<link rel="hub">` and `<link rel="self">`
+elements of HTML head or Atom/RSS feed:
+
+>>> discovery.discover('https://example.com/feed')
+Discovery(hubs=['https://hub.example.com/'], self='https://example.com/feed')
+
+Results are cached in dumblock redis for `max-age` of Cache-Control response
+header, or until Expires, or for settings.WEBSUBSUB_DISCOVERY_TTL seconds.
+Expired results are revalidated with conditional request using ETag and
+Last-Modified of the previous response, so unchanged topics cost one request
+with empty 304 response per ttl. Responses with `no-store` are not cached.
+`discover_many()` discovers many topics in a bounded thread pool.
+"""
+import hashlib
+import json
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+import dumblock
+import requests
+from django.conf import settings
+from django.db import close_old_connections
+from requests.utils import parse_header_links
+
+from . import tracing
+
+logger = logging.getLogger('websubsub.discovery')
+
+Discovery = namedtuple('Discovery', ['hubs', 'self'])
+
+# Only the head of documents is searched for links.
+MAX_BYTES = 256 * 1024
+CHUNK_SIZE = 16 * 1024
+
+
+class HeadLinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.links = []
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == 'link':
+            attrs = dict(attrs)
+            if attrs.get('href') and attrs.get('rel'):
+                self.links.append((attrs['rel'], attrs['href']))
+        elif tag == 'body':
+            self.done = True
+
+
+class FeedLinkParser(object):
+    def __init__(self):
+        self.parser = XMLPullParser(events=('start',))
+        self.links = []
+        self.done = False
+
+    def feed(self, data):
+        try:
+            self.parser.feed(data)
+        except ParseError as e:
+            logger.debug(f'Failed to parse feed: {e!r}')
+            self.done = True
+            return
+        for event, element in self.parser.read_events():
+            name = element.tag.rsplit('}', 1)[-1]
+            if name == 'link' and element.get('href') and element.get('rel'):
+                self.links.append((element.get('rel'), element.get('href')))
+            elif name in ('entry', 'item'):
+                # Feed-level links precede entries.
+                self.done = True
+                return
+
+
+def parse_links(response):
+    """
+    Return list of (rel, absolute url) of links in headers of the response,
+    or if there are no hubs, in the head of its body.
+    """
+    links = [
+        (link.get('rel', ''), link['url'])
+        for link in parse_header_links(response.headers.get('Link', ''))
+        if link.get('url')
+    ]
+    if not any('hub' in rel.split() for rel, url in links):
+        content_type = response.headers.get('Content-Type', '')
+        parser = FeedLinkParser() if 'xml' in content_type else HeadLinkParser()
+        read = 0
+        for chunk in response.iter_content(CHUNK_SIZE):
+            read += len(chunk)
+            if isinstance(parser, HeadLinkParser):
+                chunk = chunk.decode(response.encoding or 'utf-8', errors='replace')
+            parser.feed(chunk)
+            if parser.done or read >= MAX_BYTES:
+                break
+        links += parser.links
+    return [(rel.lower(), urljoin(response.url, url)) for rel, url in links]
+
+
+def cache_ttl(headers):
+    """
+    Return seconds to cache response with given headers for, or None if it
+    must not be cached.
+    """
+    directives = {}
+    for directive in headers.get('Cache-Control', '').lower().split(','):
+        name, _, value = directive.strip().partition('=')
+        directives[name] = value.strip('"')
+    if 'no-store' in directives:
+        return None
+    if 'no-cache' in directives:
+        return 0
+    if directives.get('max-age', '').isdigit():
+        return int(directives['max-age'])
+    if headers.get('Expires'):
+        try:
+            expires = parsedate_to_datetime(headers['Expires']).timestamp()
+        except (TypeError, ValueError):
+            # Invalid Expires means already expired.
+            return 0
+        return max(0, int(expires - time.time()))
+    return settings.WEBSUBSUB_DISCOVERY_TTL
+
+
+def _key(topic):
+    return 'websubsub_discovery_' + hashlib.blake2b(topic.encode(), digest_size=16).hexdigest()
+
+
+def discover(topic, timeout=10):
+    """
+    Return Discovery of hub urls and self url of the topic. Raises requests
+    exceptions if topic can not be fetched.
+    """
+    key = _key(topic)
+    cached = dumblock.redis.get(key)
+    cached = json.loads(cached) if cached else None
+    if cached and cached['expires'] > time.time():
+        return Discovery(cached['hubs'], cached['self'])
+
+    headers = {}
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+    with tracing.span('websubsub.discovery', {'websubsub.topic': topic}):
+        response = requests.get(topic, headers=headers, timeout=timeout, stream=True)
+        try:
+            if response.status_code == 304 and cached:
+                entry = cached
+            else:
+                response.raise_for_status()
+                links = parse_links(response)
+                selfs = [url for rel, url in links if 'self' in rel.split()]
+                entry = {
+                    'hubs': list(dict.fromkeys(url for rel, url in links if 'hub' in rel.split())),
+                    'self': selfs[0] if selfs else topic,
+                }
+        finally:
+            response.close()
+
+    entry['etag'] = response.headers.get('ETag') or entry.get('etag')
+    entry['last_modified'] = response.headers.get('Last-Modified') or entry.get('last_modified')
+    ttl = cache_ttl(response.headers)
+    if ttl is None:
+        dumblock.redis.delete(key)
+    else:
+        entry['expires'] = time.time() + ttl
+        # Keep expired entry for a while, to revalidate it with conditional request.
+        dumblock.redis.set(key, json.dumps(entry), ex=ttl + settings.WEBSUBSUB_DISCOVERY_TTL)
+    if not entry['hubs']:
+        logger.warning(f'No hubs found for topic {topic}')
+    return Discovery(entry['hubs'], entry['self'])
+
+
+def _discover_in_thread(topic):
+    try:
+        return discover(topic)
+    except Exception as e:
+        logger.error(f'Failed to discover hubs of topic {topic}: {e!r}')
+        return None
+    finally:
+        close_old_connections()
+
+
+def discover_many(topics, concurrency=None):
+    """
+    Discover hubs of many topics with at most `concurrency` requests at a
+    time, settings.WEBSUBSUB_DISCOVERY_CONCURRENCY by default. Returns dict of
+    topic to Discovery, or to None if discovery failed.
+    """
+    topics = list(dict.fromkeys(topics))
+    workers = concurrency or settings.WEBSUBSUB_DISCOVERY_CONCURRENCY
+    with ThreadPoolExecutor(workers) as executor:
+        return dict(zip(topics, executor.map(_discover_in_thread, topics)))
@@ -0,0 +1,200 @@
+"""
+Duplicate notification suppression.
+
+Hubs retry deliveries and sometimes push the same content several times. With
+settings.WEBSUBSUB_DEDUP_NOTIFICATIONS set, `WssView.post` remembers every
+notification for settings.WEBSUBSUB_DEDUP_NOTIFICATIONS_WINDOW seconds and
+answers repeated ones with 200 without scheduling handler task:
+
+ * 'digest' - notification is identified by subscription and body digest.
+ * 'id' - by subscription and ids of Atom/RSS entries or JSON Feed items in the
+   body. Falls back to body digest when there are no ids.
+
+Seen notifications are stored according to settings.WEBSUBSUB_DEDUP_NOTIFICATIONS_STORE:
+
+ * 'redis' - key with TTL per notification in dumblock redis, shared by all processes.
+ * 'bloom' - time-windowed Bloom filter in process memory, of fixed size for
+   settings.WEBSUBSUB_DEDUP_BLOOM_CAPACITY notifications per window. Each
+   process detects only duplicates it received itself, and about 0.1% of new
+   notifications are falsely considered duplicates.
+"""
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from xml.etree.ElementTree import iterparse
+
+import dumblock
+from django.conf import settings
+from django.core.signals import setting_changed
+
+from . import limits, metrics
+
+logger = logging.getLogger('websubsub.duplicates')
+
+
+def digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _localname(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def entry_ids(content_type, stream):
+    """
+    Return list of Atom/RSS entry ids or JSON Feed item ids in the body read
+    from stream, or empty list if there are none or body can not be parsed.
+    """
+    try:
+        if 'json' in content_type:
+            data = json.load(stream)
+            if not isinstance(data, dict):
+                return []
+            items = data.get('items') or [data]
+            return [str(x['id']) for x in items if isinstance(x, dict) and x.get('id') is not None]
+        if 'xml' in content_type:
+            ids = []
+            for event, element in iterparse(stream):
+                if _localname(element.tag) in ('entry', 'item'):
+                    ids += [
+                        x.text.strip() for x in element
+                        if _localname(x.tag) in ('id', 'guid') and x.text
+                    ]
+                    element.clear()
+            return ids
+    except Exception as e:
+        logger.debug(f'Failed to parse entry ids: {e!r}')
+    return []
+
+
+def notification_key(id, content_type, stream):
+    """
+    Return key of notification body read from seekable stream. Body is hashed
+    in chunks, and stream is seeked back to its start.
+    """
+    try:
+        if settings.WEBSUBSUB_DEDUP_NOTIFICATIONS == 'id':
+            ids = entry_ids(content_type or '', stream)
+            if ids:
+                return f'{id}_id_{digest(chr(10).join(ids).encode())}'
+            stream.seek(0)
+        h = hashlib.blake2b(digest_size=16)
+        for chunk in iter(lambda: stream.read(limits.CHUNK_SIZE), b''):
+            h.update(chunk)
+        return f'{id}_{h.hexdigest()}'
+    finally:
+        stream.seek(0)
+
+
+class RedisStore(object):
+    def __init__(self, window):
+        self.window = window
+
+    def add(self, key):
+        """
+        Remember key, return False if it was already seen.
+        """
+        return bool(dumblock.redis.set(f'websubsub_seen_{key}', 1, nx=True, ex=self.window))
+
+    def discard(self, key):
+        dumblock.redis.delete(f'websubsub_seen_{key}')
+
+
+class BloomFilter(object):
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = int(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, key):
+        # Double hashing: i-th position is h1 + i * h2.
+        h = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(h[:8], 'little'), int.from_bytes(h[8:], 'little')
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, positions):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in positions)
+
+    def add(self, positions):
+        for p in positions:
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def discard(self, positions):
+        # May also clear bits of other keys, so some of their duplicates will
+        # pass through. Used only for rejected notifications, which are rare.
+        for p in positions:
+            self.bits[p >> 3] &= ~(1 << (p & 7))
+
+
+class BloomStore(object):
+    """
+    Two Bloom filters: keys are added to the current one, and looked up in both.
+    Every `window` seconds the previous filter is dropped, so keys are
+    remembered for `window` to `2 * window` seconds, in bounded memory.
+    """
+    def __init__(self, window, capacity):
+        self.window = window
+        self.capacity = capacity
+        self.current = BloomFilter(capacity)
+        self.previous = BloomFilter(capacity)
+        self.rotated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, key):
+        positions = self.current.positions(key)
+        with self.lock:
+            if time.monotonic() - self.rotated > self.window:
+                self.previous, self.current = self.current, BloomFilter(self.capacity)
+                self.rotated = time.monotonic()
+            if positions in self.current or positions in self.previous:
+                return False
+            self.current.add(positions)
+            return True
+
+    def discard(self, key):
+        positions = self.current.positions(key)
+        with self.lock:
+            self.current.discard(positions)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        window = settings.WEBSUBSUB_DEDUP_NOTIFICATIONS_WINDOW
+        if settings.WEBSUBSUB_DEDUP_NOTIFICATIONS_STORE == 'bloom':
+            _store = BloomStore(window, settings.WEBSUBSUB_DEDUP_BLOOM_CAPACITY)
+        else:
+            _store = RedisStore(window)
+    return _store
+
+
+def _reset_store(*, setting, **kwargs):
+    global _store
+    if setting.startswith('WEBSUBSUB_DEDUP_'):
+        _store = None
+
+
+setting_changed.connect(_reset_store)
+
+
+def remember(urlname, id, request):
+    """
+    Remember notification. Returns its key if it is new, or None if it is a
+    duplicate. Pass the key to `forget()` if notification was not accepted.
+    """
+    key = notification_key(id, request.content_type, limits.stream(request))
+    if get_store().add(key):
+        metrics.DEDUP_NOTIFICATIONS.labels(urlname, 'new').inc()
+        return key
+    metrics.DEDUP_NOTIFICATIONS.labels(urlname, 'duplicate').inc()
+    return None
+
+
+def forget(key):
+    get_store().discard(key)
@@ -0,0 +1,163 @@
+"""
+Compact envelope of handler task payloads on the broker.
+
+By default handler tasks receive `request.data`, parsed in the callback view
+and serialized by celery json serializer, so fat pings are stored on the
+broker as uncompressed text. With settings.WEBSUBSUB_ENVELOPE set, handler
+tasks are published with `websubsub` kombu serializer instead:
+
+>>> WEBSUBSUB_ENVELOPE = {'compression': 'zstd', 'threshold': 1024}
+
+ * Callback view does not parse the body. Handler task argument is an
+   envelope with raw body bytes read in chunks, content type, Link and
+   X-Hub-Signature headers, and callback urlname.
+ * Message is packed with msgpack (json if msgpack is not installed), and
+   compressed with `compression` ('zlib', or 'zstd' if zstandard is
+   installed) when longer than `threshold` bytes, with optional `level`.
+ * Worker decodes the message, and `task_prerun` signal handler parses
+   enveloped body with the callback view parsers before the task runs, so
+   handler task receives the same data as without envelope. Body which can
+   not be parsed is passed as text, and the task fails as it would without
+   envelope.
+
+Workers must accept the serializer: `CELERY_ACCEPT_CONTENT = ['json', 'websubsub']`.
+Envelope is only used with CeleryBackend, and is not decoded in eager mode.
+"""
+import logging
+import zlib
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from celery.signals import task_prerun
+from django.conf import settings
+from kombu.serialization import register
+from kombu.utils import json
+
+from . import backends, limits
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger('websubsub.envelope')
+
+SERIALIZER = 'websubsub'
+CONTENT_TYPE = 'application/x-websubsub'
+
+# Marker key of enveloped raw body.
+RAW = '__websubsub_raw__'
+
+# Notification headers carried in envelope.
+HEADERS = ('Content-Type', 'Link', 'X-Hub-Signature')
+
+# First byte of message is format, second is compression.
+MSGPACK, JSON = b'm', b'j'
+NONE, ZLIB, ZSTD = b'-', b'z', b's'
+
+
+def enabled():
+    return bool(settings.WEBSUBSUB_ENVELOPE) \
+        and isinstance(backends.get_backend(), backends.CeleryBackend)
+
+
+def options():
+    """
+    Return apply_async options of handler tasks.
+    """
+    return {'serializer': SERIALIZER} if enabled() else {}
+
+
+def wrap(request):
+    """
+    Return envelope of raw notification body, to be passed to handler task
+    instead of request.data.
+    """
+    return {
+        RAW: True,
+        'urlname': request.resolver_match.url_name,
+        'content_type': request.content_type or '',
+        'headers': {name: request.headers[name] for name in HEADERS if name in request.headers},
+        'body': limits.read(request),
+    }
+
+
+def unwrap(value):
+    """
+    Parse enveloped body with the callback view parsers. Other values are
+    returned as is.
+    """
+    if not (isinstance(value, dict) and value.get(RAW)):
+        return value
+    from . import inbox
+    view_class, _ = inbox.resolve_view(value['urlname'])
+    return inbox.parse(view_class, value['content_type'], bytes(value['body']))
+
+
+@task_prerun.connect
+def _unwrap_args(args=None, **kwargs):
+    # Worker passes the list of decoded message args to the task, so enveloped
+    # bodies are parsed in place. Exceptions of signal handlers are only logged
+    # by celery, so failed parsing is handled here. Tuple args can not be
+    # changed in place, and are rejected with an error in the worker log.
+    enveloped = [i for i, x in enumerate(args or ()) if isinstance(x, dict) and x.get(RAW)]
+    if enveloped and not isinstance(args, list):
+        raise TypeError(f'Enveloped body can not be parsed in place of {type(args).__name__} args')
+    for i in enveloped:
+        value = args[i]
+        try:
+            args[i] = unwrap(value)
+        except Exception:
+            logger.exception(f'Failed to parse enveloped body of {value["urlname"]}')
+            args[i] = bytes(value['body']).decode(settings.DEFAULT_CHARSET, errors='replace')
+
+
+def _default(obj):
+    # Types supported by celery json serializer.
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, (UUID, Decimal)):
+        return str(obj)
+    if isinstance(obj, tuple):
+        return list(obj)
+    raise TypeError(f'Can not serialize {type(obj).__name__}')
+
+
+def _compress(data):
+    config = settings.WEBSUBSUB_ENVELOPE or {}
+    compression = config.get('compression', 'zlib')
+    if not compression or len(data) <= config.get('threshold', 1024):
+        return NONE + data
+    level = config.get('level')
+    if compression == 'zstd' and zstandard is not None:
+        return ZSTD + zstandard.ZstdCompressor(level=level or 3).compress(data)
+    if compression == 'zstd':
+        logger.warning('zstandard is not installed, falling back to zlib compression.')
+    return ZLIB + zlib.compress(data, -1 if level is None else level)
+
+
+def dumps(obj):
+    if msgpack is not None:
+        return MSGPACK + _compress(msgpack.packb(obj, use_bin_type=True, default=_default))
+    return JSON + _compress(json.dumps(obj).encode())
+
+
+def loads(data):
+    data = bytes(data)
+    format, compression, data = data[:1], data[1:2], data[2:]
+    if compression == ZLIB:
+        data = zlib.decompress(data)
+    elif compression == ZSTD:
+        data = zstandard.ZstdDecompressor().decompress(data)
+    if format == MSGPACK:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    return json.loads(data)
+
+
+register(SERIALIZER, dumps, loads, content_type=CONTENT_TYPE, content_encoding='binary')
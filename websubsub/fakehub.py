@@ -0,0 +1,257 @@
+"""
+Fake websub hub for local load testing.
+
+FakeHub runs http server in a background thread. It accepts subscribe and
+unsubscribe requests, sends real verification GET requests to the callback
+urls, and pushes notifications to verified callbacks, signed with HMAC of the
+body in X-Hub-Signature header if subscription was requested with hub.secret:
+
+>>> hub = FakeHub(latency=0.05, error_rate=0.01, throttle_rate=0.01)
+>>> hub.start()
+>>> Subscription.bulk_create_and_subscribe(topics, urlname='webnews', hub=hub.url)
+>>> hub.push(rate=100, duration=10)
+>>> print(hub.stats.report())
+>>> hub.stop()
+
+Use `./manage.py websub_fakehub` to run it as a standalone server, and
+`./manage.py websub_loadtest` to run load test against your running site.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs
+from uuid import uuid4
+
+from requests import Session
+
+logger = logging.getLogger('websubsub.fakehub')
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class Stats(object):
+    """
+    Thread-safe counters and latency samples, in seconds.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(int)
+        self.latencies = defaultdict(list)
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def observe(self, name, seconds):
+        with self.lock:
+            self.latencies[name].append(seconds)
+
+    def report(self):
+        with self.lock:
+            report = {'counters': dict(self.counters)}
+            for name, values in self.latencies.items():
+                report[name] = {
+                    'count': len(values),
+                    'p50': percentile(values, 50),
+                    'p99': percentile(values, 99),
+                }
+        return report
+
+
+class FakeHub(object):
+    def __init__(self, host='127.0.0.1', port=0, latency=0, error_rate=0, throttle_rate=0,
+                 verify_delay=0, lease_seconds=86400, workers=16):
+        """
+        latency - seconds to wait before responding to subscription request.
+        error_rate, throttle_rate - share of subscription requests to respond
+            with 500 or 429 status.
+        verify_delay - seconds to wait before sending verification request.
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.verify_delay = verify_delay
+        self.lease_seconds = lease_seconds
+        self.stats = Stats()
+        # Verified subscriptions: {topic: {callback url: secret or None}}
+        self.topics = defaultdict(dict)
+        self.topics_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='fakehub')
+        # Requests session of every worker thread, sessions are not thread-safe.
+        self.local = threading.local()
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}/'
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name='fakehub', daemon=True
+        )
+        self.thread.start()
+        logger.info(f'Fake hub is listening on {self.url}')
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.executor.shutdown(wait=True)
+
+    def serve_forever(self):
+        logger.info(f'Fake hub is listening on {self.url}')
+        try:
+            self.server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False)
+
+    @property
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = Session()
+        return self.local.session
+
+    @property
+    def callbacks(self):
+        """
+        List of (topic, callback url, secret) of verified subscriptions.
+        """
+        with self.topics_lock:
+            return [
+                (topic, cb, secret)
+                for topic, cbs in self.topics.items() for cb, secret in cbs.items()
+            ]
+
+    def handler_class(self):
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                data = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+                status = hub.on_request(data)
+                self.send_response(status)
+                if status == 429:
+                    self.send_header('Retry-After', '1')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+    def on_request(self, data):
+        """
+        Handle subscription request, return response status code.
+        """
+        started = time.monotonic()
+        if self.latency:
+            time.sleep(self.latency)
+        mode = data.get('hub.mode')
+        if mode not in ('subscribe', 'unsubscribe') \
+           or not data.get('hub.topic') or not data.get('hub.callback'):
+            self.stats.count('request_400')
+            return 400
+        roll = random.random()
+        if roll < self.error_rate:
+            self.stats.count('request_500')
+            return 500
+        if roll < self.error_rate + self.throttle_rate:
+            self.stats.count('request_429')
+            return 429
+        self.stats.count(f'{mode}_202')
+        self.stats.observe('hub_response', time.monotonic() - started)
+        self.executor.submit(
+            self.verify, mode, data['hub.topic'], data['hub.callback'], data.get('hub.secret')
+        )
+        return 202
+
+    def verify(self, mode, topic, callback, secret=None):
+        if self.verify_delay:
+            time.sleep(self.verify_delay)
+        challenge = uuid4().hex
+        params = {
+            'hub.mode': mode,
+            'hub.topic': topic,
+            'hub.challenge': challenge,
+            'hub.lease_seconds': self.lease_seconds,
+        }
+        started = time.monotonic()
+        try:
+            response = self.session.get(callback, params=params, timeout=10)
+        except Exception as e:
+            self.stats.count('verify_connerror')
+            logger.error(f'Verification of {callback} failed: {e}')
+            return
+        self.stats.observe('verify', time.monotonic() - started)
+        if response.status_code // 100 != 2 or response.text != challenge:
+            self.stats.count('verify_failed')
+            logger.warning(f'Callback {callback} did not confirm {mode}: {response.status_code}')
+            return
+        self.stats.count(f'{mode}_verified')
+        with self.topics_lock:
+            if mode == 'subscribe':
+                self.topics[topic][callback] = secret
+            else:
+                self.topics[topic].pop(callback, None)
+
+    def publish(self, topic, callback, body, content_type='application/json', secret=None):
+        """
+        Send fat ping to callback, signed with secret if given, return True on success.
+        """
+        body = body.encode() if isinstance(body, str) else body
+        headers = {'Content-Type': content_type}
+        if secret:
+            signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+            headers['X-Hub-Signature'] = f'sha256={signature}'
+        started = time.monotonic()
+        try:
+            response = self.session.post(callback, data=body, headers=headers, timeout=10)
+        except Exception as e:
+            self.stats.count('push_connerror')
+            logger.error(f'Push to {callback} failed: {e}')
+            return False
+        self.stats.observe('push', time.monotonic() - started)
+        self.stats.count(f'push_{response.status_code}')
+        return response.status_code // 100 == 2
+
+    def push(self, rate, duration, payload_size=1024):
+        """
+        Push json notifications to verified callbacks in round-robin at target rate
+        (notifications per second) for `duration` seconds. Returns number of
+        successful pushes.
+        """
+        callbacks = self.callbacks
+        if not callbacks:
+            logger.warning('No verified callbacks to push to.')
+            return 0
+        body = json.dumps({'data': 'x' * payload_size}).encode()
+        futures = []
+        started = time.monotonic()
+        for i in range(int(rate * duration)):
+            # Sleep until scheduled send time of i-th notification.
+            delay = started + i / rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            topic, callback, secret = callbacks[i % len(callbacks)]
+            futures.append(self.executor.submit(self.publish, topic, callback, body, secret=secret))
+        return sum(1 for f in futures if f.result())
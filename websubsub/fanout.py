@@ -0,0 +1,87 @@
+"""
+Shared subscriptions: one hub subscription per hub and topic, fanned out to
+handler tasks of several local callbacks.
+
+Subscriptions are unique by hub, topic and callback urlname, so several apps
+subscribed to the same topic get the same notification pushed by hub to each
+of their callbacks. Instead, register a callback for shared subscriptions,
+without handler task, and name it in settings.WEBSUBSUB_SHARED_URLNAME:
+
+>>> WEBSUBSUB_SHARED_URLNAME = 'websub_shared'
+>>> urlpatterns = [
+>>>     path('/websubcallback/shared/<uuid:id>', WssView.as_view(None), name='websub_shared'),
+>>>     path('/websubcallback/news/<uuid:id>', WssView.as_view(news_task), name='webnews'),
+>>> ]
+
+Then `Subscription.create_shared(topic, 'webnews')` registers 'webnews' as a
+consumer of the hub subscription of the topic, subscribing it if needed, and
+`Subscription.release_shared(ssn.topic, 'webnews')` unregisters it,
+unsubscribing when the last consumer is gone. The topic of the shared
+subscription is the discovered self url if hub discovery is enabled. Every notification received by the shared
+callback is parsed once, with the shared callback parsers, and passed to
+handler tasks of all consumer callbacks.
+
+Consumers are cached in every process for up to `routing.CACHE_TTL` seconds.
+`create_shared()` and `release_shared()` store a new random generation of
+consumers of the subscription in dumblock redis, and every process compares
+it with the generation of its cached consumers on lookup, one redis GET per
+notification of shared subscriptions, so all processes see the change at
+once.
+"""
+import logging
+from uuid import uuid4
+
+import dumblock
+from django.conf import settings
+
+from . import routing
+
+logger = logging.getLogger('websubsub.fanout')
+
+
+def _generation_key(id):
+    return f'websubsub_consumers_{id}'
+
+
+def consumers(id):
+    """
+    Return callback urlnames of consumers of shared subscription id.
+    """
+    # Generation is read before the lookup, so a change made during the lookup
+    # is seen on the next one.
+    generation = dumblock.redis.get(_generation_key(id))
+    ssn = routing.subscription(id)
+    if ssn is not None and ssn.get('generation') != generation:
+        ssn = routing.subscription(id, refresh=True)
+        if ssn is not None:
+            ssn['generation'] = generation
+    return ssn['consumers'] if ssn else ()
+
+
+def forget(id):
+    """
+    Drop cached consumers of all processes, after consumers of shared
+    subscription id were changed.
+    """
+    routing.forget(id)
+    # Random generation, so that an expired key never matches the cached one.
+    dumblock.redis.set(_generation_key(id), uuid4().hex, ex=routing.CACHE_TTL)
+
+
+def handlers(id, urlname, handler_task):
+    """
+    Return list of (handler task, callback urlname) to deliver notification of
+    subscription id received by callback urlname to.
+    """
+    if not settings.WEBSUBSUB_SHARED_URLNAME or urlname != settings.WEBSUBSUB_SHARED_URLNAME:
+        return [(handler_task, urlname)]
+    from .inbox import resolve_view
+    result = []
+    for consumer in consumers(id):
+        try:
+            result.append((resolve_view(consumer)[1], consumer))
+        except Exception as e:
+            logger.error(f'Skipping consumer {consumer} of shared subscription {id}: {e!r}')
+    if not result:
+        logger.warning(f'Shared subscription {id} has no consumers.')
+    return result
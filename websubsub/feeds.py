@@ -0,0 +1,230 @@
+"""
+Incremental parsing of Atom, RSS and JSON Feed fat pings.
+
+By default handler tasks receive whatever `request.data` is, so every handler
+has to parse the whole feed itself. With settings.WEBSUBSUB_FEED_PARSING set,
+`WssView.post` and inbox drainer stream feed bodies through an incremental
+parser instead: `XMLPullParser` for Atom and RSS, ijson events for JSON Feed
+(whole body is loaded if ijson is not installed). Entries are converted to
+dicts one at a time and dropped from the parse tree, feed-level elements are
+collected into `feed` dict once:
+
+ * 'feed' - handler task receives one `{'feed': {...}, 'entries': [{...}, ...]}`.
+ * 'entries' - handler task is scheduled for every entry with
+   `{'feed': {...}, 'entry': {...}}`, so peak memory does not depend on feed size.
+   Entries are published as they are parsed: if the feed turns out malformed
+   after some entries, the view acknowledges the notification with those
+   entries published, and rejects it with 400 only if none were.
+
+Atom and RSS entries have `id`, `title`, `link`, `updated`, `summary`,
+`content` and other child elements by local name; JSON Feed items are passed
+as is, and items which are not objects are skipped. With settings.WEBSUBSUB_ENTRY_CHANGES set only new and changed entries
+are passed, see websubsub.changes. Only bodies with content types in
+FEED_TYPES are parsed. Handlers receiving raw bodies can iterate entries
+themselves:
+
+>>> for feed, entry in feeds.entries(BytesIO(body), 'application/atom+xml'):
+>>>     ...
+"""
+import json
+import logging
+from xml.etree.ElementTree import ParseError as XMLParseError, XMLPullParser
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+
+from . import changes
+
+try:
+    import ijson
+    JSONError = ijson.JSONError
+except ImportError:
+    ijson = None
+    JSONError = ValueError
+
+logger = logging.getLogger('websubsub.feeds')
+
+FEED_TYPES = {
+    'application/atom+xml': 'xml',
+    'application/rss+xml': 'xml',
+    'application/xml': 'xml',
+    'text/xml': 'xml',
+    'application/feed+json': 'json',
+}
+
+CHUNK_SIZE = 64 * 1024
+
+# RSS names of Atom elements.
+ALIASES = {'guid': 'id', 'pubDate': 'updated', 'description': 'summary'}
+
+
+def enabled():
+    return bool(settings.WEBSUBSUB_FEED_PARSING)
+
+
+def feed_type(content_type):
+    """
+    Return 'xml' or 'json' if content type is a feed type, otherwise None.
+    """
+    return FEED_TYPES.get((content_type or '').split(';')[0].strip().lower())
+
+
+def _localname(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _text(element):
+    if len(element):
+        # Nested markup, e.g. xhtml content.
+        return ''.join(element.itertext()).strip()
+    return (element.text or '').strip()
+
+
+def _add(result, element):
+    name = _localname(element.tag)
+    name = ALIASES.get(name, name)
+    if name == 'link' and element.get('href'):
+        # Atom has several links, prefer the alternate one.
+        if 'link' in result and element.get('rel', 'alternate') != 'alternate':
+            return
+        result['link'] = element.get('href')
+    else:
+        result[name] = _text(element)
+
+
+def _element_dict(element):
+    result = {}
+    for child in element:
+        _add(result, child)
+    return result
+
+
+def _xml_entries(stream, feed):
+    parser = XMLPullParser(events=('start', 'end'))
+    stack = []
+    # Depth of feed-level elements: children of Atom <feed> or RSS <channel>.
+    level = None
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if chunk:
+            parser.feed(chunk)
+        else:
+            parser.close()
+        for event, element in parser.read_events():
+            if event == 'start':
+                stack.append(element)
+                if _localname(element.tag) in ('feed', 'channel'):
+                    level = len(stack) + 1
+                continue
+            stack.pop()
+            if _localname(element.tag) in ('entry', 'item'):
+                yield _element_dict(element)
+                if stack:
+                    stack[-1].remove(element)
+            elif level is not None and len(stack) + 1 == level:
+                _add(feed, element)
+                stack[-1].remove(element)
+        if not chunk:
+            return
+
+
+def _json_items(items):
+    # Items which are not objects are skipped, like by ijson parser below.
+    for item in items:
+        if isinstance(item, dict):
+            yield item
+        else:
+            logger.debug(f'Skipped JSON Feed item which is not an object: {item!r}')
+
+
+def _json_entries(stream, feed):
+    if ijson is None:
+        data = json.load(stream)
+        if not isinstance(data, dict):
+            raise ValueError('JSON Feed must be an object')
+        items = data.get('items')
+        if items is not None and not isinstance(items, list):
+            raise ValueError('JSON Feed items must be an array')
+        feed.update((k, v) for k, v in data.items() if k != 'items')
+        yield from _json_items(items or [])
+        return
+
+    # Builder of current item or feed-level member, and its top-level key.
+    builder = key = None
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if not prefix:
+            # Events of the top-level object itself.
+            if event not in ('start_map', 'map_key', 'end_map'):
+                raise ValueError('JSON Feed must be an object')
+            continue
+        top = prefix.split('.', 1)[0]
+        if top == 'items':
+            if prefix == 'items':
+                # Start and end of the items array.
+                if event not in ('start_array', 'end_array', 'null'):
+                    raise ValueError('JSON Feed items must be an array')
+                continue
+            if builder is None:
+                builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+            if prefix == 'items.item' and event not in ('start_map', 'start_array', 'map_key'):
+                item, builder = builder.value, None
+                yield from _json_items([item])
+            continue
+        if key != top:
+            builder, key = ijson.ObjectBuilder(), top
+        builder.event(event, value)
+        if prefix == top and event not in ('start_map', 'start_array', 'map_key'):
+            feed[top] = builder.value
+            builder = key = None
+
+
+def entries(stream, content_type, feed=None):
+    """
+    Yield (feed, entry) dicts of the feed read from file-like stream, one entry
+    at a time. Feed dict contains copy of feed-level members seen so far, all
+    of them are collected into `feed` dict argument if given. Raises
+    rest_framework ParseError if the feed is malformed.
+    """
+    feed = {} if feed is None else feed
+    kind = feed_type(content_type)
+    if kind is None:
+        raise ParseError(f'Not a feed content type: {content_type}')
+    parse = _xml_entries if kind == 'xml' else _json_entries
+    try:
+        for entry in parse(stream, feed):
+            yield dict(feed), entry
+    except (XMLParseError, JSONError, ValueError) as e:
+        raise ParseError(f'Malformed feed: {e}')
+
+
+def payloads(stream, content_type, index=None):
+    """
+    Yield handler task payloads of the feed according to settings.WEBSUBSUB_FEED_PARSING.
+    If subscription EntryIndex is given, only new and changed entries are
+    passed, see websubsub.changes. The caller commits the index after handler
+    tasks of all payloads are scheduled.
+    """
+    feed = {}
+    pairs = entries(stream, content_type, feed)
+    if index is not None:
+        pairs = index.filter(pairs)
+
+    if settings.WEBSUBSUB_FEED_PARSING == 'entries':
+        for entry_feed, entry in pairs:
+            yield {'feed': entry_feed, 'entry': entry}
+        removed = index.removed() if index is not None else []
+        if removed:
+            yield {'feed': feed, 'removed': removed}
+        return
+
+    items = [entry for _, entry in pairs]
+    if index is None:
+        yield {'feed': feed, 'entries': items}
+        return
+    removed = index.removed()
+    if items or removed:
+        payload = {'feed': feed, 'entries': items}
+        if settings.WEBSUBSUB_ENTRY_CHANGES == 'removed':
+            payload['removed'] = removed
+        yield payload
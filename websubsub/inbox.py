@@ -0,0 +1,140 @@
+"""
+Durable notification inbox.
+
+With settings.WEBSUBSUB_INBOX = True, `WssView.post` does not schedule
+handler task itself. It appends raw notification body to the Notification
+table and responds to hub at once. Add `websubsub.tasks.drain_inbox` to
+celerybeat schedule: it parses stored notifications with parsers of the
+callback view and schedules handler tasks in batches. Delivered notifications
+are kept for settings.WEBSUBSUB_INBOX_RETENTION seconds, so they can be
+re-delivered with `./manage.py websub_replay`, and then removed by
+`websubsub.tasks.compact_inbox`. Notifications which can not be parsed are
+marked failed and kept until they are replayed. Subscription
+time_last_event_received is updated by the drainer, so the callback view
+makes a single INSERT.
+"""
+import logging
+from functools import lru_cache
+from io import BytesIO
+from uuid import uuid4
+
+from django.conf import settings
+from django.db.models import Case, DateTimeField, Value, When
+from django.urls import resolve, reverse
+from django.utils.timezone import now
+from rest_framework.parsers import MultiPartParser
+from rest_framework.utils.mediatypes import media_type_matches
+
+from . import changes, fanout, feeds, limits, routing
+from .models import Notification, Subscription
+
+logger = logging.getLogger('websubsub.inbox')
+
+
+def append(request, id, sequence=None):
+    """
+    Store notification received by the callback view.
+    """
+    Notification.objects.create(
+        subscription_id = id,
+        sequence = sequence,
+        callback_urlname = request.resolver_match.url_name,
+        content_type = request.content_type or '',
+        body = limits.read(request),
+    )
+
+
+@lru_cache(maxsize=None)
+def resolve_view(urlname):
+    """
+    Return WssView class and handler task of callback urlname.
+    """
+    match = resolve(reverse(urlname, args=[uuid4()]))
+    return match.func.view_class, match.func.view_initkwargs['handler_task']
+
+
+def parse(view_class, content_type, body):
+    """
+    Parse body with the view parsers, like request.data does.
+    """
+    for parser_class in view_class.parser_classes:
+        if issubclass(parser_class, MultiPartParser):
+            # Requires request object.
+            continue
+        if media_type_matches(parser_class.media_type, content_type):
+            parser_context = {'encoding': settings.DEFAULT_CHARSET}
+            return parser_class().parse(BytesIO(body), content_type, parser_context)
+    return body.decode(settings.DEFAULT_CHARSET, errors='replace')
+
+
+def parse_payloads(view_class, content_type, body, index=None):
+    """
+    Return list of handler task payloads of notification body: one parsed
+    body, or payloads of parsed feed, see websubsub.feeds. Only new and changed
+    entries are passed if subscription EntryIndex is given.
+    """
+    if feeds.enabled() and feeds.feed_type(content_type):
+        return list(feeds.payloads(BytesIO(body), content_type, index))
+    return [parse(view_class, content_type, body)]
+
+
+def deliver(notifications, detect_changes=True):
+    """
+    Schedule handler task for every notification and mark them delivered.
+    Stops at first failure to schedule the task. Notifications which can not
+    be resolved or parsed are logged and marked failed. Returns list of ids of
+    delivered notifications. Pass detect_changes=False to deliver all feed
+    entries, including ones already delivered, see websubsub.changes.
+    """
+    delivered = []
+    failed = []
+    try:
+        for notification in notifications:
+            index = changes.entry_index(notification.subscription_id) if detect_changes else None
+            try:
+                view_class, handler = resolve_view(notification.callback_urlname)
+                payloads = parse_payloads(
+                    view_class, notification.content_type, bytes(notification.body), index
+                )
+            except Exception as e:
+                logger.error(
+                    f'Failed to parse notification {notification.id} of subscription '
+                    f'{notification.subscription_id}: {e!r}'
+                )
+                failed.append(notification.id)
+                continue
+            handlers = fanout.handlers(
+                notification.subscription_id, notification.callback_urlname, handler
+            )
+            for data in payloads:
+                for handler_task, urlname in handlers:
+                    routing.delay(
+                        handler_task, notification.subscription_id, urlname, data,
+                        sequence=notification.sequence
+                    )
+            if index is not None:
+                index.commit()
+            delivered.append(notification.id)
+    except Exception as e:
+        logger.error(f'Failed to schedule handler task, {len(delivered)} notifications delivered: {e!r}')
+    if delivered:
+        Notification.objects.filter(id__in=delivered).update(delivered=now(), failed=None)
+    if failed:
+        Notification.objects.filter(id__in=failed).update(failed=now())
+    return delivered
+
+
+def touch(notifications):
+    """
+    Set time_last_event_received of subscriptions to time of their latest
+    notification, with one UPDATE.
+    """
+    latest = {}
+    for notification in notifications:
+        sid = notification.subscription_id
+        latest[sid] = max(latest.get(sid, notification.received), notification.received)
+    if latest:
+        Subscription.objects.filter(id__in=latest).update(time_last_event_received=Case(
+            *[When(id=sid, then=Value(received)) for sid, received in latest.items()],
+            output_field=DateTimeField(),
+        ))
@@ -0,0 +1,121 @@
+"""
+Notification body size limits.
+
+Maximum body size of notifications is taken from `Subscription.max_body_size`,
+`max_body_size` of the hub in settings.WEBSUBSUB_HUBS, or
+settings.WEBSUBSUB_MAX_BODY_SIZE, whichever is set first. `WssView.post`
+checks it after cached subscription lookup and before the body is read:
+
+ * Bodies with Content-Length over the limit are rejected with 413 status
+   without reading them.
+ * Bodies of unknown length are read in chunks into a temporary file, which
+   is kept in memory up to settings.FILE_UPLOAD_MAX_MEMORY_SIZE bytes and on
+   disk after that, and rejected as soon as they exceed the limit. Accepted
+   bodies are then read by parsers from this file.
+ * Bodies with Content-Length within the limit, but over
+   settings.FILE_UPLOAD_MAX_MEMORY_SIZE, are read into the same temporary
+   file on disk, without the limit.
+"""
+import logging
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+
+logger = logging.getLogger('websubsub.limits')
+
+CHUNK_SIZE = 64 * 1024
+
+
+def max_body_size(ssn):
+    """
+    Return body size limit of subscription dict from `routing.subscription()`,
+    or None if there is no limit.
+    """
+    hub = settings.WEBSUBSUB_HUBS.get(ssn['hub_url'], {})
+    for limit in (ssn['max_body_size'], hub.get('max_body_size'), settings.WEBSUBSUB_MAX_BODY_SIZE):
+        if limit is not None:
+            return limit
+    return None
+
+
+def spool(request, limit=None, update=None):
+    """
+    Read request body into temporary file, up to limit if given, passing
+    every chunk to `update` function if given. Returns False if body exceeds
+    the limit. Body which was already spooled is read again from its file.
+    """
+    request = getattr(request, '_request', request)  # Django request of DRF one.
+    if hasattr(request, '_body'):
+        if update:
+            update(request._body)
+        return limit is None or len(request._body) <= limit
+    spooled = getattr(request, '_spooled', None)
+    if spooled is not None:
+        source = file = spooled
+        file.seek(0)
+    else:
+        source = request
+        file = SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    size = 0
+    while True:
+        chunk = source.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if limit is not None and size > limit:
+            file.close()
+            return False
+        if update:
+            update(chunk)
+        if spooled is None:
+            file.write(chunk)
+    file.seek(0)
+    # Let request.body and parsers read the body again, from the file.
+    request._stream = request._spooled = file
+    request._read_started = False
+    return True
+
+
+def read(request):
+    """
+    Return request body, read in chunks like `spool()`. Unlike request.body,
+    bodies over settings.DATA_UPLOAD_MAX_MEMORY_SIZE are not rejected.
+    """
+    chunks = []
+    spool(request, update=chunks.append)
+    return b''.join(chunks)
+
+
+def stream(request):
+    """
+    Return request body as a file at its start, spooled in chunks like
+    `spool()` if it was not yet. Seek it back to 0 after reading, so parsers
+    read the whole body.
+    """
+    request = getattr(request, '_request', request)
+    if hasattr(request, '_body'):
+        return BytesIO(request._body)
+    if getattr(request, '_spooled', None) is None:
+        spool(request)
+    request._spooled.seek(0)
+    return request._spooled
+
+
+def check(request, ssn):
+    """
+    Return None if notification body is within size limit of subscription,
+    otherwise the limit. Bodies over settings.FILE_UPLOAD_MAX_MEMORY_SIZE are
+    spooled to disk.
+    """
+    limit = max_body_size(ssn)
+    length = request.META.get('CONTENT_LENGTH') or ''
+    if length.isdigit():
+        if limit is not None and int(length) > limit:
+            return limit
+        if int(length) > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            spool(request)
+        return None
+    if limit is None:
+        return None
+    return None if spool(request, limit) else limit
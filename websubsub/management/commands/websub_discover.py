@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from websubsub import discovery
+
+
+class Command(BaseCommand):
+    help = 'Discover hubs and self urls of topics. Results are cached, see websubsub.discovery.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('topics', nargs='+', help='topic urls')
+        parser.add_argument(
+            '--concurrency', type=int, default=None,
+            help='number of topics fetched at once, default WEBSUBSUB_DISCOVERY_CONCURRENCY',
+        )
+
+    def handle(self, *args, **kwargs):
+        found = discovery.discover_many(kwargs['topics'], kwargs['concurrency'])
+        for topic, result in found.items():
+            if result is None:
+                print(f'{topic}: discovery failed')
+            elif not result.hubs:
+                print(f'{topic}: no hubs found')
+            else:
+                print(f'{topic}: hubs {", ".join(result.hubs)}, self {result.self}')
@@ -0,0 +1,59 @@
+import logging
+from django.core.management.base import BaseCommand
+
+from websubsub.fakehub import FakeHub
+
+log = logging.getLogger('websubsub')
+
+
+def add_fakehub_arguments(parser):
+    parser.add_argument('--host', default='127.0.0.1', help='listen address')
+    parser.add_argument('--port', type=int, default=8765, help='listen port')
+    parser.add_argument(
+        '--latency', type=float, default=0,
+        help='seconds to wait before responding to subscription request',
+    )
+    parser.add_argument(
+        '--error-rate', type=float, default=0,
+        help='share of subscription requests to fail with status 500, e.g. 0.01',
+    )
+    parser.add_argument(
+        '--throttle-rate', type=float, default=0,
+        help='share of subscription requests to fail with status 429, e.g. 0.01',
+    )
+    parser.add_argument(
+        '--verify-delay', type=float, default=0,
+        help='seconds to wait before sending verification request',
+    )
+    parser.add_argument(
+        '--lease-seconds', type=int, default=86400,
+        help='hub.lease_seconds sent in verification request',
+    )
+
+
+def fakehub_from_options(**kwargs):
+    return FakeHub(
+        host = kwargs['host'],
+        port = kwargs['port'],
+        latency = kwargs['latency'],
+        error_rate = kwargs['error_rate'],
+        throttle_rate = kwargs['throttle_rate'],
+        verify_delay = kwargs['verify_delay'],
+        lease_seconds = kwargs['lease_seconds'],
+    )
+
+
+class Command(BaseCommand):
+    help = 'Run fake websub hub for local testing.'
+
+    def add_arguments(self, parser):
+        add_fakehub_arguments(parser)
+
+    def handle(self, *args, **kwargs):
+        hub = fakehub_from_options(**kwargs)
+        print(f'Fake hub is listening on {hub.url} Press Ctrl+C to stop.')
+        try:
+            hub.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        print(hub.stats.report())
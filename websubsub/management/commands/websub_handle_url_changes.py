@@ -10,6 +10,7 @@ from django.urls import resolve, reverse, Resolver404, NoReverseMatch
 
 from websubsub.models import Subscription
 from websubsub.tasks import subscribe
+from websubsub.tasks.dedup import delay_once
 
 log = logging.getLogger('websubsub')
 
@@ -138,7 +139,7 @@ class Command(BaseCommand):
         ssn.update(callback_url=new_url)
         print(f'Subscription {ssn.pk} url changed to {new_url}.')
         if ssn.subscribe_status == 'verified':
-            subscribe.delay(pk=ssn.pk)
+            delay_once(subscribe, ssn.pk)
         
         
     def update_urlname(self, ssn, new_urlname):
@@ -147,7 +148,7 @@ class Command(BaseCommand):
         #except Subscription
         print(f'Subscription {ssn.pk} urlname changed to {new_urlname}.')
         if ssn.subscribe_status == 'verified':
-            subscribe.delay(pk=ssn.pk)
+            delay_once(subscribe, ssn.pk)
         
 
     def handle_static(self):
@@ -0,0 +1,127 @@
+import json
+import logging
+import time
+from uuid import uuid4
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from websubsub.backends import delay
+from websubsub.models import Subscription
+from websubsub.tasks import retry_failed
+
+from .websub_fakehub import add_fakehub_arguments, fakehub_from_options
+
+log = logging.getLogger('websubsub')
+
+
+class Command(BaseCommand):
+    help = (
+        'Run load test against running site: subscribe N topics with in-process fake hub, '
+        'wait until all subscriptions are verified, then push notifications at target rate. '
+        'Site at WEBSUBSUB_OWN_ROOTURL and task workers must be running.'
+    )
+
+    def add_arguments(self, parser):
+        add_fakehub_arguments(parser)
+        parser.set_defaults(port=0)
+        parser.add_argument(
+            'urlname',
+            help='callback urlname to subscribe with',
+        )
+        parser.add_argument(
+            '-n', '--subscriptions', type=int, default=100,
+            help='number of subscriptions to create',
+        )
+        parser.add_argument(
+            '--rate', type=float, default=50,
+            help='notifications per second to push',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='seconds to push notifications for',
+        )
+        parser.add_argument(
+            '--payload-size', type=int, default=1024,
+            help='notification payload size in bytes',
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=300,
+            help='seconds to wait for all subscriptions to be verified',
+        )
+        parser.add_argument(
+            '--retry-interval', type=float, default=5,
+            help='schedule retry_failed task every that many seconds while waiting',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='print report as json',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='do not delete created subscriptions after the test',
+        )
+
+    def handle(self, *args, **kwargs):
+        hub = fakehub_from_options(**kwargs)
+        hub.start()
+        try:
+            report = self.run(hub, **kwargs)
+        finally:
+            hub.stop()
+            if not kwargs['keep']:
+                Subscription.objects.filter(hub_url=hub.url).delete()
+
+        if kwargs['json']:
+            print(json.dumps(report, indent=2))
+            return
+        print(f'Subscriptions verified: {report["verified"]}/{kwargs["subscriptions"]}')
+        print(f'Convergence time: {report["convergence_time"]:.2f}s')
+        print(f'Pushed: {report["pushed"]}, throughput: {report["throughput"]:.1f}/s')
+        for name in ('hub_response', 'verify', 'push'):
+            if name in report['hub']:
+                stat = report['hub'][name]
+                print(
+                    f'{name} latency: p50 {stat["p50"] * 1000:.1f}ms, '
+                    f'p99 {stat["p99"] * 1000:.1f}ms ({stat["count"]} requests)'
+                )
+        print(f'Hub counters: {report["hub"]["counters"]}')
+
+    def run(self, hub, **kwargs):
+        n = kwargs['subscriptions']
+        prefix = f'loadtest-{uuid4().hex}'
+        print(f'Subscribing {n} topics with fake hub {hub.url}, callback root {settings.WEBSUBSUB_OWN_ROOTURL}')
+
+        started = time.monotonic()
+        Subscription.bulk_create_and_subscribe(
+            (f'{prefix}-{i}' for i in range(n)), urlname=kwargs['urlname'], hub=hub.url
+        )
+        verified = Subscription.objects.filter(hub_url=hub.url, subscribe_status='verified')
+        last_retry = started
+        count = 0
+        while time.monotonic() - started < kwargs['timeout']:
+            count = verified.count()
+            if count >= n:
+                break
+            if time.monotonic() - last_retry > kwargs['retry_interval']:
+                delay(retry_failed)
+                last_retry = time.monotonic()
+            time.sleep(0.5)
+        convergence_time = time.monotonic() - started
+
+        pushed = 0
+        push_started = time.monotonic()
+        if kwargs['duration'] and kwargs['rate']:
+            print(f'Pushing {kwargs["rate"]}/s notifications for {kwargs["duration"]}s')
+            pushed = hub.push(kwargs['rate'], kwargs['duration'], kwargs['payload_size'])
+        push_time = time.monotonic() - push_started
+
+        return {
+            'subscriptions': n,
+            'verified': count,
+            'convergence_time': convergence_time,
+            'pushed': pushed,
+            'throughput': pushed / push_time if push_time else 0,
+            'hub': hub.stats.report(),
+        }
@@ -3,6 +3,7 @@ import logging
 from django.apps import apps
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db.models import Count
 from django.urls import resolve, reverse, NoReverseMatch
 
 from websubsub.models import Subscription
@@ -22,22 +23,35 @@ class Command(BaseCommand):
         )
         
     def handle(self, *args, **kwargs):
-        unresolvable_pks = set()
-        for ssn in Subscription.objects.all():
+        # Urlnames are few, subscriptions are many: check each distinct urlname once.
+        urlnames = Subscription.objects \
+            .order_by() \
+            .values_list('callback_urlname', flat=True) \
+            .distinct()
+        unresolvable = []
+        for urlname in urlnames:
             try:
-                reverse(ssn.callback_urlname, args=[uuid4()])
+                reverse(urlname, args=[uuid4()])
             except NoReverseMatch:
-                unresolvable_pks.add(ssn.pk)
-                print(
-                    f'Subscription {ssn.pk} with topic {ssn.topic} has unresolvable '
-                    f'urlname {ssn.callback_urlname}'
-                )
-        if not unresolvable_pks:
+                unresolvable.append(urlname)
+
+        if not unresolvable:
             print('No unresolvable subscriptions found')
             return
+
+        counts = dict(
+            Subscription.objects
+            .filter(callback_urlname__in=unresolvable)
+            .order_by()
+            .values_list('callback_urlname')
+            .annotate(total=Count('pk'))
+        )
+        for urlname in unresolvable:
+            print(f'{counts.get(urlname, 0)} subscriptions have unresolvable urlname {urlname}')
+        total = sum(counts.values())
         
         if not kwargs['yes']:
-            text = f'Are you sure you want to delete {len(unresolvable_pks)} subscriptions? (y/N): '
+            text = f'Are you sure you want to delete {total} subscriptions? (y/N): '
             while True:
                 answer = input(text)
                 if not answer or answer in ('n','N'):
@@ -45,6 +59,7 @@ class Command(BaseCommand):
                 if answer in ('y', 'Y'):
                     break
         
-        Subscription.objects.filter(pk__in=unresolvable_pks).delete()
-        print(f'{len(unresolvable_pks)} subscriptions was successfully removed from database')
+        # Deleted in chunks of pks, without loading subscriptions for CASCADE to consumers.
+        deleted = Subscription.objects.filter(callback_urlname__in=unresolvable).purge()
+        print(f'{deleted} subscriptions was successfully removed from database')
         
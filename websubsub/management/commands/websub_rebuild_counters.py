@@ -0,0 +1,22 @@
+import logging
+from django.core.management.base import BaseCommand
+from dumblock import lock_or_exit
+
+from websubsub.models import SubscriptionCounter
+
+log = logging.getLogger('websubsub')
+
+
+class Command(BaseCommand):
+    help = 'Recount subscriptions by hub and status from scratch.'
+
+    @lock_or_exit('websubsub_rebuild_counters')
+    def handle(self, *args, **kwargs):
+        count = SubscriptionCounter.rebuild()
+        print(f'Subscription counters rebuilt, {count} subscriptions counted.')
+        for counter in SubscriptionCounter.objects.order_by('hub_url', 'static'):
+            print(
+                f'  {counter.hub_url} static={counter.static} '
+                f'subscribe_status={counter.subscribe_status} '
+                f'unsubscribe_status={counter.unsubscribe_status or None}: {counter.count}'
+            )
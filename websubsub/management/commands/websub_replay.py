@@ -0,0 +1,90 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils.dateparse import parse_datetime
+
+from websubsub import inbox
+from websubsub.models import Notification
+from websubsub.tasks.batch import chunked
+
+log = logging.getLogger('websubsub')
+
+
+def datetime_arg(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        'Deliver notifications stored in the inbox to handler tasks again. Notifications are '
+        'selected by time received, subscription, urlname and parse failure, and delivered in '
+        'parallel batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since', type=datetime_arg,
+            help='replay notifications received at or after this time, ex.: 2020-02-21T18:00:00Z',
+        )
+        parser.add_argument(
+            '--until', type=datetime_arg,
+            help='replay notifications received before this time',
+        )
+        parser.add_argument(
+            '--subscription', action='append', default=[],
+            help='replay notifications of this subscription id, can be repeated',
+        )
+        parser.add_argument(
+            '--urlname',
+            help='replay notifications received by callback with this urlname',
+        )
+        parser.add_argument(
+            '--failed', action='store_true',
+            help='replay only notifications which failed to parse',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='number of batches to deliver in parallel',
+        )
+
+    def handle(self, *args, **kwargs):
+        notifications = Notification.objects.order_by('id')
+        if kwargs['since']:
+            notifications = notifications.filter(received__gte=kwargs['since'])
+        if kwargs['until']:
+            notifications = notifications.filter(received__lt=kwargs['until'])
+        if kwargs['subscription']:
+            notifications = notifications.filter(subscription_id__in=kwargs['subscription'])
+        if kwargs['urlname']:
+            notifications = notifications.filter(callback_urlname=kwargs['urlname'])
+        if kwargs['failed']:
+            notifications = notifications.filter(failed__isnull=False)
+        if not any(kwargs[x] for x in ('since', 'until', 'subscription', 'urlname', 'failed')):
+            raise CommandError(
+                'Specify at least one of --since, --until, --subscription, --urlname, --failed'
+            )
+
+        ids = notifications.values_list('id', flat=True).iterator()
+        batches = chunked(ids, settings.WEBSUBSUB_DISPATCH_BATCH_SIZE)
+        if kwargs['workers'] > 1:
+            with ThreadPoolExecutor(kwargs['workers']) as executor:
+                delivered = sum(executor.map(self.replay_in_thread, batches))
+        else:
+            delivered = sum(map(self.replay, batches))
+        print(f'Replayed {delivered} notifications.')
+
+    def replay(self, ids):
+        notifications = Notification.objects.filter(id__in=ids).order_by('id')
+        # Replayed feed entries are not new, but should be delivered anyway.
+        return len(inbox.deliver(notifications, detect_changes=False))
+
+    def replay_in_thread(self, ids):
+        try:
+            return self.replay(ids)
+        finally:
+            close_old_connections()
@@ -16,16 +16,9 @@ class Command(BaseCommand):
 
     def handle(self, *args, **kwargs):
 
-        Subscription.objects.update(
-            connerror_count = 0,
-            huberror_count = 0,
-            verifytimeout_count = 0,
-            verifyerror_count = 0,
-            subscribe_attempt_time = None,
-            unsubscribe_attempt_time = None
-        )
+        count = Subscription.objects.reset_counters()
         print(
-            f'{Subscription.objects.count()} subscriptions retry counters now got'
+            f'{count} subscriptions retry counters now got'
             ' reset to\n'
             '  connerror_count = 0\n'
             '  huberror_count = 0\n'
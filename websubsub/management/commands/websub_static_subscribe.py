@@ -6,6 +6,7 @@ from django.urls import resolve, Resolver404
 
 from websubsub.models import Subscription
 from websubsub.tasks import subscribe
+from websubsub.tasks.dedup import delay_once
 
 log = logging.getLogger('websubsub')
 
@@ -94,7 +95,7 @@ class Command(BaseCommand):
                 f'  callback_urlname: {urlname}\n'
                 f'is created and scheduled.\n'
             )
-            subscribe.delay(pk=ssn.pk)
+            delay_once(subscribe, ssn.pk)
             return ssn
         
         # Mark subscription as static, even if it was previously created dynamically.
@@ -136,7 +137,7 @@ class Command(BaseCommand):
                         subscribe_attempt_time = None,
                         unsubscribe_attempt_time = None
                     )
-                subscribe.delay(pk=ssn.pk)
+                delay_once(subscribe, ssn.pk)
             else:
                 # TODO: graceful unsubscribe
                 print(
@@ -155,7 +156,7 @@ class Command(BaseCommand):
                 f'Scheduling to resubscribe with new callback_url.'
             )
             ssn.update(subscribe_status='requesting')
-            subscribe.delay(pk=ssn.pk)
+            delay_once(subscribe, ssn.pk)
             return ssn
         
         if ssn.subscribe_status == 'verified' and not kwargs['force']:
@@ -166,7 +167,7 @@ class Command(BaseCommand):
             return ssn
             
         ssn.update(subscribe_status='requesting')
-        subscribe.delay(pk=ssn.pk)
+        delay_once(subscribe, ssn.pk)
         print(
             f'Static subscription {ssn.pk} with \n'
             f'  hub: {hub} \n'
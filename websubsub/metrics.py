@@ -0,0 +1,157 @@
+"""
+Prometheus metrics.
+
+Requires `prometheus_client` package, otherwise all metrics are no-op. Expose
+them with `websubsub.views.metrics_view` in your urls.py:
+
+>>> path('metrics', metrics_view)
+
+For gunicorn and celery workers with multiple processes set
+PROMETHEUS_MULTIPROC_DIR environment variable, as described in prometheus_client
+documentation. Metrics of all processes are then aggregated by metrics_view.
+"""
+import logging
+import os
+import time
+
+logger = logging.getLogger('websubsub.metrics')
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+
+class NoopMetric(object):
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def set(self, value):
+        pass
+
+
+def _metric(cls_name, name, documentation, labelnames):
+    if prometheus_client is None:
+        return NoopMetric()
+    return getattr(prometheus_client, cls_name)(name, documentation, labelnames)
+
+
+NOTIFICATIONS = _metric(
+    'Counter', 'websubsub_notifications', 'Notifications received',
+    ['urlname', 'hub']
+)
+VERIFICATIONS = _metric(
+    'Counter', 'websubsub_verifications', 'Verification requests received from hub',
+    ['mode', 'outcome']
+)
+HUB_RESPONSES = _metric(
+    'Counter', 'websubsub_hub_responses', 'Hub responses to (un)subscription requests',
+    ['hub', 'mode', 'code']
+)
+RETRIES = _metric(
+    'Counter', 'websubsub_retries', '(Un)subscription attempts retried after error',
+    ['mode', 'error']
+)
+HUB_REQUEST_SECONDS = _metric(
+    'Histogram', 'websubsub_hub_request_seconds', 'Hub (un)subscription request latency',
+    ['hub', 'mode']
+)
+CALLBACK_SECONDS = _metric(
+    'Histogram', 'websubsub_callback_seconds', 'Callback view request handling time',
+    ['method']
+)
+DEDUP_NOTIFICATIONS = _metric(
+    'Counter', 'websubsub_dedup_notifications', 'Notifications checked for duplicates, by outcome',
+    ['urlname', 'outcome']
+)
+ADMISSION = _metric(
+    'Counter', 'websubsub_admission_shed', 'Notifications shed by admission controller',
+    ['urlname', 'decision']
+)
+REJECTED = _metric(
+    'Counter', 'websubsub_rejected_notifications', 'Notifications rejected before reading body',
+    ['urlname', 'reason']
+)
+QUEUE_DEPTH = _metric(
+    'Gauge', 'websubsub_queue_depth', 'Sampled depth of handler task queue',
+    ['queue']
+)
+TASK_QUEUE_SECONDS = _metric(
+    'Histogram', 'websubsub_task_queue_seconds', 'Time tasks spent waiting in queue',
+    ['task']
+)
+
+
+def count_notification(urlname, hub):
+    if prometheus_client is not None:
+        NOTIFICATIONS.labels(urlname, hub).inc()
+
+
+# Status of failed attempt: error class
+RETRY_ERRORS = {
+    'connerror': 'connerror',
+    'huberror': 'huberror',
+    'verifyerror': 'verifyerror',
+    'verifying': 'verifytimeout',
+}
+
+
+def count_retry(mode, status):
+    """
+    Count (un)subscription attempt if previous attempt ended with status of failure.
+    """
+    if status in RETRY_ERRORS:
+        RETRIES.labels(mode, RETRY_ERRORS[status]).inc()
+
+
+def task_name(task):
+    return getattr(task, 'name', None) or getattr(task, '__name__', None) or repr(task)
+
+
+def observe_queue_delay(task, enqueued):
+    if enqueued:
+        TASK_QUEUE_SECONDS.labels(task_name(task)).observe(time.time() - enqueued)
+
+
+class StatusCollector(object):
+    """
+    Collect subscriptions count by status at scrape time, from SubscriptionCounter.
+    """
+    def collect(self):
+        from prometheus_client.core import GaugeMetricFamily
+        from .models import SubscriptionCounter
+
+        gauge = GaugeMetricFamily(
+            'websubsub_subscriptions', 'Subscriptions by status',
+            labels=['hub', 'static', 'subscribe_status', 'unsubscribe_status']
+        )
+        rows = SubscriptionCounter.objects.filter(count__gt=0).values_list(
+            'hub_url', 'static', 'subscribe_status', 'unsubscribe_status', 'count'
+        )
+        for hub, static, substatus, unsubstatus, total in rows:
+            gauge.add_metric([hub, str(static), substatus, unsubstatus], total)
+        yield gauge
+
+
+def generate():
+    """
+    Return metrics in prometheus text format and its content type.
+    """
+    from prometheus_client import CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+
+    status_registry = CollectorRegistry()
+    status_registry.register(StatusCollector())
+    return generate_latest(registry) + generate_latest(status_registry), CONTENT_TYPE_LATEST
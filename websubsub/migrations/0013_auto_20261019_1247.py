@@ -0,0 +1,21 @@
+# Generated by Django 3.0.14 on 2026-10-19 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('websubsub', '0012_auto_20200221_1827'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['subscribe_status', 'unsubscribe_status'], name='websubsub_s_subscri_2bce3e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['static'], name='websubsub_s_static_f17ef1_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.0.14 on 2026-10-19 12:56
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_subscriptions(apps, schema_editor):
+    Subscription = apps.get_model('websubsub', 'Subscription')
+    SubscriptionCounter = apps.get_model('websubsub', 'SubscriptionCounter')
+    rows = Subscription.objects \
+        .order_by() \
+        .values_list('hub_url', 'static', 'subscribe_status', 'unsubscribe_status') \
+        .annotate(total=Count('pk'))
+    SubscriptionCounter.objects.bulk_create(
+        SubscriptionCounter(
+            hub_url=hub_url,
+            static=static,
+            subscribe_status=subscribe_status,
+            unsubscribe_status=unsubscribe_status or '',
+            count=total
+        )
+        for hub_url, static, subscribe_status, unsubscribe_status, total in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('websubsub', '0013_auto_20261019_1247'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriptionCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hub_url', models.TextField()),
+                ('static', models.BooleanField()),
+                ('subscribe_status', models.CharField(max_length=20)),
+                ('unsubscribe_status', models.CharField(blank=True, max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('hub_url', 'static', 'subscribe_status', 'unsubscribe_status')},
+            },
+        ),
+        migrations.RunPython(count_subscriptions, reverse_code=migrations.RunPython.noop)
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.0.14 on 2026-10-19 13:03
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('websubsub', '0014_subscriptioncounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('subscription_id', models.UUIDField()),
+                ('callback_urlname', models.CharField(max_length=200)),
+                ('received', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content_type', models.CharField(blank=True, max_length=255)),
+                ('body', models.BinaryField()),
+                ('delivered', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(delivered__isnull=True), fields=['id'], name='websubsub_inbox_pending'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['received'], name='websubsub_n_receive_fd5588_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['subscription_id', 'received'], name='websubsub_n_subscri_ecfe7f_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-19 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('websubsub', '0015_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='priority',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
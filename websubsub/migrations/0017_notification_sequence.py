@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-19 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('websubsub', '0016_subscription_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='sequence',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
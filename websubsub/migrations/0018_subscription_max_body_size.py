@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-19 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('websubsub', '0017_notification_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='max_body_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.14 on 2026-10-19 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('websubsub', '0018_subscription_max_body_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='secret',
+            field=models.CharField(blank=True, max_length=199, null=True),
+        ),
+    ]
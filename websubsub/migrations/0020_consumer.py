@@ -0,0 +1,26 @@
+# Generated by Django 3.0.14 on 2026-10-19 13:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('websubsub', '0019_subscription_secret'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Consumer',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('callback_urlname', models.CharField(max_length=200)),
+                ('time_created', models.DateTimeField(auto_now_add=True)),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumers', to='websubsub.Subscription')),
+            ],
+            options={
+                'unique_together': {('subscription', 'callback_urlname')},
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.0.14 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('websubsub', '0020_consumer'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='websubsub_inbox_pending',
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='failed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('delivered__isnull', True), ('failed__isnull', True)), fields=['id'], name='websubsub_inbox_pending'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.14 on 2026-10-19 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('websubsub', '0021_notification_failed'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['topic'], name='websubsub_topic_prefix', opclasses=['text_pattern_ops']),
+        ),
+    ]
@@ -1,20 +1,190 @@
 import logging
+from collections import defaultdict
 from urllib.parse import urljoin
 from uuid import uuid4
 
+from django.db import transaction, IntegrityError
 from django.db.models import (
-    Model, CharField, IntegerField, TextField, DateTimeField, UUIDField, BooleanField
+    Model, QuerySet, CharField, IntegerField, TextField, DateTimeField, UUIDField, BooleanField,
+    BigAutoField, BigIntegerField, BinaryField, PositiveIntegerField, ForeignKey, CASCADE,
+    Index, Count, F, Q
 )
 from django.conf import settings
 from django.urls import reverse
+from django.utils.timezone import now
 
 
 logger = logging.getLogger('websubsub.models')
 
 
+RESET_COUNTERS = {
+    'connerror_count': 0,
+    'huberror_count': 0,
+    'verifyerror_count': 0,
+    'verifytimeout_count': 0,
+}
+
+
+# Subscription fields counted in SubscriptionCounter
+COUNTER_FIELDS = ('hub_url', 'static', 'subscribe_status', 'unsubscribe_status')
+
+
+def _counter_key(values):
+    # Empty string instead of NULL unsubscribe_status, to keep key unique and sortable.
+    hub_url, static, subscribe_status, unsubscribe_status = values
+    return (hub_url, static, subscribe_status, unsubscribe_status or '')
+
+
+def _counter_delta(queryset, **values):
+    """
+    Return {key: change} of counters after rows matched by queryset are
+    updated with values, or deleted if no values given. Rows are locked in pk
+    order until the end of transaction, so concurrent changes of the same
+    rows wait and see their new values.
+    """
+    delta = defaultdict(int)
+    rows = queryset.order_by('pk').select_for_update().values_list(*COUNTER_FIELDS)
+    for row in rows.iterator():
+        delta[_counter_key(row)] -= 1
+        if values:
+            delta[_counter_key(values.get(f, row[n]) for n, f in enumerate(COUNTER_FIELDS))] += 1
+    return delta
+
+
+def _apply_counter_delta(delta):
+    """
+    Add {key: change} to SubscriptionCounter rows. Must be called in transaction.
+    Counters are updated in key order, so concurrent transactions do not deadlock.
+    """
+    for key, change in sorted(delta.items()):
+        if not change:
+            continue
+        values = dict(zip(COUNTER_FIELDS, key))
+        counter = SubscriptionCounter.objects.filter(**values)
+        if counter.update(count=F('count') + change):
+            continue
+        try:
+            with transaction.atomic():
+                SubscriptionCounter.objects.create(count=change, **values)
+        except IntegrityError:
+            # Created concurrently.
+            counter.update(count=F('count') + change)
+
+
+class SubscriptionQuerySet(QuerySet):
+    """
+    Bulk operations. Rows are updated with one UPDATE per chunk of
+    settings.WEBSUBSUB_DISPATCH_BATCH_SIZE pks, and tasks are published to the
+    broker in groups of the same size.
+
+    >>> Subscription.objects.filter(hub_url='http://example.com').resubscribe()
+
+    """
+    def _update_and_delay(self, task, **values):
+        from .tasks.batch import chunked, delay_many
+
+        # Fetch pks before update, because update may change rows matched by
+        # this queryset filters.
+        pks = list(self.values_list('pk', flat=True))
+        for chunk in chunked(pks, settings.WEBSUBSUB_DISPATCH_BATCH_SIZE):
+            self.model.objects.filter(pk__in=chunk).update(**values)
+        return delay_many(task, pks)
+
+    def resubscribe(self):
+        """
+        Reset error counters and schedule to subscribe. Returns number of
+        scheduled subscriptions.
+        """
+        from . import tasks
+        return self._update_and_delay(tasks.subscribe,
+            unsubscribe_status = None,
+            subscribe_status = 'requesting',
+            subscribe_attempt_time = None,
+            **RESET_COUNTERS
+        )
+
+    def unsubscribe(self):
+        """
+        Reset error counters and schedule to unsubscribe. Returns number of
+        scheduled subscriptions.
+        """
+        from . import tasks
+        return self._update_and_delay(tasks.unsubscribe,
+            unsubscribe_status = 'requesting',
+            unsubscribe_attempt_time = None,
+            **RESET_COUNTERS
+        )
+
+    def reset_counters(self):
+        """
+        Reset retry counters. Returns number of updated subscriptions.
+        """
+        return self.update(
+            subscribe_attempt_time = None,
+            unsubscribe_attempt_time = None,
+            **RESET_COUNTERS
+        )
+
+    # Keep SubscriptionCounter up to date on every status change.
+
+    def update(self, **kwargs):
+        if not set(kwargs) & set(COUNTER_FIELDS):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            delta = _counter_delta(self, **kwargs)
+            count = super().update(**kwargs)
+            _apply_counter_delta(delta)
+        return count
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            delta = _counter_delta(self)
+            result = super().delete()
+            _apply_counter_delta(delta)
+        return result
+
+    def purge(self):
+        """
+        Delete subscriptions with their consumers in chunks of pks. Unlike
+        delete(), rows are not loaded into memory for CASCADE and signals.
+        Returns number of deleted subscriptions.
+        """
+        from .tasks.batch import chunked
+
+        deleted = 0
+        pks = list(self.values_list('pk', flat=True))
+        for chunk in chunked(pks, settings.WEBSUBSUB_DISPATCH_BATCH_SIZE):
+            with transaction.atomic(using=self.db):
+                ssns = self.model.objects.filter(pk__in=chunk)
+                delta = _counter_delta(ssns)
+                consumers = Consumer.objects.filter(subscription_id__in=chunk)
+                consumers._raw_delete(consumers.db)
+                deleted += ssns._raw_delete(ssns.db)
+                _apply_counter_delta(delta)
+        return deleted
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            # With ignore_conflicts only some of objs are created, count them by pk.
+            pks = {x.pk for x in objs}
+            pks -= set(self.model.objects.filter(pk__in=pks).values_list('pk', flat=True))
+            result = super().bulk_create(objs, *args, **kwargs)
+            delta = _counter_delta(self.model.objects.filter(pk__in=pks))
+            _apply_counter_delta({key: -change for key, change in delta.items()})
+        return result
+
+
 class Subscription(Model):
     class Meta:
         unique_together = ('hub_url', 'topic', 'callback_urlname')
+        # hub_url is covered by the unique_together index above.
+        indexes = [
+            Index(fields=['subscribe_status', 'unsubscribe_status']),
+            Index(fields=['static']),
+            # Serves LIKE 'prefix%' of admin topic search on PostgreSQL in any locale.
+            Index(fields=['topic'], name='websubsub_topic_prefix', opclasses=['text_pattern_ops']),
+        ]
 
     id = UUIDField(primary_key=True, default=uuid4, editable=False)
     time_created = DateTimeField(auto_now_add=True)
@@ -25,6 +195,12 @@ class Subscription(Model):
     callback_url = TextField(null=True)  # Generated on subscribe
     lease_expiration_time = DateTimeField(null=True, blank=True)
     static = BooleanField(default=False, editable=False)
+    # Priority of notification handler tasks, overrides settings.WEBSUBSUB_ROUTES
+    priority = IntegerField(null=True, blank=True)
+    # Maximum notification body size in bytes, overrides hub and global limits.
+    max_body_size = PositiveIntegerField(null=True, blank=True)
+    # Sent to hub as hub.secret, notifications must be signed with it.
+    secret = CharField(max_length=199, null=True, blank=True)
 
     STATUS = [
         # TODO: find out if 'requesting' guarantees that subscribe task will be scheduled
@@ -52,58 +228,213 @@ class Subscription(Model):
     subscribe_attempt_time = DateTimeField(null=True, blank=True)
     unsubscribe_attempt_time = DateTimeField(null=True, blank=True)
 
+    objects = SubscriptionQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            if self._state.adding:
+                super().save(*args, **kwargs)
+                key = _counter_key(getattr(self, f) for f in COUNTER_FIELDS)
+                _apply_counter_delta({key: 1})
+            elif update_fields is None or set(update_fields) & set(COUNTER_FIELDS):
+                values = {f: getattr(self, f) for f in COUNTER_FIELDS}
+                delta = _counter_delta(type(self).objects.filter(pk=self.pk), **values)
+                super().save(*args, **kwargs)
+                _apply_counter_delta(delta)
+            else:
+                super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            delta = _counter_delta(type(self).objects.filter(pk=self.pk))
+            result = super().delete(*args, **kwargs)
+            _apply_counter_delta(delta)
+        return result
+
+    @classmethod
+    def resolve_hub(cls, topic, hub=None):
+        """
+        Return (hub, topic) tuple of given hub, or of the first hub and self
+        url discovered for the topic if settings.WEBSUBSUB_DISCOVER_HUBS is
+        enabled, or of default hub. Hubs match notifications to subscriptions
+        by the self url, so it is subscribed instead of the topic url.
+        """
+        if hub:
+            return hub, topic
+        if settings.WEBSUBSUB_DISCOVER_HUBS:
+            from . import discovery
+            try:
+                found = discovery.discover(topic)
+            except Exception as e:
+                logger.error(f'Failed to discover hubs of topic {topic}: {e!r}')
+            else:
+                if found.hubs:
+                    return found.hubs[0], found.self
+        if not settings.WEBSUBSUB_DEFAULT_HUB_URL:
+            raise Exception('Provide hub or set WEBSUBSUB_DEFAULT_HUB_URL setting.')
+        return settings.WEBSUBSUB_DEFAULT_HUB_URL, topic
+
     @classmethod
     def create(cls, topic, urlname, hub=None, static=False):
         from . import tasks
-        if not hub and not settings.WEBSUBSUB_DEFAULT_HUB_URL:
-            raise Exception('Provide hub or set WEBSUBSUB_DEFAULT_HUB_URL setting.')
+        from .tasks.dedup import delay_once
+        hub, topic = cls.resolve_hub(topic, hub)
 
         ssn = cls.objects.create(
             topic=topic,
             callback_urlname=urlname,
-            hub_url=hub or settings.WEBSUBSUB_DEFAULT_HUB_URL,
+            hub_url=hub,
             static=static
         )
-        ssn._subscriberesult = tasks.subscribe.delay(pk=ssn.pk)
+        ssn._subscriberesult = delay_once(tasks.subscribe, ssn.pk)
         return ssn
 
+    @classmethod
+    def bulk_create_and_subscribe(cls, topics, urlname, hub=None, static=False):
+        """
+        Create subscriptions for many topics with a few INSERT statements and
+        schedule them to subscribe. Topics which are already subscribed with
+        the same hub and urlname are left untouched. Without hub, hubs of topics
+        are discovered if settings.WEBSUBSUB_DISCOVER_HUBS is enabled.
+
+        Returns list of pks of created subscriptions.
+        """
+        from . import tasks, unwanted
+        from .tasks.batch import chunked, delay_many
+        if not hub and settings.WEBSUBSUB_DISCOVER_HUBS:
+            from . import discovery
+            by_hub = defaultdict(list)
+            for topic, found in discovery.discover_many(topics).items():
+                if found and found.hubs:
+                    by_hub[found.hubs[0]].append(found.self)
+                else:
+                    by_hub[None].append(topic)
+            if None in by_hub and not settings.WEBSUBSUB_DEFAULT_HUB_URL:
+                raise Exception(
+                    f'No hubs found for topics {by_hub[None]}, set WEBSUBSUB_DEFAULT_HUB_URL setting.'
+                )
+            return [
+                pk
+                for hub_url, hub_topics in by_hub.items()
+                for pk in cls.bulk_create_and_subscribe(
+                    hub_topics, urlname, hub_url or settings.WEBSUBSUB_DEFAULT_HUB_URL, static
+                )
+            ]
+        if not hub and not settings.WEBSUBSUB_DEFAULT_HUB_URL:
+            raise Exception('Provide hub or set WEBSUBSUB_DEFAULT_HUB_URL setting.')
+        hub = hub or settings.WEBSUBSUB_DEFAULT_HUB_URL
+
+        created = []
+        for chunk in chunked(topics, settings.WEBSUBSUB_DISPATCH_BATCH_SIZE):
+            objs = [
+                cls(topic=topic, callback_urlname=urlname, hub_url=hub, static=static)
+                for topic in chunk
+            ]
+            # Primary keys are generated on our side, so after ignoring conflicts
+            # on unique_together, rows with our pks are the ones actually created.
+            cls.objects.bulk_create(objs, ignore_conflicts=True)
+            created += cls.objects \
+                .filter(pk__in=[x.pk for x in objs]) \
+                .values_list('pk', flat=True)
+
+        # bulk_create does not send post_save.
+        for pk in created:
+            unwanted.discard(pk)
+
+        delay_many(tasks.subscribe, created)
+        return created
+
     def subscribe(self, urlname=None):
         """
-        Reset error counters and schedule to subscribe.
+        Reset error counters and schedule to subscribe. Returns None if
+        subscription is already scheduled to subscribe.
         """
         from . import tasks
+        from .tasks.dedup import delay_once
         if self.unsubscribe_status is not None:
             logger.warning(f'Resubscribing {self.pk}. Error counters will reset.')
-            self.unsubscribe_status = None
 
+        values = dict(
+            unsubscribe_status = None,
+            subscribe_status = 'requesting',
+            subscribe_attempt_time = None,
+            **RESET_COUNTERS
+        )
         if urlname:
-            self.callback_urlname = urlname
+            values['callback_urlname'] = urlname
+        self.update(**values)
+
+        return delay_once(tasks.subscribe, self.pk)
 
-        self.connerror_count = 0
-        self.huberror_count = 0
-        self.verifyerror_count = 0
-        self.verifytimeout_count = 0
-        self.subscribe_status = 'requesting'
-        self.subscribe_attempt_time = None
-        self.save()
+    @classmethod
+    def create_shared(cls, topic, urlname, hub=None):
+        """
+        Register callback urlname as a consumer of shared hub subscription of
+        the topic, see websubsub.fanout. Hub subscription is created and
+        scheduled to subscribe when the first consumer registers. Returns the
+        shared subscription.
+        """
+        from . import fanout
+        if not settings.WEBSUBSUB_SHARED_URLNAME:
+            raise Exception('Set WEBSUBSUB_SHARED_URLNAME setting to use shared subscriptions.')
+        hub, topic = cls.resolve_hub(topic, hub)
 
-        return tasks.subscribe.delay(pk=self.pk)
+        with transaction.atomic():
+            ssn, created = cls.objects.get_or_create(
+                hub_url = hub,
+                topic = topic,
+                callback_urlname = settings.WEBSUBSUB_SHARED_URLNAME,
+            )
+            # Serialize with release_shared() of the same subscription.
+            ssn = cls.objects.select_for_update().get(pk=ssn.pk)
+            Consumer.objects.get_or_create(subscription=ssn, callback_urlname=urlname)
+        fanout.forget(ssn.pk)
+        if created or ssn.unsubscribe_status is not None:
+            ssn._subscriberesult = ssn.subscribe()
+        return ssn
+
+    @classmethod
+    def release_shared(cls, topic, urlname, hub=None):
+        """
+        Unregister consumer of shared hub subscription of the topic. Hub
+        subscription is scheduled to unsubscribe when no consumers are left.
+        Returns number of remaining consumers, or None if there is no such
+        shared subscription. Topic is the one stored by create_shared(), i.e.
+        the discovered self url. Hub is required if the topic is shared at many hubs.
+        """
+        from . import fanout
+        lookup = dict(topic=topic, callback_urlname=settings.WEBSUBSUB_SHARED_URLNAME)
+        if hub:
+            lookup['hub_url'] = hub
+        with transaction.atomic():
+            ssns = list(cls.objects.select_for_update().filter(**lookup).order_by('pk')[:2])
+            if not ssns:
+                return None
+            if len(ssns) > 1:
+                raise Exception(f'Topic {topic} is shared at several hubs, provide hub.')
+            ssn = ssns[0]
+            ssn.consumers.filter(callback_urlname=urlname).delete()
+            remaining = ssn.consumers.count()
+        fanout.forget(ssn.pk)
+        if not remaining and ssn.unsubscribe_status is None:
+            ssn.unsubscribe()
+        return remaining
 
     def unsubscribe(self):
         """
-        Reset error counters and schedule to unsubscribe.
+        Reset error counters and schedule to unsubscribe. Returns None if
+        subscription is already scheduled to unsubscribe.
         """
         from . import tasks
+        from .tasks.dedup import delay_once
+        self.update(
+            unsubscribe_status = 'requesting',
+            unsubscribe_attempt_time = None,
+            **RESET_COUNTERS
+        )
 
-        self.connerror_count = 0
-        self.huberror_count = 0
-        self.verifyerror_count = 0
-        self.verifytimeout_count = 0
-        self.unsubscribe_status = 'requesting'
-        self.unsubscribe_attempt_time = None
-        self.save()
-
-        return tasks.unsubscribe.delay(pk=self.pk)
+        return delay_once(tasks.unsubscribe, self.pk)
 
     def reverse_url(self):
         return reverse(self.callback_urlname, args=(self.pk,))
@@ -128,3 +459,88 @@ class Subscription(Model):
             setattr(self, attr, val)
 
         self.save(update_fields=kwargs)
+
+
+class Consumer(Model):
+    """
+    Callback urlname whose handler task receives notifications of a shared
+    subscription, see websubsub.fanout.
+    """
+    class Meta:
+        unique_together = ('subscription', 'callback_urlname')
+
+    subscription = ForeignKey(Subscription, on_delete=CASCADE, related_name='consumers')
+    callback_urlname = CharField(max_length=200)
+    time_created = DateTimeField(auto_now_add=True)
+
+
+class SubscriptionCounter(Model):
+    """
+    Number of subscriptions by hub, static flag and status. Kept up to date in the
+    same transaction as subscriptions change. Repair with
+    `./manage.py websub_rebuild_counters`.
+    """
+    class Meta:
+        unique_together = ('hub_url', 'static', 'subscribe_status', 'unsubscribe_status')
+
+    hub_url = TextField()
+    static = BooleanField()
+    subscribe_status = CharField(max_length=20)
+    unsubscribe_status = CharField(max_length=20, blank=True)  # '' instead of NULL
+    count = IntegerField(default=0)
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Recount all subscriptions. Returns number of subscriptions.
+        """
+        with transaction.atomic():
+            cls.objects.all().delete()
+            rows = Subscription.objects \
+                .order_by() \
+                .values_list(*COUNTER_FIELDS) \
+                .annotate(total=Count('pk'))
+            cls.objects.bulk_create(
+                cls(
+                    hub_url = hub_url,
+                    static = static,
+                    subscribe_status = subscribe_status,
+                    unsubscribe_status = unsubscribe_status or '',
+                    count = total
+                )
+                for hub_url, static, subscribe_status, unsubscribe_status, total in rows
+            )
+        return sum(cls.objects.values_list('count', flat=True))
+
+
+class Notification(Model):
+    """
+    Raw notification received from hub, appended to the inbox by WssView.post
+    when settings.WEBSUBSUB_INBOX is enabled. See websubsub.inbox.
+    """
+    class Meta:
+        indexes = [
+            # Only pending notifications are indexed, to keep the index small.
+            Index(
+                fields=['id'],
+                condition=Q(delivered__isnull=True, failed__isnull=True),
+                name='websubsub_inbox_pending',
+            ),
+            Index(fields=['received']),
+            Index(fields=['subscription_id', 'received']),
+        ]
+
+    id = BigAutoField(primary_key=True)
+    # Not a foreign key: notifications are kept after subscription is deleted.
+    subscription_id = UUIDField()
+    # Per-subscription sequence number, if ordered delivery is enabled.
+    sequence = BigIntegerField(null=True, blank=True)
+    callback_urlname = CharField(max_length=200)
+    received = DateTimeField(default=now)
+    content_type = CharField(max_length=255, blank=True)
+    body = BinaryField()
+    # Time when notification was last handed to handler task.
+    delivered = DateTimeField(null=True, blank=True)
+    # Time when notification could not be resolved or parsed. Failed notifications
+    # are not drained nor compacted, replay them with `websub_replay --failed`.
+    failed = DateTimeField(null=True, blank=True)
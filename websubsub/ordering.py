@@ -0,0 +1,72 @@
+"""
+Per-subscription ordered delivery.
+
+Handler tasks are normally consumed by any worker, so two notifications of the
+same topic can be handled out of order. With settings.WEBSUBSUB_ORDERING set,
+every notification gets a per-subscription sequence number at receipt, and its
+handler task is published to one of `partitions` celery queues, chosen by hash
+of subscription id:
+
+>>> WEBSUBSUB_ORDERING = {'partitions': 8, 'queue_prefix': 'websub_ordered_'}
+
+Run one single-process worker per queue, e.g.
+`celery worker -Q websub_ordered_0 -c 1 --prefetch-multiplier 1`. Notifications
+of one subscription are then handled in order, while different subscriptions
+are handled by all workers in parallel. Routing queues and priorities do not
+apply in this mode, and local task backends do not keep order.
+
+All payloads of one notification, e.g. feed entries with
+settings.WEBSUBSUB_FEED_PARSING = 'entries', share its sequence number. Handler
+task can get the sequence number from task request headers, to detect replayed
+or lost notifications:
+
+>>> @shared_task(bind=True)
+>>> def news_task(self, data):
+>>>     seq = ordering.sequence(self.request)
+"""
+import logging
+import zlib
+
+import dumblock
+from django.conf import settings
+
+logger = logging.getLogger('websubsub.ordering')
+
+
+def enabled():
+    return bool(settings.WEBSUBSUB_ORDERING)
+
+
+def next_sequence(id):
+    """
+    Return next sequence number of the subscription notifications.
+    """
+    return dumblock.redis.incr(f'websubsub_sequence_{id}')
+
+
+def partition(id):
+    # Stable across processes, unlike hash().
+    return zlib.crc32(str(id).encode()) % settings.WEBSUBSUB_ORDERING.get('partitions', 8)
+
+
+def queue(id):
+    prefix = settings.WEBSUBSUB_ORDERING.get('queue_prefix', 'websub_ordered_')
+    return f'{prefix}{partition(id)}'
+
+
+def options(id, sequence):
+    """
+    Return apply_async options of handler task.
+    """
+    return {
+        'queue': queue(id),
+        'headers': {'websubsub_subscription': str(id), 'websubsub_sequence': sequence},
+    }
+
+
+def sequence(request):
+    """
+    Return sequence number of notification from handler task request, or None.
+    """
+    headers = getattr(request, 'headers', None) or {}
+    return request.get('websubsub_sequence') or headers.get('websubsub_sequence')
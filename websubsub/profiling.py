@@ -0,0 +1,227 @@
+"""
+Sampling profiler of callback requests and tasks.
+
+Set settings.WEBSUBSUB_PROFILE_RATE = N to profile every N-th `WssView`
+request and websubsub task. While a sampled call runs, background thread
+records its stack every `interval` seconds. Samples are aggregated in-process
+and periodically written to `<dump_dir>/websubsub-<pid>.collapsed` in collapsed
+stack format, one `frame;frame;frame count` line per distinct stack, suitable
+for flamegraph.pl or speedscope.
+
+Time spent by the sampler is measured. If it exceeds `max_overhead` share of
+wall time, sampling interval is doubled. Options are passed from
+settings.WEBSUBSUB_PROFILE_OPTIONS.
+"""
+import atexit
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+
+logger = logging.getLogger('websubsub.profiling')
+
+
+def collapse(frame, label, max_depth):
+    """
+    Return stack of frame as `label;outer;...;inner` string.
+    """
+    names = []
+    while frame is not None and len(names) < max_depth:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    names.append(label)
+    return ';'.join(reversed(names))
+
+
+class Profiler(object):
+    def __init__(self, rate, interval=0.005, dump_dir=None, dump_every=60,
+                 max_overhead=0.01, max_stacks=10000, max_depth=64):
+        """
+        rate - profile every rate-th call.
+        interval - seconds between stack samples.
+        dump_every - seconds between dumps of collected samples.
+        max_overhead - maximum share of wall time the sampler may take.
+        max_stacks - distinct stacks to keep, further ones are counted as `[truncated]`.
+        """
+        self.rate = rate
+        self.interval = interval
+        self.dump_dir = dump_dir or tempfile.gettempdir()
+        self.dump_every = dump_every
+        self.max_overhead = max_overhead
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.calls = itertools.count()
+        self.sampled = 0
+        # Labels of sampled calls running in threads, outermost first:
+        # {thread id: [label, ...]}
+        self.active = {}
+        self.lock = threading.Lock()
+        self.stacks = Counter()
+        self.samples = 0
+        self.overhead = 0.0
+        self.started = time.monotonic()
+        self.last_dump = self.started
+        self.thread = None
+        self.stopped = threading.Event()
+        atexit.register(self.shutdown)
+
+    @property
+    def path(self):
+        return os.path.join(self.dump_dir, f'websubsub-{os.getpid()}.collapsed')
+
+    def start(self, label):
+        """
+        Start profiling current thread if this call is sampled. Returns token
+        for `stop()`, or None. Samples of nested calls are labeled by the
+        outermost one.
+        """
+        if next(self.calls) % self.rate:
+            return None
+        tid = threading.get_ident()
+        with self.lock:
+            self.sampled += 1
+            labels = self.active.setdefault(tid, [])
+            labels.append(label)
+            token = (tid, len(labels) - 1)
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.sample_forever, name='websubsub-profiler', daemon=True
+                )
+                self.thread.start()
+        return token
+
+    def stop(self, token):
+        if token is not None:
+            tid, depth = token
+            with self.lock:
+                labels = self.active.get(tid, [])
+                # Also drops nested calls which were not stopped.
+                del labels[depth:]
+                if not labels:
+                    self.active.pop(tid, None)
+
+    @contextmanager
+    def profile(self, label):
+        token = self.start(label)
+        try:
+            yield
+        finally:
+            self.stop(token)
+
+    def sample(self):
+        started = time.perf_counter()
+        with self.lock:
+            active = [(tid, labels[0]) for tid, labels in self.active.items()]
+        if active:
+            frames = sys._current_frames()
+            stacks = [
+                (label, collapse(frames[tid], label, self.max_depth))
+                for tid, label in active if tid in frames
+            ]
+            with self.lock:
+                for label, stack in stacks:
+                    if stack not in self.stacks and len(self.stacks) >= self.max_stacks:
+                        stack = f'{label};[truncated]'
+                    self.stacks[stack] += 1
+                    self.samples += 1
+        self.overhead += time.perf_counter() - started
+
+    def sample_forever(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+            elapsed = time.monotonic() - self.started
+            if self.overhead > self.max_overhead * elapsed:
+                self.interval *= 2
+                logger.warning(
+                    f'Profiler overhead {self.overhead / elapsed:.2%} exceeds '
+                    f'{self.max_overhead:.2%}, sampling interval increased to {self.interval}s.'
+                )
+                # Start measuring anew with the new interval.
+                self.started, self.overhead = time.monotonic(), 0.0
+            if time.monotonic() - self.last_dump > self.dump_every:
+                self.dump()
+
+    def dump(self):
+        """
+        Write all samples collected by this process so far.
+        """
+        self.last_dump = time.monotonic()
+        with self.lock:
+            stacks = list(self.stacks.items())
+        if not stacks:
+            return
+        tmp = f'{self.path}.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                for stack, count in stacks:
+                    f.write(f'{stack} {count}\n')
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.error(f'Profiler failed to write samples: {e}')
+            return
+        elapsed = time.monotonic() - self.started
+        logger.info(
+            f'Profiler wrote {self.samples} samples of {self.sampled} calls to {self.path}, '
+            f'overhead {self.overhead / elapsed if elapsed else 0:.2%}.'
+        )
+
+    def shutdown(self):
+        if not self.stopped.is_set():
+            self.stopped.set()
+            atexit.unregister(self.shutdown)
+            self.dump()
+
+
+_profiler = None
+
+
+def get_profiler():
+    """
+    Return Profiler configured in settings, or None if profiling is disabled.
+    """
+    global _profiler
+    if _profiler is None and settings.WEBSUBSUB_PROFILE_RATE:
+        _profiler = Profiler(settings.WEBSUBSUB_PROFILE_RATE, **settings.WEBSUBSUB_PROFILE_OPTIONS)
+    return _profiler
+
+
+def _reset_profiler(*, setting, **kwargs):
+    global _profiler
+    if setting in ('WEBSUBSUB_PROFILE_RATE', 'WEBSUBSUB_PROFILE_OPTIONS') and _profiler:
+        _profiler.shutdown()
+        _profiler = None
+
+
+setting_changed.connect(_reset_profiler)
+
+
+def start(label):
+    profiler = get_profiler()
+    return profiler and (profiler, profiler.start(label))
+
+
+def stop(token):
+    if token:
+        profiler, token = token
+        profiler.stop(token)
+
+
+@contextmanager
+def profile(label):
+    """
+    Profile the block, if profiling is enabled and this call is sampled.
+    """
+    token = start(label)
+    try:
+        yield
+    finally:
+        stop(token)
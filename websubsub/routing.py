@@ -0,0 +1,188 @@
+"""
+Routing of notification handler tasks to celery queues and priorities.
+
+By default every notification is handled by the task passed to
+`WssView.as_view()` in its default queue. Set settings.WEBSUBSUB_ROUTES to
+a list of rules to isolate noisy or latency-critical subscriptions:
+
+>>> WEBSUBSUB_ROUTES = [
+>>>     {'topic': 'https://example.com/live/*', 'queue': 'websub_live', 'priority': 9},
+>>>     {'hub': 'https://noisy-hub.com/', 'queue': 'websub_bulk'},
+>>>     {'subscription': '7c5a...', 'queue': 'websub_live'},
+>>>     {'urlname': 'webreports', 'priority': 0},
+>>> ]
+
+The first rule with all given keys matching the subscription applies: `hub`
+exactly, `topic` as shell-style pattern, `subscription` as id, `urlname` as
+callback urlname. Its `queue` and `priority` are passed to
+`apply_async()` of the handler task. `Subscription.priority`, when set,
+overrides priority of the rule. Local task backends ignore queues and priorities.
+Routing does not apply to ordered delivery, see websubsub.ordering.
+"""
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+
+from django.conf import settings
+
+from . import admission, backends, envelope, ordering
+from .models import Subscription
+
+logger = logging.getLogger('websubsub.routing')
+
+# Seconds to cache subscriptions for.
+CACHE_TTL = 60
+
+# Subscription fields needed to accept its notifications.
+FIELDS = ('hub_url', 'topic', 'priority', 'max_body_size', 'secret')
+
+
+class SubscriptionCache(object):
+    """
+    Values of at most `size` least recently used subscriptions. Entries expire
+    after `ttl` seconds minus random jitter of up to a quarter of it, so that
+    entries cached at once are not refreshed at once.
+    """
+    def __init__(self, ttl, size=10000):
+        self.ttl = ttl
+        self.size = size
+        # {id: (monotonic expiration time, value)}
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, id):
+        key = str(id)
+        with self.lock:
+            expires, value = self.entries.get(key, (None, None))
+            if expires is None:
+                return None
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, id, value):
+        key = str(id)
+        expires = time.monotonic() + self.ttl * (1 - random.random() / 4)
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def discard(self, id):
+        with self.lock:
+            self.entries.pop(str(id), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_cache = SubscriptionCache(CACHE_TTL)
+
+
+def _lookup(id):
+    # One query with consumers of shared subscription joined, see websubsub.fanout.
+    rows = Subscription.objects.filter(id=id) \
+        .order_by('consumers__time_created') \
+        .values_list(*FIELDS, 'consumers__callback_urlname')
+    if not rows:
+        return None
+    ssn = dict(zip(FIELDS, rows[0]))
+    ssn['consumers'] = tuple(row[-1] for row in rows if row[-1] is not None)
+    return ssn
+
+
+def subscription(id, refresh=False):
+    """
+    Return dict of subscription hub_url, topic, priority, max_body_size,
+    secret and consumers, or None if it does not exist. Existing
+    subscriptions are cached for up to CACHE_TTL seconds, this is the only
+    lookup of subscription on the notification path. Pass refresh=True to
+    bypass the cache.
+    """
+    ssn = None if refresh else _cache.get(id)
+    if ssn is None:
+        ssn = _lookup(id)
+        if ssn is not None:
+            _cache.set(id, ssn)
+    return ssn
+
+
+def cached(id):
+    """
+    Return True if subscription is cached in this process.
+    """
+    return _cache.get(id) is not None
+
+
+def forget(id):
+    """
+    Drop cached subscription of this process, after it was changed.
+    """
+    _cache.discard(id)
+
+
+def cache_clear():
+    _cache.clear()
+
+
+def matches(rule, id, urlname, ssn):
+    return (
+        ('subscription' not in rule or str(rule['subscription']) == str(id))
+        and ('urlname' not in rule or rule['urlname'] == urlname)
+        and ('hub' not in rule or rule['hub'] == ssn['hub_url'])
+        and ('topic' not in rule or fnmatchcase(ssn['topic'], rule['topic']))
+    )
+
+
+def route(id, urlname):
+    """
+    Return apply_async options for handler task of notification to subscription
+    id, received by callback urlname. Empty dict if routing is disabled.
+    """
+    if settings.WEBSUBSUB_ROUTES is None:
+        return {}
+    ssn = subscription(id)
+    if ssn is None:
+        return {}
+    options = {}
+    for rule in settings.WEBSUBSUB_ROUTES:
+        if matches(rule, id, urlname, ssn):
+            options = {k: rule[k] for k in ('queue', 'priority') if k in rule}
+            break
+    if ssn['priority'] is not None:
+        options['priority'] = ssn['priority']
+    return options
+
+
+def queue(task, id, urlname):
+    """
+    Return name of the queue handler task of notification to subscription id,
+    received by callback urlname, is published to.
+    """
+    if ordering.enabled():
+        return ordering.queue(id)
+    return route(id, urlname).get('queue') or admission.queue_name(task)
+
+
+def delay(task, id, urlname, *args, sequence=None):
+    """
+    Schedule handler task of notification to subscription id, received by
+    callback urlname, according to routing rules. Notification with sequence
+    number is published to ordered partition queue instead, see websubsub.ordering.
+    Task is published with envelope serializer if enabled, see websubsub.envelope.
+    """
+    if sequence is not None:
+        options = ordering.options(id, sequence)
+    else:
+        options = route(id, urlname)
+    options.update(envelope.options())
+    if options:
+        return backends.get_backend().apply_async(task, args, **options)
+    return backends.delay(task, *args)
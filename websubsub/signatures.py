@@ -0,0 +1,38 @@
+"""
+Verification of signed notifications.
+
+Subscriptions with `secret` send it to the hub as `hub.secret`, and hub signs
+notifications with HMAC of the body in `X-Hub-Signature: <method>=<hex digest>`
+header. With settings.WEBSUBSUB_HUB_SECRETS = True a random secret is
+generated for every subscription on subscribe. `WssView.post` verifies the
+signature with the secret from cached subscription lookup, hashing the body as
+it is read in chunks, and drops notifications with missing or invalid
+signature before they are deduplicated, stored or scheduled. As recommended by
+the WebSub spec, such notifications are still acknowledged with 2xx status.
+"""
+import hmac
+import logging
+import secrets
+
+from . import limits
+
+logger = logging.getLogger('websubsub.signatures')
+
+METHODS = ('sha1', 'sha256', 'sha384', 'sha512')
+
+
+def generate_secret():
+    # hub.secret must be less than 200 bytes.
+    return secrets.token_hex(32)
+
+
+def verify(request, secret):
+    """
+    Return True if X-Hub-Signature header of the request matches its body.
+    """
+    method, _, signature = request.META.get('HTTP_X_HUB_SIGNATURE', '').partition('=')
+    if method not in METHODS or not signature:
+        return False
+    mac = hmac.new(secret.encode(), digestmod=method)
+    limits.spool(request, update=mac.update)
+    return hmac.compare_digest(mac.hexdigest(), signature.strip().lower())
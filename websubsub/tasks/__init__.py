@@ -3,7 +3,9 @@ from .save import save
 from .unsubscribe import unsubscribe 
 from .retry_failed import retry_failed
 from .refresh_subscriptions import refresh_subscriptions 
+from .inbox import drain_inbox, compact_inbox
 
 __all__ = [
-    'subscribe', 'unsubscribe', 'refresh_subscriptions', 'retry_failed', 'save'
+    'subscribe', 'unsubscribe', 'refresh_subscriptions', 'retry_failed', 'save',
+    'drain_inbox', 'compact_inbox'
 ]
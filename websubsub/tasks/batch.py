@@ -0,0 +1,50 @@
+import logging
+from itertools import islice
+
+import dumblock
+from django.conf import settings
+
+from .. import backends
+from .dedup import token_key
+
+logger = logging.getLogger('websubsub.tasks.batch')
+
+
+def chunked(iterable, size):
+    """
+    Split iterable into lists of at most `size` items.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def delay_many(task, pks):
+    """
+    Schedule `task(pk=pk)` for every pk, publishing messages to the broker in
+    groups of settings.WEBSUBSUB_DISPATCH_BATCH_SIZE. `pks` can be a lazy
+    iterable, e.g. `queryset.values_list('pk', flat=True).iterator()`.
+    Like `delay_once`, skips pks for which this task is already scheduled.
+
+    Returns number of scheduled tasks.
+    """
+    total = 0
+    for chunk in chunked(pks, settings.WEBSUBSUB_DISPATCH_BATCH_SIZE):
+        # Take scheduled tokens for the whole chunk in one round trip.
+        pipe = dumblock.redis.pipeline()
+        for pk in chunk:
+            pipe.set(token_key(task.name, pk), 1, nx=True, ex=settings.WEBSUBSUB_DEDUP_TTL)
+        chunk = [pk for pk, acquired in zip(chunk, pipe.execute()) if acquired]
+        if not chunk:
+            continue
+        try:
+            backends.get_backend().delay_many(task, [{'pk': pk} for pk in chunk])
+        except Exception:
+            dumblock.redis.delete(*[token_key(task.name, pk) for pk in chunk])
+            raise
+        total += len(chunk)
+    logger.debug(f'Scheduled {total} {task.name} tasks.')
+    return total
@@ -0,0 +1,68 @@
+import logging
+from functools import wraps
+
+import dumblock
+from django.conf import settings
+
+from .. import backends
+
+logger = logging.getLogger('websubsub.tasks.dedup')
+
+
+def token_key(task_name, pk):
+    return f'websubsub_scheduled_{task_name}_{pk}'
+
+
+def acquire_token(task, pk):
+    """
+    Try to mark `task(pk=pk)` as scheduled. Returns False if it is already
+    scheduled and not yet completed.
+    """
+    key = token_key(task.name, pk)
+    # Token expires anyway, in case worker dies before releasing it.
+    return bool(dumblock.redis.set(key, 1, nx=True, ex=settings.WEBSUBSUB_DEDUP_TTL))
+
+
+def release_token(task_name, pk):
+    dumblock.redis.delete(token_key(task_name, pk))
+
+
+def delay_once(task, pk):
+    """
+    Schedule `task(pk=pk)` unless the same task for the same pk is already
+    waiting in the queue or running. Returns AsyncResult, or None if the task
+    was not scheduled. With local backends returns Future.
+    """
+    if not acquire_token(task, pk):
+        logger.debug(f'{task.name} for subscription {pk} is already scheduled, skipping.')
+        return None
+    try:
+        return backends.delay(task, pk=pk)
+    except Exception:
+        release_token(task.name, pk)
+        raise
+
+
+class releases_token(object):
+    """
+    Task decorator. Release the scheduled token taken by `delay_once` when
+    the task completes, successfully or not.
+
+    >>> @shared_task(name='websubsub.tasks.subscribe')
+    >>> @releases_token('websubsub.tasks.subscribe')
+    >>> def subscribe(*, pk):
+    >>>     pass
+
+    """
+    def __init__(self, task_name):
+        self.task_name = task_name
+
+    def __call__(self, f):
+        @wraps(f)
+        def wrapped(*args, pk, **kw):
+            try:
+                return f(*args, pk=pk, **kw)
+            finally:
+                release_token(self.task_name, pk)
+
+        return wrapped
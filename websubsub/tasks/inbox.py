@@ -0,0 +1,64 @@
+import logging
+import time
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.utils.timezone import now
+from dumblock import lock_or_exit
+
+from .. import inbox
+from ..models import Notification
+
+logger = logging.getLogger('websubsub.tasks.inbox')
+
+# Stop draining well before dumblock lock expires in 60 seconds.
+DRAIN_TIME = 30  # seconds
+
+
+@shared_task(name='websubsub.tasks.drain_inbox')
+@lock_or_exit('websubsub_drain_inbox')
+def drain_inbox():
+    """
+    Schedule handler tasks for undelivered notifications, oldest first, in
+    batches, and update time_last_event_received of their subscriptions.
+    This task should be scheduled to launch periodically.
+    """
+    size = settings.WEBSUBSUB_DISPATCH_BATCH_SIZE
+    pending = Notification.objects \
+        .filter(delivered__isnull=True, failed__isnull=True) \
+        .order_by('id')
+    deadline = time.monotonic() + DRAIN_TIME
+    total = 0
+    while time.monotonic() < deadline:
+        batch = list(pending[:size])
+        delivered = set(inbox.deliver(batch))
+        inbox.touch(x for x in batch if x.id in delivered)
+        total += len(delivered)
+        # Failed notifications are marked, so the next batch does not repeat them.
+        if len(batch) < size or not delivered:
+            break
+    if total:
+        logger.info(f'Delivered {total} notifications from inbox.')
+
+
+@shared_task(name='websubsub.tasks.compact_inbox')
+def compact_inbox():
+    """
+    Delete delivered notifications older than settings.WEBSUBSUB_INBOX_RETENTION
+    seconds. This task should be scheduled to launch periodically.
+    """
+    size = settings.WEBSUBSUB_DISPATCH_BATCH_SIZE
+    expired = Notification.objects.filter(
+        received__lt = now() - timedelta(seconds=settings.WEBSUBSUB_INBOX_RETENTION),
+        delivered__isnull = False,
+    )
+    total = 0
+    while True:
+        # Delete in chunks, to keep transactions short.
+        ids = list(expired.values_list('id', flat=True)[:size])
+        if not ids:
+            break
+        total += Notification.objects.filter(id__in=ids).delete()[0]
+    if total:
+        logger.info(f'Deleted {total} delivered notifications from inbox.')
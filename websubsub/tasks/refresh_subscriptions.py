@@ -15,6 +15,7 @@ from rest_framework import status
 
 from ..models import Subscription
 from . import subscribe
+from .batch import delay_many
 
 logger = logging.getLogger('websubsub.tasks.refresh_subscriptions')
 
@@ -32,8 +33,7 @@ def refresh_subscriptions():
     })
     
     torefresh = Subscription.objects.filter(_filter)
-    if torefresh.exists():
-        logger.info(f'Refreshing {torefresh.count()} expiring subscriptions.')
-    for ssn in torefresh:
-        subscribe.delay(pk=ssn.pk)
+    count = delay_many(subscribe, torefresh.values_list('pk', flat=True).iterator())
+    if count:
+        logger.info(f'Refreshing {count} expiring subscriptions.')
 
@@ -16,6 +16,7 @@ from rest_framework import status
 from ..models import Subscription
 from . import subscribe
 from . import unsubscribe
+from .batch import delay_many
 
 logger = logging.getLogger('websubsub.tasks.retry_failed')
 
@@ -55,23 +56,21 @@ def retry_failed():
         'connerror_count__gte': settings.WEBSUBSUB_MAX_CONNECT_RETRIES,
         'unsubscribe_status__isnull': True
     })
-    if max_reached.exists():
-        for ssn in max_reached:
-            logger.warning(
-                f'Subscription {ssn.pk} with topic {ssn.topic} failed to connect '
-                f'to the hub at {ssn.hub_url} {settings.WEBSUBSUB_MAX_CONNECT_RETRIES} '
-                f'times. Increase settings.WEBSUBSUB_MAX_CONNECT_RETRIES to allow more '
-                f'attempts. Or reset retry counters with `./manage.py websub_reset_counters`.'
-            )
-            
+    for ssn in max_reached:
+        logger.warning(
+            f'Subscription {ssn.pk} with topic {ssn.topic} failed to connect '
+            f'to the hub at {ssn.hub_url} {settings.WEBSUBSUB_MAX_CONNECT_RETRIES} '
+            f'times. Increase settings.WEBSUBSUB_MAX_CONNECT_RETRIES to allow more '
+            f'attempts. Or reset retry counters with `./manage.py websub_reset_counters`.'
+        )
+        
     errors = verify_timeout | connerror | huberror | verifyerror
 
     # Exclude explicitly unsubscribed
     tosubscribe = Subscription.objects.filter(errors & Q(unsubscribe_status__isnull=True))
 
-    logger.debug(f'{tosubscribe.count()} subscriptions to retry subscribe.')
-    for ssn in tosubscribe:
-        subscribe.delay(pk=ssn.pk)
+    count = delay_many(subscribe, tosubscribe.values_list('pk', flat=True).iterator())
+    logger.debug(f'{count} subscriptions to retry subscribe.')
 
     #------------------
     # Unubscribe errors
@@ -99,7 +98,6 @@ def retry_failed():
     errors = verify_timeout | connerror | huberror | verifyerror
     
     tounsubscribe = Subscription.objects.filter(errors)
-    logger.debug(f'{tounsubscribe.count()} subscriptions to retry unsubscribe.')
-    for ssn in tounsubscribe:
-        unsubscribe.delay(pk=ssn.pk)
+    count = delay_many(unsubscribe, tounsubscribe.values_list('pk', flat=True).iterator())
+    logger.debug(f'{count} subscriptions to retry unsubscribe.')
 
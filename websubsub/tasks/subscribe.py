@@ -1,4 +1,5 @@
 import logging
+import time
 from datetime import timedelta
 from urllib.parse import urljoin
 from uuid import uuid4
@@ -13,7 +14,9 @@ from requests import post
 from requests.exceptions import ConnectionError
 from rest_framework import status
 
+from .. import metrics, routing, signatures, tracing
 from ..models import Subscription
+from .dedup import releases_token
 
 logger = logging.getLogger('websubsub.tasks.subscribe')
 
@@ -24,6 +27,7 @@ def _declared_static_subscriptions():
 
 
 @shared_task(name='websubsub.tasks.subscribe')
+@releases_token('websubsub.tasks.subscribe')
 @lock_or_exit('websubsub_{pk}')
 def subscribe(*, pk):
     ssn = Subscription.objects.get(pk=pk)
@@ -96,20 +100,35 @@ def subscribe(*, pk):
     if not ssn.callback_url == fullurl:
         logger.debug(f'Subscription {ssn.pk} new callback url: {fullurl}')
     
-    ssn.callback_url = fullurl
-    
     data = {
         'hub.mode': 'subscribe',
         'hub.topic': ssn.topic,
-        'hub.callback': ssn.callback_url,
+        'hub.callback': fullurl,
     }
+    if not ssn.secret and settings.WEBSUBSUB_HUB_SECRETS:
+        # Keep the secret across resubscriptions, so that notifications signed
+        # with it are still accepted.
+        ssn.update(secret=signatures.generate_secret())
+        routing.forget(ssn.pk)
+    if ssn.secret:
+        data['hub.secret'] = ssn.secret
+
+    metrics.count_retry('subscribe', ssn.subscribe_status)
+
+    started = time.monotonic()
     try:
         # TODO: timeout setting
-        response = post(ssn.hub_url, data, timeout=10)
+        attributes = {'websubsub.pk': ssn.pk, 'websubsub.hub': ssn.hub_url, 'websubsub.mode': 'subscribe'}
+        with tracing.span('websubsub.hub_request', attributes):
+            response = post(ssn.hub_url, data, timeout=10)
     except Exception as e:
-        ssn.connerror_count += 1
-        ssn.subscribe_status = 'connerror'
-        ssn.save()
+        metrics.HUB_RESPONSES.labels(ssn.hub_url, 'subscribe', 'connerror').inc()
+        ssn.update(
+            callback_url = fullurl,
+            subscribe_attempt_time = now(),
+            subscribe_status = 'connerror',
+            connerror_count = ssn.connerror_count + 1
+        )
         if isinstance(e, ConnectionError):
             logger.error(str(e))
         else:
@@ -118,14 +137,14 @@ def subscribe(*, pk):
         logger.error(f'Subscription {ssn.pk} failed to connect to hub '
                      f'{ssn.hub_url}. Retries left: {left}')
         return
+
+    if settings.DEBUG:
+        logger.info(f'Subscription {ssn.pk} with topic {ssn.topic}, urlname {ssn.callback_urlname}, got hub response {response}')
     else:
-        if settings.DEBUG:
-            logger.info(f'Subscription {ssn.pk} with topic {ssn.topic}, urlname {ssn.callback_urlname}, got hub response {response}')
-        else:
-            logger.info(f'Subscription {ssn.pk}, got hub response')
-    finally:
-        ssn.subscribe_attempt_time = now()
-        ssn.save()
+        logger.info(f'Subscription {ssn.pk}, got hub response')
+
+    metrics.HUB_REQUEST_SECONDS.labels(ssn.hub_url, 'subscribe').observe(time.monotonic() - started)
+    metrics.HUB_RESPONSES.labels(ssn.hub_url, 'subscribe', response.status_code).inc()
 
     # If the hub URL supports WebSub and is able to handle the subscription or unsubscription
     # request, it MUST respond to a subscription request with an HTTP 202 "Accepted" response
@@ -137,13 +156,18 @@ def subscribe(*, pk):
     # developer in understanding the error. This is not meant to be shown to the end user.
     if response.status_code != status.HTTP_202_ACCEPTED:
         # TODO: handle specific response codes accordingly
-        ssn.subscribe_status = 'huberror'
-        ssn.huberror_count += 1
-        ssn.save()
+        ssn.update(
+            callback_url = fullurl,
+            subscribe_attempt_time = now(),
+            subscribe_status = 'huberror',
+            huberror_count = ssn.huberror_count + 1
+        )
         left = max(0, settings.WEBSUBSUB_MAX_HUB_ERROR_RETRIES - ssn.huberror_count)
         logger.error(f'Subscription {ssn.pk} got hub error {response.status_code}. Retries left: {left}')
         return
 
-    ssn.subscribe_status = 'verifying'
-    ssn.save()
-
+    ssn.update(
+        callback_url = fullurl,
+        subscribe_attempt_time = now(),
+        subscribe_status = 'verifying'
+    )
@@ -1,4 +1,5 @@
 import logging
+import time
 from datetime import timedelta
 from urllib.parse import urljoin
 from uuid import uuid4
@@ -13,12 +14,15 @@ from requests import post
 from requests.exceptions import ConnectionError
 from rest_framework import status
 
+from .. import metrics, tracing
 from ..models import Subscription
+from .dedup import releases_token
 
 logger = logging.getLogger('websubsub.tasks.unsubscribe')
 
 
 @shared_task(name='websubsub.tasks.unsubscribe', retries=10)
+@releases_token('websubsub.tasks.unsubscribe')
 @lock_wait('websubsub_{pk}')
 def unsubscribe(*, pk):
     ssn = Subscription.objects.get(pk=pk)
@@ -41,13 +45,22 @@ def unsubscribe(*, pk):
         'hub.topic': ssn.topic,
         'hub.callback': ssn.callback_url,
     }
+
+    metrics.count_retry('unsubscribe', ssn.unsubscribe_status)
+
+    started = time.monotonic()
     try:
         # TODO: timeout setting
-        rr = post(ssn.hub_url, data, timeout=10)
+        attributes = {'websubsub.pk': ssn.pk, 'websubsub.hub': ssn.hub_url, 'websubsub.mode': 'unsubscribe'}
+        with tracing.span('websubsub.hub_request', attributes):
+            rr = post(ssn.hub_url, data, timeout=10)
     except Exception as e:
-        ssn.connerror_count += 1
-        ssn.unsubscribe_status = 'connerror'
-        ssn.save()
+        metrics.HUB_RESPONSES.labels(ssn.hub_url, 'unsubscribe', 'connerror').inc()
+        ssn.update(
+            unsubscribe_attempt_time = now(),
+            unsubscribe_status = 'connerror',
+            connerror_count = ssn.connerror_count + 1
+        )
         if isinstance(e, ConnectionError):
             logger.error(str(e))
         else:
@@ -55,11 +68,11 @@ def unsubscribe(*, pk):
         left = max(0, settings.WEBSUBSUB_MAX_CONNECT_RETRIES - ssn.connerror_count)
         logger.error(f'While unsubscribing {ssn.pk} failed to connect to hub. Retries left: {left}')
         return
-    else:
-        logger.debug(f'Subscription {ssn.pk}, got hub response')
-    finally:
-        ssn.unsubscribe_attempt_time = now()
-        ssn.save()
+
+    logger.debug(f'Subscription {ssn.pk}, got hub response')
+
+    metrics.HUB_REQUEST_SECONDS.labels(ssn.hub_url, 'unsubscribe').observe(time.monotonic() - started)
+    metrics.HUB_RESPONSES.labels(ssn.hub_url, 'unsubscribe', rr.status_code).inc()
 
     # If the hub URL supports WebSub and is able to handle the subscription or unsubscription
     # request, it MUST respond to a subscription request with an HTTP 202 "Accepted" response
@@ -71,13 +84,16 @@ def unsubscribe(*, pk):
     # developer in understanding the error. This is not meant to be shown to the end user.
     if rr.status_code != status.HTTP_202_ACCEPTED:
         # TODO: handle specific response codes accordingly
-        ssn.unsubscribe_status = 'huberror'
-        ssn.huberror_count += 1
-        ssn.save()
+        ssn.update(
+            unsubscribe_attempt_time = now(),
+            unsubscribe_status = 'huberror',
+            huberror_count = ssn.huberror_count + 1
+        )
         left = max(0, settings.WEBSUBSUB_MAX_HUB_ERROR_RETRIES - ssn.huberror_count)
         logger.error(f'Subscription {ssn.pk} got hub error {rr.status_code}. Retries left: {left}')
         return
 
-    ssn.unsubscribe_status = 'verifying'
-    ssn.save()
-
+    ssn.update(
+        unsubscribe_attempt_time = now(),
+        unsubscribe_status = 'verifying'
+    )
@@ -0,0 +1,215 @@
+"""
+OpenTelemetry tracing.
+
+Requires `opentelemetry-api` package, otherwise tracing is no-op. Set
+settings.WEBSUBSUB_TRACING = True to record spans of callback requests, task
+publishing and execution, database queries, dumblock lock waits and hub
+requests. Trace context is propagated to tasks through celery message headers,
+so `WssView.post` -> broker -> `handler_task` is a single trace, as well as
+`Subscription.create` -> `tasks.subscribe` -> hub request.
+
+Spans are sent to the tracer provider configured by your application. To
+export them without collector, install `opentelemetry-sdk` and set
+settings.WEBSUBSUB_TRACING_EXPORTER to 'console' (print to stdout) or to a file
+path (append one json span per line).
+"""
+import logging
+import os
+import sys
+from contextlib import contextmanager, ExitStack
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('websubsub.tracing')
+
+try:
+    from opentelemetry import trace, propagate
+except ImportError:
+    trace = None
+
+
+def enabled():
+    return trace is not None and settings.WEBSUBSUB_TRACING
+
+
+@contextmanager
+def span(name, attributes=None):
+    """
+    Record span as a child of the current span. Yields opentelemetry span, or
+    None if tracing is disabled.
+    """
+    if not enabled():
+        yield None
+        return
+    tracer = trace.get_tracer('websubsub')
+    with tracer.start_as_current_span(name, attributes=_clean(attributes)) as current:
+        yield current
+
+
+def _clean(attributes):
+    # Opentelemetry attributes can't be None or uuid.
+    return {
+        k: v if isinstance(v, (str, bool, int, float)) else str(v)
+        for k, v in (attributes or {}).items() if v is not None
+    }
+
+
+def inject():
+    """
+    Return trace context of the current span as a dict of headers.
+    """
+    carrier = {}
+    if enabled():
+        propagate.inject(carrier)
+    return carrier
+
+
+def _trace_db_query(execute, sql, params, many, context):
+    with span('websubsub.db', {'db.statement': sql}):
+        return execute(sql, params, many, context)
+
+
+def task_span(task, kwargs, carrier=None):
+    """
+    Context manager which records task execution span with trace context
+    extracted from carrier headers, and database queries inside it.
+    """
+    stack = ExitStack()
+    if not enabled():
+        return stack
+    from . import metrics
+    parent = propagate.extract(carrier) if carrier else None
+    tracer = trace.get_tracer('websubsub')
+    stack.enter_context(tracer.start_as_current_span(
+        f'websubsub.task {metrics.task_name(task)}',
+        context = parent,
+        kind = trace.SpanKind.CONSUMER,
+        attributes = _clean({'websubsub.pk': (kwargs or {}).get('pk')}),
+    ))
+    stack.enter_context(connection.execute_wrapper(_trace_db_query))
+    return stack
+
+
+@contextmanager
+def request_span(request, pk):
+    """
+    Record callback request span, and database queries inside it.
+    """
+    if not enabled():
+        yield None
+        return
+    attributes = {
+        'http.method': request.method,
+        'http.target': request.path,
+        'websubsub.pk': pk,
+    }
+    tracer = trace.get_tracer('websubsub')
+    with tracer.start_as_current_span(
+        f'websubsub.callback {request.method}',
+        context = propagate.extract(request.headers),
+        kind = trace.SpanKind.SERVER,
+        attributes = _clean(attributes),
+    ) as current, connection.execute_wrapper(_trace_db_query):
+        yield current
+
+
+# Task spans started by celery signals, by task id.
+_task_spans = {}
+
+
+def _header(request, name):
+    return request.get(name) or (getattr(request, 'headers', None) or {}).get(name)
+
+
+def start_task_span(task_id, task, kwargs):
+    """
+    Start span of celery task, with trace context from message headers.
+    """
+    if not enabled():
+        return
+    carrier = {}
+    for field in propagate.get_global_textmap().fields:
+        if _header(task.request, field):
+            carrier[field] = _header(task.request, field)
+    stack = task_span(task, kwargs, carrier)
+    stack.__enter__()
+    _task_spans[task_id] = stack
+
+
+def end_task_span(task_id):
+    stack = _task_spans.pop(task_id, None)
+    if stack is not None:
+        stack.close()
+
+
+class TracedLock(object):
+    def __init__(self, lock, name):
+        self.lock = lock
+        self.name = name
+
+    def __getattr__(self, name):
+        return getattr(self.lock, name)
+
+    def acquire(self, *args, **kwargs):
+        with span('websubsub.lock_wait', {'websubsub.lock': self.name}) as current:
+            acquired = self.lock.acquire(*args, **kwargs)
+            if current is not None:
+                current.set_attribute('websubsub.lock_acquired', bool(acquired))
+            return acquired
+
+
+class TracedRedis(object):
+    """
+    Redis client proxy which records time spent waiting for locks.
+    """
+    def __init__(self, redis):
+        self.redis = redis
+
+    def __getattr__(self, name):
+        return getattr(self.redis, name)
+
+    def lock(self, name, *args, **kwargs):
+        return TracedLock(self.redis.lock(name, *args, **kwargs), name)
+
+
+def setup():
+    """
+    Configure tracing from settings. Called when websubsub app is ready.
+    """
+    if not settings.WEBSUBSUB_TRACING:
+        return
+    if trace is None:
+        logger.warning('WEBSUBSUB_TRACING is enabled, but opentelemetry-api is not installed.')
+        return
+
+    import dumblock
+    if not isinstance(dumblock.redis, TracedRedis):
+        dumblock.redis = TracedRedis(dumblock.redis)
+
+    if settings.WEBSUBSUB_TRACING_EXPORTER:
+        trace.set_tracer_provider(make_provider(settings.WEBSUBSUB_TRACING_EXPORTER))
+
+
+def make_provider(exporter):
+    """
+    Return sdk TracerProvider which exports spans to stdout if exporter is
+    'console', otherwise appends them as json lines to the file at given path.
+    """
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if exporter == 'console':
+        out = sys.stdout
+    else:
+        out = open(exporter, 'a')
+    provider = TracerProvider(resource=Resource.create({
+        'service.name': os.environ.get('OTEL_SERVICE_NAME', 'websubsub'),
+        'process.pid': os.getpid(),
+    }))
+    provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter(
+        out = out,
+        formatter = lambda s: s.to_json(indent=None) + os.linesep,
+    )))
+    return provider
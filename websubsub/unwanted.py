@@ -0,0 +1,189 @@
+"""
+Negative cache and rate limiting of requests to unknown subscriptions.
+
+When a hub keeps pushing to a deleted subscription, or a scanner probes
+callback urls, every request would hit the database just to be answered with
+410 or 400. `WssView` remembers ids of unknown subscriptions for
+settings.WEBSUBSUB_NEGATIVE_CACHE_TTL seconds in process memory, and answers
+repeated requests to them without database queries. Created subscriptions are
+dropped from the cache of this process, other processes keep answering 410 or
+400 to their ids until the ttl passes. The cache is disabled by default.
+
+With settings.WEBSUBSUB_UNWANTED_RATE_LIMIT set, every request source also
+has a token bucket of `burst` lookups of unknown ids, refilled at `rate` per
+second. Only lookups which miss the database consume tokens, so requests to
+existing subscriptions, cached or not, including verification of a new one,
+are never limited. Sources which exhausted their bucket are answered with 429
+instead of 410 or 400, and their unknown ids are not added to the negative
+cache, so scanners can not evict ids of deleted subscriptions from it. Source
+is the remote address, or first address of the `header` META key, e.g.
+'HTTP_X_FORWARDED_FOR' behind a reverse proxy:
+
+>>> WEBSUBSUB_UNWANTED_RATE_LIMIT = {'rate': 0.1, 'burst': 20}
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models.signals import post_save
+
+logger = logging.getLogger('websubsub.unwanted')
+
+
+class NegativeCache(object):
+    """
+    Set of ids which expire after `ttl` seconds, of at most `size` least
+    recently added ones.
+    """
+    def __init__(self, ttl, size=100000):
+        self.ttl = ttl
+        self.size = size
+        self.expires = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __contains__(self, id):
+        key = str(id)
+        with self.lock:
+            expires = self.expires.get(key)
+            if expires is None:
+                return False
+            if expires < time.monotonic():
+                del self.expires[key]
+                return False
+            return True
+
+    def add(self, id):
+        key = str(id)
+        with self.lock:
+            self.expires[key] = time.monotonic() + self.ttl
+            self.expires.move_to_end(key)
+            while len(self.expires) > self.size:
+                self.expires.popitem(last=False)
+
+    def discard(self, id):
+        with self.lock:
+            self.expires.pop(str(id), None)
+
+
+class RateLimiter(object):
+    """
+    Token buckets of `burst` tokens refilled at `rate` tokens per second, for
+    at most `size` least recently used keys.
+    """
+    def __init__(self, rate, burst, size=100000, header=None):
+        self.rate = rate
+        self.burst = burst
+        self.size = size
+        self.header = header
+        # {key: (tokens, monotonic time of update)}
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def tokens(self, key):
+        tokens, updated = self.buckets.get(key, (self.burst, None))
+        if updated is None:
+            return tokens
+        return min(self.burst, tokens + (time.monotonic() - updated) * self.rate)
+
+    def allow(self, key):
+        with self.lock:
+            return self.tokens(key) >= 1
+
+    def retry_after(self, key):
+        """
+        Seconds until the next token of the key.
+        """
+        with self.lock:
+            return max(1, math.ceil((1 - self.tokens(key)) / self.rate))
+
+    def hit(self, key):
+        with self.lock:
+            self.buckets[key] = (max(0, self.tokens(key) - 1), time.monotonic())
+            self.buckets.move_to_end(key)
+            while len(self.buckets) > self.size:
+                self.buckets.popitem(last=False)
+
+    def source(self, request):
+        if self.header and request.META.get(self.header):
+            return request.META[self.header].split(',')[0].strip()
+        return request.META.get('REMOTE_ADDR', '')
+
+
+_cache = None
+_limiter = None
+
+
+def get_cache():
+    """
+    Return NegativeCache configured in settings, or None if disabled.
+    """
+    global _cache
+    if _cache is None and settings.WEBSUBSUB_NEGATIVE_CACHE_TTL:
+        _cache = NegativeCache(settings.WEBSUBSUB_NEGATIVE_CACHE_TTL)
+    return _cache
+
+
+def get_limiter():
+    """
+    Return RateLimiter configured in settings, or None if disabled.
+    """
+    global _limiter
+    if _limiter is None and settings.WEBSUBSUB_UNWANTED_RATE_LIMIT:
+        _limiter = RateLimiter(**settings.WEBSUBSUB_UNWANTED_RATE_LIMIT)
+    return _limiter
+
+
+def _reset(*, setting, **kwargs):
+    global _cache, _limiter
+    if setting in ('WEBSUBSUB_NEGATIVE_CACHE_TTL', 'WEBSUBSUB_UNWANTED_RATE_LIMIT'):
+        _cache = _limiter = None
+
+
+setting_changed.connect(_reset)
+
+
+def known(id):
+    """
+    Return True if subscription id is known not to exist.
+    """
+    cache = get_cache()
+    return cache is not None and id in cache
+
+
+def add(request, id):
+    """
+    Remember unknown subscription id, and charge lookup to the request source.
+    Returns seconds to retry after if the source exceeded its rate of unknown
+    ids lookups, then the id is not remembered. Otherwise returns None.
+    """
+    limiter = get_limiter()
+    if limiter is not None:
+        source = limiter.source(request)
+        if not limiter.allow(source):
+            return limiter.retry_after(source)
+        limiter.hit(source)
+    cache = get_cache()
+    if cache is not None:
+        cache.add(id)
+    return None
+
+
+def discard(id):
+    """
+    Forget unknown subscription id, after subscription with this id was created.
+    """
+    cache = get_cache()
+    if cache is not None:
+        cache.discard(id)
+
+
+def _created(instance, created, **kwargs):
+    if created:
+        discard(instance.pk)
+
+
+post_save.connect(_created, sender='websubsub.Subscription')
@@ -1,5 +1,7 @@
 import json
 import logging
+import time
+from io import BytesIO
 from collections import defaultdict
 from datetime import timedelta
 
@@ -7,10 +9,16 @@ from django.conf import settings
 from django.http import HttpResponse
 from django.utils.decorators import classonlymethod
 from django.utils.timezone import now
+from rest_framework.exceptions import ParseError
 from rest_framework.views import APIView  # TODO: can we live without drf dependency?
 from rest_framework.response import Response
-from rest_framework.status import HTTP_400_BAD_REQUEST
+from rest_framework.status import HTTP_400_BAD_REQUEST, HTTP_413_REQUEST_ENTITY_TOO_LARGE
 
+from . import (
+    admission, changes, duplicates, envelope, fanout, feeds, inbox, limits, metrics, ordering,
+    profiling, routing, signatures, tracing, unwanted
+)
+from .backends import BackendFull, delay
 from .models import Subscription
 from . import tasks
 
@@ -24,7 +32,8 @@ class WssView(APIView):
 
     Usage:
 
-    Create a celery task that will accept incoming data, then in your urls.py:
+    Create a celery task (or a plain function, when using local task backend,
+    see websubsub.backends) that will accept incoming data, then in your urls.py:
 
     >>> from websubsub.views import WssView
     >>> from .tasks import news_task, reports_task
@@ -43,6 +52,26 @@ class WssView(APIView):
         kwargs['handler_task'] = handler_task
         return super().as_view(**kwargs)
 
+    def handle_exception(self, exc):
+        if isinstance(exc, BackendFull):
+            # Local task backend is overloaded, let hub retry later.
+            logger.warning(f'{self.request.method} {self.request.path}: {exc}')
+            controller = admission.get_controller()
+            response = Response('Overloaded, retry later', status=503)
+            response['Retry-After'] = str(controller.retry_after if controller else 60)
+            return response
+        return super().handle_exception(exc)
+
+    def dispatch(self, request, *args, **kwargs):
+        started = time.monotonic()
+        id = args[0] if args else next(iter(kwargs.values()), None)
+        try:
+            with tracing.request_span(request, id), \
+                 profiling.profile(f'WssView.{request.method}'):
+                return super().dispatch(request, *args, **kwargs)
+        finally:
+            metrics.CALLBACK_SECONDS.labels(request.method).observe(time.monotonic() - started)
+
 
     def get(self, request, *args, **kwargs):
         """
@@ -59,13 +88,21 @@ class WssView(APIView):
             return Response('Missing or unknown hub.mode', status=HTTP_400_BAD_REQUEST)
 
         id = args[0] if args else list(kwargs.values())[0]
+        if unwanted.known(id):
+            metrics.VERIFICATIONS.labels(mode, 'unwanted').inc()
+            return Response('Unwanted subscription', status=HTTP_400_BAD_REQUEST)
+
         try:
             ssn = Subscription.objects.get(id=id)
         except Subscription.DoesNotExist:
+            retry_after = unwanted.add(request, id)
+            if retry_after:
+                return self.on_rate_limited(request, id, retry_after)
             logger.error(
                 f'Received unwanted subscription {id} "{mode}" request with'
                 f' topic {request.GET["hub.topic"]} !'
             )
+            metrics.VERIFICATIONS.labels(mode, 'unwanted').inc()
             return Response('Unwanted subscription', status=HTTP_400_BAD_REQUEST)
 
         if mode == 'subscribe':
@@ -76,6 +113,17 @@ class WssView(APIView):
             return self.on_denied(request, ssn)
 
 
+    def on_rate_limited(self, request, id, retry_after):
+        """
+        Request source looked up too many unknown subscriptions, see websubsub.unwanted.
+        """
+        logger.warning(f'Rate limited {request.method} request to subscription {id}.')
+        metrics.REJECTED.labels(request.resolver_match.url_name, 'rate_limited').inc()
+        response = Response('Too many requests, retry later', status=429)
+        response['Retry-After'] = str(retry_after)
+        return response
+
+
     def on_subscribe(self, request, ssn):
         """
         The subscriber MUST confirm that the hub.topic corresponds to a pending
@@ -94,7 +142,8 @@ class WssView(APIView):
         """
         if 'hub.challenge' not in request.GET:
             logger.error(f'Missing hub.challenge in subscription verification {ssn.pk}!')
-            tasks.save.delay(
+            metrics.VERIFICATIONS.labels('subscribe', 'verifyerror').inc()
+            delay(tasks.save,
                 pk = ssn.pk,
                 subscribe_status = 'verifyerror',
                 verifyerror_count = ssn.verifyerror_count + 1
@@ -103,7 +152,8 @@ class WssView(APIView):
 
         if not request.GET.get('hub.lease_seconds', '').isdigit():
             logger.error(f'Missing integer hub.lease_seconds in subscription verification {ssn.pk}!')
-            tasks.save.delay(
+            metrics.VERIFICATIONS.labels('subscribe', 'verifyerror').inc()
+            delay(tasks.save,
                 pk = ssn.pk,
                 subscribe_status = 'verifyerror',
                 verifyerror_count = ssn.verifyerror_count + 1
@@ -113,9 +163,10 @@ class WssView(APIView):
         if ssn.unsubscribe_status is not None:
             logger.error(f'Subscription {ssn.pk} received subscription verification request,'
                          f' but its was explicitly unsubscribed before.')
+            metrics.VERIFICATIONS.labels('subscribe', 'unsubscribed').inc()
             return Response('Unsubscribed')
 
-        tasks.save.delay(
+        delay(tasks.save,
             pk = ssn.pk,
             subscribe_status = 'verified',
             lease_expiration_time = now() + timedelta(seconds=int(request.GET['hub.lease_seconds'])),
@@ -125,20 +176,22 @@ class WssView(APIView):
             verifytimeout_count = 0
         )
         logger.info(f'Got {ssn.pk} subscribe confirmation from hub.')
+        metrics.VERIFICATIONS.labels('subscribe', 'verified').inc()
         return HttpResponse(request.GET['hub.challenge'])
 
 
     def on_unsubscribe(self, request, ssn):
         if 'hub.challenge' not in request.GET:
             logger.error(f'Missing hub.challenge in unsubscription verification {ssn.pk}!')
-            tasks.save.delay(
+            metrics.VERIFICATIONS.labels('unsubscribe', 'verifyerror').inc()
+            delay(tasks.save,
                 pk = ssn.pk,
                 unsubscribe_status = 'verifyerror',
                 verifyerror_count = ssn.verifyerror_count + 1
             )
             return Response('Missing hub.challenge', status=HTTP_400_BAD_REQUEST)
 
-        tasks.save.delay(
+        delay(tasks.save,
             pk = ssn.pk,
             unsubscribe_status = 'verified',
             #lease_expiration_time = None,  # TODO: should we reset it?
@@ -148,6 +201,7 @@ class WssView(APIView):
             verifytimeout_count = 0
         )
         logger.info(f'Got {ssn.pk} unsubscribe confirmation from hub.')
+        metrics.VERIFICATIONS.labels('unsubscribe', 'verified').inc()
         return HttpResponse(request.GET['hub.challenge'])
 
 
@@ -174,7 +228,8 @@ class WssView(APIView):
             return Response('Unwanted subscription')
 
         logger.error(f'Hub denied subscription {ssn.pk}!')
-        tasks.save.delay(pk=ssn.pk, subscribe_status='denied')
+        metrics.VERIFICATIONS.labels('denied', 'denied').inc()
+        delay(tasks.save, pk=ssn.pk, subscribe_status='denied')
         return Response('')
 
 
@@ -191,16 +246,133 @@ class WssView(APIView):
         """
         
         id = args[0] if args else list(kwargs.values())[0]
+        urlname = request.resolver_match.url_name
+
+        # Check subscription and body size before the body is read.
+        if unwanted.known(id):
+            metrics.REJECTED.labels(urlname, 'unwanted').inc()
+            return Response('Unwanted subscription', status=410)
+
+        ssn = routing.subscription(id)
+        if ssn is None:
+            retry_after = unwanted.add(request, id)
+            if retry_after:
+                return self.on_rate_limited(request, id, retry_after)
+            logger.error(
+                f'Received unwanted subscription {id} POST request! Sending status '
+                '410 back to hub.'
+            )
+            metrics.REJECTED.labels(urlname, 'unwanted').inc()
+            return Response('Unwanted subscription', status=410)
+
+        controller = admission.get_controller()
+        if controller:
+            # Check queues the handler tasks are routed to.
+            for handler_task, handler_urlname in fanout.handlers(id, urlname, self.handler_task):
+                queue = routing.queue(handler_task, id, handler_urlname)
+                status = controller.check(handler_urlname, handler_task, queue)
+                if status:
+                    logger.warning(
+                        f'Shedding notification of subscription {id} with status {status}.'
+                    )
+                    response = Response('Overloaded, retry later', status=status)
+                    response['Retry-After'] = str(controller.retry_after)
+                    return response
+
+        limit = limits.check(request, ssn)
+        if limit is not None:
+            logger.warning(
+                f'Rejected notification of subscription {id}: body exceeds {limit} bytes.'
+            )
+            metrics.REJECTED.labels(urlname, 'too_large').inc()
+            return Response('Payload too large', status=HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        if not ssn['secret'] and settings.WEBSUBSUB_HUB_SECRETS:
+            # Secret may have been generated by subscribe task in another process
+            # after the subscription was cached.
+            ssn = routing.subscription(id, refresh=True) or ssn
+        if ssn['secret'] and not signatures.verify(request, ssn['secret']):
+            # Subscriber may acknowledge invalid notifications, so that forgers
+            # can not brute-force the signature.
+            logger.warning(f'Dropped notification of subscription {id} with invalid signature.')
+            metrics.REJECTED.labels(urlname, 'signature').inc()
+            return Response('')
+
+        key = None
+        if settings.WEBSUBSUB_DEDUP_NOTIFICATIONS:
+            key = duplicates.remember(urlname, id, request)
+            if key is None:
+                logger.debug(f'Dropped duplicate notification of subscription {id}.')
+                return Response('')
+
         try:
-            ssn = Subscription.objects.get(id=id)
-        except Subscription.DoesNotExist:
+            return self.on_notification(request, id, urlname, key, ssn)
+        except Exception:
+            # Let hub retry the notification, instead of dropping it as a duplicate.
+            if key:
+                duplicates.forget(key)
+            raise
+
+    def on_notification(self, request, id, urlname, key, ssn):
+        """
+        Schedule handler tasks of new notification.
+        """
+        if settings.WEBSUBSUB_INBOX:
+            # Drainer updates time_last_event_received, see websubsub.inbox.
+            metrics.count_notification(urlname, ssn['hub_url'])
+            sequence = ordering.next_sequence(id) if ordering.enabled() else None
+            inbox.append(request, id, sequence)
+            return Response('')
+
+        if not Subscription.objects.filter(id=id).update(time_last_event_received=now()):
             logger.error(
                 f'Received unwanted subscription {id} POST request! Sending status '
                 '410 back to hub.'
             )
+            if key:
+                duplicates.forget(key)
+            unwanted.add(request, id)
             return Response('Unwanted subscription', status=410)
-        
-        ssn.update(time_last_event_received=now())
-        self.handler_task.delay(request.data)
+
+        metrics.count_notification(urlname, ssn['hub_url'])
+
+        index = None
+        if feeds.enabled() and feeds.feed_type(request.content_type):
+            # Stream the body, without request.data buffering and parsing it whole.
+            index = changes.entry_index(id)
+            payloads = feeds.payloads(request.stream or BytesIO(), request.content_type, index)
+        else:
+            # With envelope, body is parsed by the worker.
+            payloads = [envelope.wrap(request) if envelope.enabled() else request.data]
+        handlers = fanout.handlers(id, urlname, self.handler_task)
+        # All payloads of the notification share its sequence number, like in inbox.deliver.
+        sequence = ordering.next_sequence(id) if ordering.enabled() else None
+        published = 0
+        try:
+            for data in payloads:
+                for handler_task, handler_urlname in handlers:
+                    routing.delay(handler_task, id, handler_urlname, data, sequence=sequence)
+                published += 1
+        except ParseError as e:
+            if not published:
+                raise
+            # Entries are published while parsing. Acknowledge the notification, so that
+            # the hub does not retry entries which were already handed to handler tasks.
+            logger.warning(
+                f'Malformed feed of subscription {id} after {published} payloads: {e}'
+            )
+            if index is not None:
+                index.commit(complete=False)
+            return Response('')
+        if index is not None:
+            # Entries count as seen only after all their handler tasks are scheduled.
+            index.commit()
         return Response('')  # TODO
 
+
+def metrics_view(request):
+    """
+    Expose websubsub metrics in prometheus text format. Requires prometheus_client.
+    """
+    content, content_type = metrics.generate()
+    return HttpResponse(content, content_type=content_type)